@@ -221,7 +221,7 @@ def slack_events():
                     "blocks": blocks
                 }
                 app.logger.info(f"Next question response: {json.dumps(response, indent=2)}")
-                requests.post(payload["response_url"], json=response)
+                requests.post(payload["response_url"], json=response, timeout=3)
                 return jsonify({"status": "ok"})
             else:
                 response_text += f"Quiz completed! Your score is {session['score']}/{session['num_questions']}."
@@ -234,7 +234,7 @@ def slack_events():
                     "text": response_text
                 }
                 app.logger.info(f"Quiz completed response: {json.dumps(response, indent=2)}")
-                requests.post(payload["response_url"], json=response)
+                requests.post(payload["response_url"], json=response, timeout=3)
                 return jsonify({"status": "ok"})
 
         app.logger.error("Unknown action ID")
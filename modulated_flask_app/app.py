@@ -1,16 +1,37 @@
+import signal
+import sys
+
 from flask import Flask
-import logging
-from config import SLACK_SIGNING_SECRET, SLACK_BOT_TOKEN
-from routes import init_routes
+from flask.logging import default_handler
+from config import SLACK_SIGNING_SECRET, SLACK_BOT_TOKEN, SLACK_MAX_BODY, LOG_LEVEL
+from quiz_logging import setup_logging
+from metrics import install_toggle_signal
+from routes import init_routes, metrics, shutdown
 
 app = Flask(__name__)
 
 app.config['SLACK_SIGNING_SECRET'] = SLACK_SIGNING_SECRET
 app.config['SLACK_BOT_TOKEN'] = SLACK_BOT_TOKEN
+app.config['MAX_CONTENT_LENGTH'] = SLACK_MAX_BODY
 
 # Initialize routes
 init_routes(app)
 
+def setup_process():
+    # Per-process setup that must run in the process serving requests (after any fork)
+    setup_logging(LOG_LEVEL)
+    # Records go out through the root logger's queue; Flask's own handler would print each one again
+    app.logger.removeHandler(default_handler)
+    install_toggle_signal(metrics)
+
+def exit_on_sigterm(signum, frame):
+    # Unwinds the dev server like Ctrl-C does, so the shutdown below runs (gunicorn has its own handler)
+    sys.exit(0)
+
 if __name__ == '__main__':
-    logging.basicConfig(level=logging.INFO)
-    app.run(host='0.0.0.0')
\ No newline at end of file
+    setup_process()
+    signal.signal(signal.SIGTERM, exit_on_sigterm)
+    try:
+        app.run(host='0.0.0.0')
+    finally:
+        shutdown()
\ No newline at end of file
@@ -0,0 +1,287 @@
+"""Async variant of the Slack endpoints, serving the same contracts as routes.py on an event loop.
+
+Needs starlette, httpx and uvicorn. Run with: uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import contextlib
+import functools
+import logging
+import time
+
+import httpx
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+from starlette.routing import Route
+
+from config import (SLACK_SIGNING_SECRET, SLACK_BOT_TOKEN, SLACK_API_URL, SLACK_MAX_BODY, LOOKUP_TABLE_PATH, S3_BUCKET, S3_KEY, BANK_CACHE_PATH, BANK_REFRESH_INTERVAL, SESSION_BACKEND, SESSION_TTL, SESSION_MAX,
+                    SESSION_DB_PATH, REDIS_URL, RENDER_CACHE_SIZE, DELIVERY_TIMEOUT, DELIVERY_MAX_RETRIES,
+                    IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_KEYS, SAMPLER, SAMPLER_LOG_PATH, SAMPLER_RECENT,
+                    BANK_DIR, BANK_DEFAULT_NAME, BANK_MAX_RESIDENT, BANK_TEAM_DEFAULTS, METRICS_TIMERS, ANSWER_SOURCE,
+                    RESULTS_DB_PATH, RESULTS_FLUSH_MS, SESSION_SNAPSHOT_PATH, SESSION_SNAPSHOT_INTERVAL,
+                    SHUTDOWN_TIMEOUT, SERVER_WORKERS, LIVE_QUESTION_SECONDS, LIVE_UPDATE_INTERVAL, LOG_PAYLOADS,
+                    LOG_SAMPLE_RATES, LOG_LEVEL)
+from bank_loader import load_banks
+from delivery import LATENCY_BUCKETS
+from bank_registry import BankRegistry, parse_team_defaults
+from live_quiz import LiveQuizzes
+from metrics import Metrics, install_toggle_signal
+from quiz_logging import EventLogger, parse_sample_rates, setup_logging
+from render import QuestionRenderer
+from results_store import ResultsStore
+from sampler import create_sampler
+from session_store import create_async_session_store
+from slack_handlers import SlackHandlers, ok
+from utils import SlackVerifier, api_error, decode_interaction, is_select_click, TTLCache, StripedLocks, parse_form
+
+logger = logging.getLogger(__name__)
+
+banks, bank_loader = load_banks(LOOKUP_TABLE_PATH, S3_BUCKET, S3_KEY, BANK_CACHE_PATH, BANK_REFRESH_INTERVAL)
+renderer = QuestionRenderer(cache_size=RENDER_CACHE_SIZE)
+sampler = create_sampler(SAMPLER, banks.current, log_path=SAMPLER_LOG_PATH, recent_size=SAMPLER_RECENT)
+banks.on_swap(sampler.rebind)
+registry = BankRegistry(banks, bank_dir=BANK_DIR, default_name=BANK_DEFAULT_NAME, max_resident=BANK_MAX_RESIDENT,
+                        team_defaults=parse_team_defaults(BANK_TEAM_DEFAULTS))
+session_store = create_async_session_store(SESSION_BACKEND, ttl=SESSION_TTL, max_sessions=SESSION_MAX,
+                                           db_path=SESSION_DB_PATH, redis_url=REDIS_URL,
+                                           snapshot_path=SESSION_SNAPSHOT_PATH,
+                                           snapshot_interval=SESSION_SNAPSHOT_INTERVAL)
+verifier = SlackVerifier(SLACK_SIGNING_SECRET, max_body=SLACK_MAX_BODY)
+interactions = TTLCache(max_size=IDEMPOTENCY_MAX_KEYS, ttl=IDEMPOTENCY_TTL)
+session_locks = StripedLocks(factory=asyncio.Lock)
+# Recording only enqueues, so it is safe to call from the event loop
+results = ResultsStore(RESULTS_DB_PATH, flush_interval=RESULTS_FLUSH_MS / 1000) if RESULTS_DB_PATH else None
+http_client = None
+event_loop = None
+
+BOT_HEADERS = {'Content-Type': 'application/json', 'Authorization': f"Bearer {SLACK_BOT_TOKEN}"}
+metrics = Metrics(enabled=METRICS_TIMERS)
+request_seconds = metrics.histogram('request_seconds', "Time to ack a request", ('endpoint', 'status'))
+delivery_failures = metrics.counter('delivery_failures_total', "Slack posts given up on or rejected")
+delivery_retries = metrics.counter('delivery_retries_total', "response_url posts retried")
+delivery_seconds = metrics.histogram('delivery_seconds', "Time from the ack to a Slack post's acceptance, retries "
+                                     "included", buckets=LATENCY_BUCKETS)
+# The async Redis store has no synchronous count to read at scrape time
+if hasattr(session_store, 'store'):
+    metrics.gauge_function('active_sessions', "Quiz sessions currently stored", lambda: len(session_store.store))
+    metrics.counter_function('session_evictions_total', "Sessions evicted by the LRU or expired",
+                             lambda: getattr(session_store.store, 'evictions', 0))
+
+
+def publish_live(method, body):
+    # Called from the live quiz ticker thread as well as from handlers
+    asyncio.run_coroutine_threadsafe(post_response(f"{SLACK_API_URL}/{method}", body, BOT_HEADERS), event_loop)
+
+
+def call_slack(method, body):
+    # Waits on the loop, so only ever called off it: from the live quiz ticker thread or start_quiz's executor
+    return asyncio.run_coroutine_threadsafe(call_api(f"{SLACK_API_URL}/{method}", body, BOT_HEADERS),
+                                            event_loop).result()
+
+
+live = LiveQuizzes(renderer, publish_live, call_slack, question_seconds=LIVE_QUESTION_SECONDS,
+                   update_interval=LIVE_UPDATE_INTERVAL, results=results)
+metrics.gauge_function('live_quizzes', "Channel quizzes in progress", lambda: len(live))
+metrics.counter_function('live_answers_total', "Live quiz answers counted", lambda: live.answers)
+metrics.counter_function('live_updates_total', "Coalesced live question message updates", lambda: live.updates)
+handlers = SlackHandlers(renderer, registry, sampler,
+                         EventLogger(logger, parse_sample_rates(LOG_SAMPLE_RATES), debug_payloads=LOG_PAYLOADS),
+                         metrics, interactions, call_slack, answer_source=ANSWER_SOURCE, results=results,
+                         live=live, live_question_seconds=LIVE_QUESTION_SECONDS, server_workers=SERVER_WORKERS)
+stage_seconds = handlers.stage_seconds
+
+
+def timed(endpoint):
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            if not metrics.enabled:
+                return await handler(request)
+            start = time.perf_counter()
+            response = await handler(request)
+            request_seconds.observe(time.perf_counter() - start, endpoint, response.status_code)
+            return response
+        return wrapper
+    return decorator
+
+
+def count_outcome(url, result, started):
+    """Counts a post Slack answered: its latency if accepted, else a failure, as ResponseDelivery does."""
+    # Web API calls report most failures (not_in_channel, expired_trigger_id) in a 200's body
+    error = api_error(result.headers.get('Content-Type'), result.content)
+    if error is None and result.status_code >= 400:
+        # e.g. 404 expired_url from a response_url past its 30 minutes or five uses
+        error = f"HTTP {result.status_code}"
+    if error:
+        delivery_failures.inc()
+        logger.error("Slack rejected the post to %s: %s", url, error)
+    else:
+        delivery_seconds.observe(time.perf_counter() - started)
+
+
+async def call_api(url, body, headers):
+    """Posts once and returns the reply's JSON, or None when there was none; a retry could post twice."""
+    started = time.perf_counter()
+    try:
+        result = await http_client.post(url, content=body, headers=headers)
+    except httpx.HTTPError as e:
+        delivery_failures.inc()
+        logger.error("Call to %s failed: %s", url, e)
+        return None
+    count_outcome(url, result, started)
+    try:
+        return result.json()
+    except ValueError:
+        return None
+
+
+async def post_response(url, response, headers=None):
+    started = time.perf_counter()
+    for attempt in range(DELIVERY_MAX_RETRIES + 1):
+        try:
+            result = await http_client.post(url, content=response, headers=headers or {'Content-Type': 'application/json'})
+            if result.status_code < 500 and result.status_code != 429:
+                count_outcome(url, result, started)
+                return
+        except httpx.HTTPError as e:
+            logger.warning("Delivery to %s failed: %s", url, e)
+        if attempt < DELIVERY_MAX_RETRIES:
+            delivery_retries.inc()
+            await asyncio.sleep(0.5 * (2 ** attempt))
+    delivery_failures.inc()
+    logger.error("Giving up on delivery to %s", url)
+
+
+async def post_all(posts):
+    for url, body, headers in posts:
+        await post_response(url, body, headers)
+
+
+async def respond(reply):
+    if reply.save:
+        session_id, session = reply.save
+        with stage_seconds.time('session'):
+            if session is None:
+                await session_store.delete(session_id)
+            else:
+                await session_store.put(session_id, session)
+    # Ack first; the posts run after the response has been sent
+    return Response(reply.body, status_code=reply.status, media_type='application/json',
+                    background=BackgroundTask(post_all, reply.posts) if reply.posts else None)
+
+
+async def reject_unverified(request):
+    """The response to send instead of handling the request, or None for a genuine one."""
+    content_length = request.headers.get('content-length')
+    error = verifier.check_headers(request.headers, int(content_length) if content_length else None)
+    if error is None:
+        body = await request.body()
+        with stage_seconds.time('verify'):
+            error = verifier.check_body(request.headers, body)
+    if error is None:
+        return None
+    return await respond(handlers.rejected(error, request.headers.get('X-Slack-Retry-Num')))
+
+
+@timed('start_quiz')
+async def start_quiz(request):
+    handlers.events.event("start_quiz")
+    rejection = await reject_unverified(request)
+    if rejection:
+        return rejection
+    form = parse_form(await request.body())
+    try:
+        return await respond(await asyncio.get_running_loop().run_in_executor(None, handlers.start_quiz, form))
+    except Exception as e:
+        return await respond(handlers.failed('start_quiz', e))
+
+
+@timed('leaderboard')
+async def leaderboard(request):
+    handlers.events.event("leaderboard")
+    rejection = await reject_unverified(request)
+    if rejection:
+        return rejection
+    form = parse_form(await request.body())
+    return await respond(await asyncio.get_running_loop().run_in_executor(None, handlers.leaderboard, form))
+
+
+@timed('slack_events')
+async def slack_events(request):
+    handlers.events.event("slack_events")
+    rejection = await reject_unverified(request)
+    if rejection:
+        return rejection
+    # request.body() is cached, so reading it again costs nothing
+    payload = decode_interaction(parse_form(await request.body()))
+    if ANSWER_SOURCE == 'state' and is_select_click(payload):
+        # Selections are read from the state snapshot on submit, so a checkbox click needs no work
+        # beyond the signature check: a forged one must not get a success response either
+        return Response(status_code=200)
+
+    try:
+        with stage_seconds.time('parse'):
+            interaction = handlers.interaction(payload)
+        if interaction is None:
+            return await respond(ok())
+        try:
+            with handlers.action_timer(interaction.action_id):
+                async with session_locks.lock_for(interaction.session_id):
+                    session = None
+                    if handlers.needs_session(interaction.action_id):
+                        with stage_seconds.time('session'):
+                            session = await session_store.get(interaction.session_id)
+                    # Stored under the lock, so the user's next click sees this one's change. Grading can
+                    # open a named bank and appends to the sampler log, so it runs on the executor;
+                    # checkbox clicks and live votes only touch memory and stay on the loop
+                    if handlers.grades(interaction.action_id):
+                        reply = await asyncio.get_running_loop().run_in_executor(
+                            None, handlers.block_action, interaction, session)
+                    else:
+                        reply = handlers.block_action(interaction, session)
+                    return await respond(reply)
+        except Exception:
+            handlers.forget(interaction)
+            raise
+    except Exception as e:
+        return await respond(handlers.failed('slack_events', e))
+
+
+async def metrics_endpoint(request):
+    return Response(metrics.render(), media_type=Metrics.CONTENT_TYPE)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global http_client, event_loop
+    # Each worker process runs its own lifespan, so the log listener thread lives where records are made
+    setup_logging(LOG_LEVEL)
+    install_toggle_signal(metrics)
+    event_loop = asyncio.get_running_loop()
+    # Likewise the bank refresh thread and the topic index build
+    if bank_loader:
+        bank_loader.start()
+    banks.current.index_topics_in_background()
+    # A snapshot store restores on first use, which would otherwise be the first request, on the loop
+    store = getattr(session_store, 'store', None)
+    if hasattr(store, 'start'):
+        await asyncio.to_thread(store.start)
+    http_client = httpx.AsyncClient(timeout=DELIVERY_TIMEOUT,
+                                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20))
+    try:
+        yield
+    finally:
+        # The server has already finished in-flight requests and their background posts by now
+        await http_client.aclose()
+        if results:
+            await asyncio.to_thread(results.drain, SHUTDOWN_TIMEOUT)
+        if hasattr(store, 'flush'):
+            await asyncio.to_thread(store.flush, True)
+
+
+app = Starlette(routes=[
+    Route('/start_quiz', start_quiz, methods=['POST']),
+    Route('/slack/events', slack_events, methods=['POST']),
+    Route('/leaderboard', leaderboard, methods=['POST']),
+    Route('/metrics', metrics_endpoint, methods=['GET']),
+], lifespan=lifespan)
@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from question_bank import QuestionBank
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownBankVersion(LookupError):
+    """A session's bank version is not kept here: it aged out, or another worker fetched it first."""
+
+
+class BankHolder:
+    """Points at the live QuestionBank and keeps a few previous versions for quizzes started on them.
+
+    Swapping is a single attribute assignment, so readers never block and never see a half-built bank.
+    """
+
+    def __init__(self, bank, keep=3):
+        self.current = bank
+        self.keep = keep
+        self._versions = OrderedDict([(bank.version, bank)])
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def get(self, version):
+        # Question ids are positions within one version, so any other version would grade different questions
+        bank = self._versions.get(version)
+        if bank is None:
+            raise UnknownBankVersion(version)
+        return bank
+
+    def for_session(self, session):
+        return self.get(session.get("bank_version"))
+
+    def on_swap(self, listener):
+        self._listeners.append(listener)
+
+    def swap(self, bank):
+        with self._lock:
+            self._versions[bank.version] = bank
+            self._versions.move_to_end(bank.version)
+            while len(self._versions) > self.keep:
+                self._versions.popitem(last=False)
+            self.current = bank
+        for listener in self._listeners:
+            listener(bank)
+
+
+class S3BankLoader:
+    """Keeps a BankHolder in sync with a lookup_table.json object in S3.
+
+    Polls with conditional GETs (If-None-Match on the last ETag), so an unchanged object costs a 304.
+    The last good copy is cached on disk next to its ETag, which makes cold starts independent of S3.
+    """
+
+    def __init__(self, bucket, key, cache_path, interval=60, client=None):
+        self.bucket = bucket
+        self.key = key
+        self.cache_path = cache_path
+        self.interval = interval
+        self.etag = None
+        self.holder = None
+        self._client = client
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client('s3')
+        return self._client
+
+    def load(self):
+        bank = self._load_cache()
+        if bank is None:
+            bank = self._fetch()
+            if bank is None:
+                raise RuntimeError(f"Could not load question bank from s3://{self.bucket}/{self.key}")
+        self.holder = BankHolder(bank)
+        return self.holder
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path + '.etag', 'r') as file:
+                etag = file.read().strip()
+            bank = QuestionBank.from_json_file(self.cache_path, version=etag)
+        except (OSError, ValueError) as e:
+            logger.info("No usable question bank cache at %s: %s", self.cache_path, e)
+            return None
+        self.etag = etag
+        return bank
+
+    def _write_cache(self, body, etag):
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        for path, data in ((self.cache_path, body), (self.cache_path + '.etag', etag.encode())):
+            fd, tmp_path = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+
+    def _fetch(self):
+        """Returns a new QuestionBank if the object changed since the last fetch, otherwise None."""
+        from botocore.exceptions import ClientError
+
+        kwargs = {'Bucket': self.bucket, 'Key': self.key}
+        if self.etag:
+            kwargs['IfNoneMatch'] = self.etag
+        try:
+            response = self.client.get_object(**kwargs)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('304', 'NotModified'):
+                return None
+            raise
+        body = response['Body'].read()
+        etag = response['ETag']
+        # Parse before touching the cache so a malformed upload never replaces the last good copy
+        bank = QuestionBank.from_dict(json.loads(body), version=etag)
+        self._write_cache(body, etag)
+        self.etag = etag
+        return bank
+
+    def refresh(self):
+        try:
+            bank = self._fetch()
+            if bank is not None:
+                # Refreshes run on the loader's thread, so a new version is indexed here before it goes live
+                bank.index_topics()
+        except Exception as e:
+            logger.error("Question bank refresh failed, keeping version %s: %s", self.etag, e)
+            return False
+        if bank is None:
+            return False
+        logger.info("Loaded question bank version %s with %d questions", bank.version, len(bank))
+        self.holder.swap(bank)
+        return True
+
+    def _run(self):
+        # The first refresh also catches up a bank that was served from the disk cache
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        # Cheap when already running; a thread inherited across fork reports not alive and is restarted
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="bank-refresh", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def load_banks(lookup_table_path, s3_bucket=None, s3_key=None, cache_path='lookup_table.cache.json', interval=60):
+    """Returns (holder, loader); loader is None when the bank comes from a local .json or .sqlite file."""
+    if s3_bucket and s3_key:
+        loader = S3BankLoader(s3_bucket, s3_key, cache_path, interval=interval)
+        return loader.load(), loader
+    if lookup_table_path.endswith('.sqlite'):
+        # Compiled with quizbot-compile: already validated, opened without parsing
+        from bank_store import SQLiteQuestionBank
+        return BankHolder(SQLiteQuestionBank(lookup_table_path)), None
+    # The topic index is left to the serving process (index_topics_in_background): building it here
+    # would add seconds to startup
+    return BankHolder(QuestionBank.from_json_file(lookup_table_path)), None
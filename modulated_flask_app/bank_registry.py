@@ -0,0 +1,128 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from bank_loader import BankHolder
+from bank_store import SQLiteQuestionBank
+from question_bank import QuestionBank
+
+logger = logging.getLogger(__name__)
+
+
+class BankRegistry:
+    """Named question banks, opened on first use and kept resident in a small LRU.
+
+    Banks are looked up as <bank_dir>/<name>.sqlite (prebuilt, memory-mapped) or <name>.json.
+    Nothing is opened at startup, so startup cost does not grow with the number of banks.
+    The default bank is the hot-reloadable one from load_banks() and is never evicted. An evicted bank is
+    dropped rather than closed, since requests that looked it up may still be reading it; its memory map
+    and connections are released once the last of them lets go.
+    The directory is listed at most once every rescan_interval seconds, so banks added to it are picked
+    up without a restart while lookups stay dictionary hits.
+    """
+
+    def __init__(self, default_holder, bank_dir=None, default_name='default', max_resident=4, team_defaults=None,
+                 rescan_interval=60, clock=time.monotonic):
+        self.default_name = default_name
+        self.default_holder = default_holder
+        self.bank_dir = bank_dir
+        self.max_resident = max_resident
+        self.team_defaults = team_defaults or {}
+        self.rescan_interval = rescan_interval
+        self._clock = clock
+        self._resident = OrderedDict()
+        self._lock = threading.Lock()
+        self._paths = {}
+        self._scanned_at = None
+
+    def _scan(self):
+        # name -> path of every bank in bank_dir; a .sqlite build wins over the .json it was compiled from
+        paths = {}
+        try:
+            filenames = sorted(os.listdir(self.bank_dir))
+        except OSError as e:
+            logger.error("Cannot list question banks in %s: %s", self.bank_dir, e)
+            return paths
+        for extension in ('.json', '.sqlite'):
+            for filename in filenames:
+                name = filename[:-len(extension)]
+                if filename.endswith(extension) and name.isidentifier():
+                    paths[name] = os.path.join(self.bank_dir, filename)
+        return paths
+
+    def _path_for(self, name):
+        if not self.bank_dir:
+            return None
+        now = self._clock()
+        if self._scanned_at is None or now - self._scanned_at >= self.rescan_interval:
+            # Swapped in whole, so concurrent lookups see the old listing or the new one
+            self._paths = self._scan()
+            self._scanned_at = now
+        return self._paths.get(name)
+
+    def __contains__(self, name):
+        return name == self.default_name or name in self._resident or self._path_for(name) is not None
+
+    def holder(self, name):
+        if name is None or name == self.default_name:
+            return self.default_holder
+        with self._lock:
+            holder = self._resident.get(name)
+            if holder is not None:
+                self._resident.move_to_end(name)
+                return holder
+            path = self._path_for(name)
+            if path is None:
+                raise KeyError(name)
+            if path.endswith('.sqlite'):
+                bank = SQLiteQuestionBank(path)
+            else:
+                bank = QuestionBank.from_json_file(path)
+            # Indexed while its first plain quizzes run; a topic quiz before then is asked to retry
+            bank.index_topics_in_background()
+            holder = self._resident[name] = BankHolder(bank)
+            while len(self._resident) > self.max_resident:
+                evicted_name, _ = self._resident.popitem(last=False)
+                logger.info("Evicting question bank %s", evicted_name)
+            return holder
+
+    def get(self, name):
+        return self.holder(name).current
+
+    def for_session(self, session):
+        return self.holder(session.get("bank")).for_session(session)
+
+    def default_for_team(self, team_id):
+        return self.team_defaults.get(team_id, self.default_name)
+
+    def parse_command(self, text, team_id=None, default_count=5):
+        """Splits "/start_quiz saa 10" text into (bank_name, num_questions, remaining words).
+
+        Only the first word can name a bank, so a topic that happens to share a bank's name stays a topic.
+        """
+        words = (text or '').split()
+        name, count, rest = None, default_count, []
+        if words and not is_count(words[0]) and words[0].lower() in self:
+            name = words.pop(0).lower()
+        for word in words:
+            if is_count(word):
+                # Signed, so "-3" is refused as a count rather than searched for as a topic
+                count = int(word)
+            else:
+                rest.append(word)
+        return name or self.default_for_team(team_id), count, rest
+
+
+def is_count(word):
+    return word.lstrip('-').isdigit()
+
+
+def parse_team_defaults(spec):
+    # "T0123=saa,T0456=sysops" -> {"T0123": "saa", "T0456": "sysops"}
+    defaults = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        team_id, name = item.split('=', 1)
+        defaults[team_id.strip()] = name.strip()
+    return defaults
@@ -0,0 +1,140 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+from array import array
+from functools import lru_cache
+
+from question_bank import Question
+from topic_index import LazyTopicIndex, TopicIndex, from_bytes, to_bytes
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE questions (
+    id INTEGER PRIMARY KEY,
+    prompt TEXT NOT NULL,
+    options TEXT NOT NULL,
+    correct TEXT NOT NULL,
+    explanation TEXT NOT NULL
+);
+-- ids: little-endian uint32 question ids, ascending; bitmap = 1 when ids is instead one bit per question
+CREATE TABLE postings (term TEXT PRIMARY KEY, bitmap INTEGER NOT NULL, ids BLOB NOT NULL) WITHOUT ROWID;
+"""
+
+
+def write_sqlite_bank(questions, path, version=None):
+    """Writes Question records to a prebuilt SQLite bank, replacing any file at path atomically."""
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        rows = [(q.id, q.prompt, json.dumps(q.options, separators=(',', ':')),
+                 ','.join(sorted(q.correct)), q.explanation) for q in questions]
+        conn.executemany("INSERT INTO questions VALUES (?, ?, ?, ?, ?)", rows)
+        conn.executemany("INSERT INTO postings VALUES (?, ?, ?)",
+                         ((term, 0, to_bytes(ids)) if isinstance(ids, array) else (term, 1, ids)
+                          for term, ids in TopicIndex.build(questions).items()))
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [("count", str(len(rows))), ("version", version or "")])
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+class SQLiteTopicIndex(TopicIndex):
+    """The posting lists prebuilt into a compiled bank, read per term on first use."""
+
+    def __init__(self, connection, size, cache_size=1024):
+        super().__init__(None, size)
+        self._connection = connection
+        self.postings = lru_cache(maxsize=cache_size)(self._read_postings)
+
+    def _read_postings(self, term):
+        row = self._connection().execute("SELECT bitmap, ids FROM postings WHERE term = ?", (term,)).fetchone()
+        if row is None:
+            return array('I')
+        return row[1] if row[0] else from_bytes(row[1])
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM postings").fetchone()[0]
+
+
+class SQLiteQuestionBank:
+    """Read-only, memory-mapped bank. Questions are materialized on first use, so opening costs no parsing."""
+
+    def __init__(self, path, mmap_size=256 * 1024 * 1024, cache_size=4096):
+        self.path = path
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._connections = []
+        self._pid = os.getpid()
+        meta = dict(self._connection().execute("SELECT key, value FROM meta"))
+        self._count = int(meta["count"])
+        self.version = meta.get("version") or None
+        self._load = lru_cache(maxsize=cache_size)(self._load_question)
+        has_postings = self._connection().execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'postings'").fetchone()
+        # Banks compiled before topic filtering existed index themselves, like JSON banks
+        self._topics = LazyTopicIndex(lambda: iter(self),
+                                      SQLiteTopicIndex(self._connection, self._count) if has_postings else None)
+
+    def _connection(self):
+        if self._pid != os.getpid():
+            # SQLite connections must not be used across fork; a preloaded bank reopens in each worker
+            self._local = threading.local()
+            self._connections = []
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._local.conn = conn
+            self._connections.append(conn)
+        return conn
+
+    def _load_question(self, qid):
+        row = self._connection().execute(
+            "SELECT id, prompt, options, correct, explanation FROM questions WHERE id = ?", (qid,)).fetchone()
+        if row is None:
+            raise IndexError(qid)
+        return Question(row[0], row[1], tuple(json.loads(row[2])), frozenset(row[3].split(',')), row[4])
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, qid):
+        return self._load(qid)
+
+    def __iter__(self):
+        for qid in range(self._count):
+            yield self[qid]
+
+    def sample(self, k):
+        return random.sample(range(self._count), k)
+
+    @property
+    def topics(self):
+        return self._topics.get()
+
+    def index_topics(self):
+        return self._topics.build()
+
+    def index_topics_in_background(self):
+        self._topics.start()
+
+    def match(self, words):
+        return self.topics.match(words)
+
+    def close(self):
+        self._load.cache_clear()
+        if isinstance(self._topics.index, SQLiteTopicIndex):
+            self._topics.index.postings.cache_clear()
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
+        self._local = threading.local()
@@ -0,0 +1,44 @@
+"""Cold-load cost of a large bank: json.load + QuestionBank vs. opening a quizbot-compile SQLite bank.
+
+Usage: python benchmarks/bench_compiled_bank.py [num_questions]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bank_store import SQLiteQuestionBank
+from bench_question_bank import bank_quiz, synthetic_table
+from compile_bank import main as compile_main
+from question_bank import QuestionBank
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, 'lookup_table.json')
+        sqlite_path = os.path.join(directory, 'bank.sqlite')
+        with open(json_path, 'w') as file:
+            json.dump(synthetic_table(size), file)
+        _, compile_seconds = timed(lambda: compile_main([json_path, '-o', sqlite_path]))
+
+        json_bank, json_seconds = timed(lambda: QuestionBank.from_json_file(json_path))
+        sqlite_bank, sqlite_seconds = timed(lambda: SQLiteQuestionBank(sqlite_path))
+        _, first_quiz = timed(lambda: bank_quiz(sqlite_bank))
+
+        print(f"{size} questions, compiled once in {compile_seconds:.2f} s "
+              f"({os.path.getsize(json_path) / 1e6:.1f} MB json -> {os.path.getsize(sqlite_path) / 1e6:.1f} MB sqlite)")
+        print(f"{'json.load + QuestionBank':>26} | {json_seconds * 1e3:9.2f} ms")
+        print(f"{'open compiled bank':>26} | {sqlite_seconds * 1e3:9.2f} ms | {json_seconds / sqlite_seconds:7.1f}x")
+        print(f"{'first quiz on compiled':>26} | {first_quiz * 1e3:9.2f} ms")
+        sqlite_bank.close()
@@ -0,0 +1,73 @@
+"""Handler-side submit cost vs. end-to-end delivery latency against a local stub response_url server.
+
+The stub sleeps --delay seconds per request and fails every --fail-every'th request with a 500,
+so retries and the keep-alive pool are both exercised.
+
+Usage: python benchmarks/bench_delivery.py [--messages N] [--delay S] [--fail-every N]
+"""
+import argparse
+import itertools
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from delivery import ResponseDelivery
+
+
+def start_stub_server(delay, fail_every):
+    counter = itertools.count(1)
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(delay)
+            status = 500 if fail_every and next(counter) % fail_every == 0 else 200
+            self.send_response(status)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--delay', type=float, default=0.05)
+    parser.add_argument('--fail-every', type=int, default=10)
+    args = parser.parse_args()
+
+    server = start_stub_server(args.delay, args.fail_every)
+    url = f"http://127.0.0.1:{server.server_address[1]}/response"
+    delivery = ResponseDelivery(workers=args.workers, max_queue=args.messages, backoff=0.05)
+    payload = {"response_type": "in_channel", "replace_original": True, "text": "x" * 512}
+
+    start = time.perf_counter()
+    for _ in range(args.messages):
+        delivery.submit(url, payload)
+    submit_elapsed = time.perf_counter() - start
+    while True:
+        stats = delivery.stats()
+        if stats["delivered"] + stats["failed"] + stats["dropped"] >= args.messages:
+            break
+        time.sleep(0.01)
+    total_elapsed = time.perf_counter() - start
+
+    print(f"submit: {submit_elapsed / args.messages * 1e6:.1f} us/message on the handler thread "
+          f"(a synchronous post would cost >= {args.delay * 1e3:.0f} ms)")
+    print(f"drain: {args.messages / total_elapsed:,.0f} messages/sec with {args.workers} workers")
+    print("stats:", stats)
+    server.shutdown()
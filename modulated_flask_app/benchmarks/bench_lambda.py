@@ -0,0 +1,148 @@
+"""Lambda cold and warm starts, measured locally: no AWS account or network access needed.
+
+Builds the deployment package (build_lambda.py) into a temporary directory and, for each run, starts a
+fresh interpreter there the way a new Lambda instance would: -X importtime while importing the handler
+module, then the first /start_quiz (the cold request) and warm /start_quiz + submit pairs through
+lambda_app.handler, with response_url posts going to a local sink. The same is run without the packaged
+bytecode, and against the Flask app for reference.
+
+Usage: python benchmarks/bench_lambda.py [--runs N] [--warm N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from build_lambda import APP_DIR, build
+from slack_payloads import ResponseSink, block_action_request, start_quiz_request
+
+SIGNING_SECRET = 'bench-signing-secret'
+DEFAULT_TABLE = os.path.join(APP_DIR, '..', 'flask_app', 'lookup_table.json')
+HEAVY = ('flask', 'werkzeug', 'requests', 'httpx', 'starlette', 'boto3', 'redis')
+
+# Runs in the fresh interpreter; requests arrive on stdin, already signed, so that building them is not timed
+CHILD = r'''
+import json, sys, time
+requests = json.load(sys.stdin)
+import_start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+{setup}
+timings = []
+for path, headers, body in requests:
+    start = time.perf_counter()
+    status = invoke(path, headers, body)
+    timings.append(time.perf_counter() - start)
+    assert status == 200, (path, status)
+print(json.dumps({{"import": imported - import_start, "requests": timings,
+                   "heavy": sorted(name for name in {heavy!r} if name in sys.modules)}}))
+'''
+
+LAMBDA_SETUP = r'''
+def invoke(path, headers, body):
+    event = {"rawPath": path, "headers": {name.lower(): value for name, value in headers.items()}, "body": body,
+             "isBase64Encoded": False, "requestContext": {"http": {"method": "POST"}}}
+    return lambda_app.handler(event, None)["statusCode"]
+'''
+
+FLASK_SETUP = r'''
+client = app.app.test_client()
+def invoke(path, headers, body):
+    return client.post(path, data=body.encode(), headers=headers).status_code
+'''
+
+
+def requests_for(run, warm, sink):
+    # One cold /start_quiz, then warm start + submit pairs; every body is unique, so none is a replay
+    requests = []
+    for i in range(warm + 1):
+        user_id = f"U{run:03d}{i:04d}"
+        body, headers = start_quiz_request(SIGNING_SECRET, user_id, 5)
+        requests.append(('/start_quiz', headers, body.decode()))
+        if i:
+            body, headers = block_action_request(SIGNING_SECRET, user_id, 'submit_answer', sink.url)
+            requests.append(('/slack/events', headers, body.decode()))
+    return requests
+
+
+def import_times(stderr, module):
+    """(cumulative seconds for module, [(self seconds, name)] of the slowest imports) from -X importtime."""
+    total, slowest = None, []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        slowest.append((int(self_us) / 1e6, name.strip()))
+        if name == module:
+            total = int(cumulative_us) / 1e6
+    return total, sorted(slowest, reverse=True)[:5]
+
+
+def run_once(kind, directory, env, run, warm, sink):
+    module, setup = ('lambda_app', LAMBDA_SETUP) if kind != 'flask' else ('app', FLASK_SETUP)
+    code = CHILD.format(module=module, setup=setup, heavy=HEAVY)
+    args = [sys.executable, '-X', 'importtime']
+    if kind == 'lambda, no bytecode':
+        # -B plus an empty cache prefix: every module is compiled from source, and nothing is written
+        args.append('-B')
+    started = time.perf_counter()
+    proc = subprocess.run(args + ['-c', code], cwd=directory, env=env, capture_output=True, text=True,
+                          input=json.dumps(requests_for(run, warm, sink)))
+    wall = time.perf_counter() - started
+    if proc.returncode:
+        raise RuntimeError(f"{kind} run failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["importtime"], result["slowest"] = import_times(proc.stderr, module)
+    result["wall"] = wall
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters per configuration")
+    parser.add_argument('--warm', type=int, default=20, help="warm start + submit pairs per run")
+    args = parser.parse_args()
+
+    sink = ResponseSink()
+    with tempfile.TemporaryDirectory() as directory:
+        package = os.path.join(directory, 'package')
+        with open(os.devnull, 'w') as quiet:
+            stdout, sys.stdout = sys.stdout, quiet
+            try:
+                assert build(DEFAULT_TABLE, package) == 0
+            finally:
+                sys.stdout = stdout
+        # One interpreter per run needs no shared store, and there is no Redis server here; a deployed
+        # function also imports the packaged redis client
+        base = dict(os.environ, SLACK_SIGNING_SECRET=SIGNING_SECRET, SLACK_BOT_TOKEN='xoxb-bench',
+                    SLACK_API_URL=sink.api_url, LOG_LEVEL='ERROR', SESSION_BACKEND='memory')
+        base.pop('PYTHONPATH', None)
+        configs = [('lambda', package, base),
+                   ('lambda, no bytecode', package, dict(base, PYTHONPYCACHEPREFIX=os.path.join(directory, 'empty'))),
+                   ('flask', APP_DIR, dict(base, LOOKUP_TABLE_PATH=DEFAULT_TABLE, RESULTS_DB_PATH='',
+                                           SESSION_SNAPSHOT_PATH=''))]
+
+        print(f"{'':>20} | {'import':>9} | {'importtime':>10} | {'1st request':>11} | {'warm p50':>9} | "
+              f"{'process':>9} | heavy modules loaded")
+        for kind, cwd, env in configs:
+            try:
+                results = [run_once(kind, cwd, env, run, args.warm, sink) for run in range(args.runs)]
+            except RuntimeError as e:
+                print(f"{kind:>20} | skipped: {str(e).splitlines()[-1]}")
+                continue
+            warm = [seconds for result in results for seconds in result["requests"][1:]]
+            print(f"{kind:>20} | {statistics.median(r['import'] for r in results) * 1e3:6.1f} ms | "
+                  f"{statistics.median(r['importtime'] for r in results) * 1e3:7.1f} ms | "
+                  f"{statistics.median(r['requests'][0] for r in results) * 1e3:8.2f} ms | "
+                  f"{statistics.median(warm) * 1e3:6.2f} ms | {statistics.median(r['wall'] for r in results) * 1e3:6.0f} ms | "
+                  f"{', '.join(results[0]['heavy']) or 'none'}")
+            print(f"{'':>20} | slowest imports: "
+                  + ', '.join(f"{name} {seconds * 1e3:.1f} ms" for seconds, name in results[0]["slowest"]))
+    sink.close()
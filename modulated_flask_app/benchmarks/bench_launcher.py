@@ -0,0 +1,107 @@
+"""Cold start and memory of the launchers: Flask's dev server vs. gunicorn with and without preloading.
+
+Cold start is the time from spawning the server to the first signed /start_quiz answered with a 200.
+Memory is read from /proc after a short warm-up: RSS counts shared pages in every process, PSS splits
+them between the processes sharing them, and USS is what each process holds privately (Linux only).
+
+Usage: python benchmarks/bench_launcher.py [--workers N] [--questions N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench_question_bank import synthetic_table
+from load_test_asgi import APP_DIR, SIGNING_SECRET, free_port
+from slack_payloads import start_quiz_request
+
+LAUNCHERS = {
+    'dev server': lambda port, workers: [sys.executable, '-c', f"import app; app.app.run(host='127.0.0.1', port={port})"],
+    'gunicorn': lambda port, workers: ['gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}', '-w', str(workers),
+                                       'app:app'],
+    # Same command; GUNICORN_PRELOAD=0 is set in the environment below
+    'gunicorn, no preload': lambda port, workers: ['gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}',
+                                                   '-w', str(workers), 'app:app'],
+}
+
+
+def memory(pid):
+    # kB -> MB for Rss, Pss and Private_* from smaps_rollup
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return fields['Rss'], fields['Pss'], fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+
+
+def process_tree(pid):
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as file:
+            for child in file.read().split():
+                pids.extend(process_tree(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def measure(label, command, env, port, warmup):
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # A fresh connection per request spreads the warm-up over all workers
+        limits = httpx.Limits(max_keepalive_connections=0)
+        with httpx.Client(base_url=f'http://127.0.0.1:{port}', timeout=5, limits=limits) as client:
+            while True:
+                try:
+                    if client.post('/start_quiz', content=b'', headers={}).status_code:
+                        break
+                except httpx.TransportError:
+                    if time.perf_counter() - start > 60 or proc.poll() is not None:
+                        raise RuntimeError(f"{label} did not start")
+                    time.sleep(0.01)
+            cold_start = None
+            while cold_start is None:
+                body, headers = start_quiz_request(SIGNING_SECRET, 'U000000', 5)
+                if client.post('/start_quiz', content=body, headers=headers).status_code == 200:
+                    cold_start = time.perf_counter() - start
+            for i in range(warmup):
+                body, headers = start_quiz_request(SIGNING_SECRET, f'U{i:06d}', 5)
+                client.post('/start_quiz', content=body, headers=headers)
+        usage = {pid: memory(pid) for pid in process_tree(proc.pid)}
+    finally:
+        proc.terminate()
+        proc.wait()
+    return cold_start, usage
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--questions', type=int, default=50000, help="size of the synthetic bank")
+    parser.add_argument('--warmup', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        table_path = os.path.join(directory, 'lookup_table.json')
+        with open(table_path, 'w') as file:
+            json.dump(synthetic_table(args.questions), file)
+        for label, build in LAUNCHERS.items():
+            port = free_port()
+            env = dict(os.environ, SLACK_SIGNING_SECRET=SIGNING_SECRET, SLACK_BOT_TOKEN='xoxb-bench',
+                       LOOKUP_TABLE_PATH=table_path, RESULTS_DB_PATH='', SESSION_SNAPSHOT_PATH='',
+                       SESSION_DB_PATH=os.path.join(directory, 's.db'), SAMPLER_LOG_PATH=os.path.join(directory, 'answers.log'), LOG_LEVEL='WARNING',
+                       GUNICORN_PRELOAD='0' if 'no preload' in label else '1')
+            cold_start, usage = measure(label, build(port, args.workers), env, port, args.warmup)
+            rss, pss, uss = (sum(values[i] for values in usage.values()) for i in range(3))
+            print(f"{label:>21} | cold start {cold_start * 1e3:7.0f} ms | {len(usage)} processes | "
+                  f"RSS {rss:6.1f} MB | PSS {pss:6.1f} MB | USS {uss:6.1f} MB")
+            for pid, (rss, pss, uss) in usage.items():
+                print(f"{'':>21} |   pid {pid:>7} | RSS {rss:6.1f} MB | PSS {pss:6.1f} MB | USS {uss:6.1f} MB")
@@ -0,0 +1,89 @@
+"""Request-thread logging cost per block_actions event, with logging enabled and writing to disk.
+
+legacy: the old f-string INFO lines with indent=2 payload/blocks dumps on a plain FileHandler.
+events: EventLogger through the queue handler, optionally sampled and with payload dumps switched on.
+
+Usage: python benchmarks/bench_logging.py [--events N]
+"""
+import argparse
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from quiz_logging import DeferredQueueHandler, EventLogger, JsonFormatter
+from question_bank import QuestionBank
+from render import question_blocks
+
+DEFAULT_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'flask_app', 'lookup_table.json')
+
+
+def sample_payload():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'flask_app', 'payload.json')) as file:
+        return json.load(file)
+
+
+def legacy_event(logger, payload, blocks):
+    logger.info("slack_events endpoint called")
+    logger.info(f"Payload received: {json.dumps(payload, indent=2)}")
+    logger.info(f"Action ID: {payload['actions'][0]['action_id']}")
+    logger.info(f"Sending blocks for next question: {json.dumps(blocks, indent=2)}")
+    logger.info(f"Next question response: {json.dumps({'blocks': blocks}, indent=2)}")
+
+
+def structured_event(events, payload, blocks):
+    events.event("slack_events")
+    events.payload("payload", payload)
+    events.event("block_action", user_id=payload["user"]["id"], action_id=payload["actions"][0]["action_id"])
+    events.payload("next_question", blocks)
+
+
+def time_calls(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=5000)
+    args = parser.parse_args()
+
+    payload = sample_payload()
+    blocks = question_blocks(QuestionBank.from_json_file(DEFAULT_TABLE)[0], 2, feedback="That's correct!\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_logger = logging.getLogger('bench.legacy')
+        legacy_logger.propagate = False
+        legacy_logger.setLevel(logging.INFO)
+        legacy_logger.addHandler(logging.FileHandler(os.path.join(tmp, 'legacy.log')))
+
+        file_handler = logging.FileHandler(os.path.join(tmp, 'events.log'))
+        file_handler.setFormatter(JsonFormatter())
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, file_handler)
+        listener.start()
+        event_logger = logging.getLogger('bench.events')
+        event_logger.propagate = False
+        event_logger.setLevel(logging.INFO)
+        event_logger.addHandler(DeferredQueueHandler(log_queue))
+
+        runs = {
+            'legacy': lambda: legacy_event(legacy_logger, payload, blocks),
+            'events': lambda: structured_event(EventLogger(event_logger), payload, blocks),
+            'events 5% sampled': lambda: structured_event(
+                EventLogger(event_logger, {"slack_events": 0.05, "block_action": 0.05}), payload, blocks),
+            'events + payloads': lambda: structured_event(
+                EventLogger(event_logger, debug_payloads=True), payload, blocks),
+        }
+        for label, func in runs.items():
+            seconds = time_calls(func, args.events)
+            print(f"{label:>18} | {seconds * 1e6:8.2f} us/event on the request thread")
+        listener.stop()
@@ -0,0 +1,38 @@
+"""Per-stage timer overhead: no instrumentation vs. timers switched off vs. timers on.
+
+Usage: python benchmarks/bench_metrics.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from metrics import Metrics
+
+STAGES = ('verify', 'parse', 'session', 'grade', 'render', 'enqueue')
+
+
+def bare():
+    for _ in STAGES:
+        pass
+
+
+if __name__ == '__main__':
+    metrics = Metrics()
+    stage_seconds = metrics.histogram('stage_seconds', "Time spent per handler stage", ('stage',))
+
+    def timed():
+        for stage in STAGES:
+            with stage_seconds.time(stage):
+                pass
+
+    number = 100000
+    baseline = min(timeit.repeat(bare, number=number, repeat=5)) / number
+    metrics.enabled = False
+    off = min(timeit.repeat(timed, number=number, repeat=5)) / number
+    metrics.enabled = True
+    on = min(timeit.repeat(timed, number=number, repeat=5)) / number
+    for label, seconds in (('uninstrumented', baseline), ('timers off', off), ('timers on', on)):
+        print(f"{label:>15} | {seconds * 1e6:6.2f} us/request ({len(STAGES)} stages) | "
+              f"+{(seconds - baseline) * 1e6:5.2f} us")
@@ -0,0 +1,63 @@
+"""Per-request parse cost: raw lookup_table dict vs. the precompiled QuestionBank.
+
+Usage: python benchmarks/bench_question_bank.py [path/to/lookup_table.json]
+"""
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from question_bank import QuestionBank
+
+DEFAULT_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'flask_app', 'lookup_table.json')
+NUM_QUESTIONS = 5
+
+
+def synthetic_table(size):
+    table = {}
+    for n in range(1, size + 1):
+        key = f"{n}. Synthetic question number {n} about some AWS service?\n" + "\n".join(
+            f"   {i}. Option {i} for question {n}" for i in range(1, 5))
+        table[key] = f"{n % 4 + 1}. Explanation for question {n}."
+    return table
+
+
+def legacy_quiz(lookup_table):
+    # Mirrors the old start_quiz + submit_answer paths for a full quiz
+    questions = random.sample(list(lookup_table.keys()), NUM_QUESTIONS)
+    for current_question in questions:
+        question_parts = current_question.split('. ', 1)
+        options = [part.strip() for part in question_parts[1].split('\n') if part.strip()]
+        correct_answer, explanation = lookup_table[current_question].split('. ', 1)
+        correct_answers_set = set([answer.strip() for answer in correct_answer.split(',')])
+        correct_answers_set == {"1"}
+        options[0]
+
+
+def bank_quiz(bank):
+    for qid in bank.sample(NUM_QUESTIONS):
+        question = bank[qid]
+        question.correct == {"1"}
+        question.prompt
+        question.options
+
+
+def run(label, lookup_table, number):
+    start = timeit.default_timer()
+    bank = QuestionBank.from_dict(lookup_table)
+    build = timeit.default_timer() - start
+    legacy = min(timeit.repeat(lambda: legacy_quiz(lookup_table), number=number, repeat=5)) / number
+    compiled = min(timeit.repeat(lambda: bank_quiz(bank), number=number, repeat=5)) / number
+    print(f"{label:>12} | {len(lookup_table):>7} questions | build {build * 1e3:8.2f} ms | "
+          f"legacy {legacy * 1e6:9.2f} us/quiz | bank {compiled * 1e6:7.2f} us/quiz | "
+          f"{legacy / compiled:7.1f}x")
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TABLE
+    with open(path, 'r') as file:
+        run('lookup_table', json.load(file), number=2000)
+    run('synthetic', synthetic_table(50000), number=50)
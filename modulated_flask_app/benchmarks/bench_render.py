@@ -0,0 +1,54 @@
+"""Render + serialize time per next-question response: dict building vs. the cached QuestionRenderer.
+
+"legacy" also includes the two indent=2 dumps the handlers used to run for logging.
+
+Usage: python benchmarks/bench_render.py [path/to/lookup_table.json]
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from question_bank import QuestionBank
+from render import QuestionRenderer, question_blocks
+
+DEFAULT_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'flask_app', 'lookup_table.json')
+FEEDBACK = "That's incorrect. Correct answer(s): 2\nExplanation: Elastic Beanstalk takes care of the deployment details.\n"
+
+
+def dict_response(question):
+    blocks = question_blocks(question, 3, feedback=FEEDBACK)
+    response = {"response_type": "in_channel", "replace_original": True, "blocks": blocks}
+    return json.dumps(response).encode()
+
+
+def legacy_response(question):
+    blocks = question_blocks(question, 3, feedback=FEEDBACK)
+    json.dumps(blocks, indent=2)
+    response = {"response_type": "in_channel", "replace_original": True, "blocks": blocks}
+    json.dumps(response, indent=2)
+    return json.dumps(response).encode()
+
+
+if __name__ == '__main__':
+    bank = QuestionBank.from_json_file(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TABLE)
+    renderer = QuestionRenderer(cache_size=len(bank))
+    questions = list(bank)
+    number = 20
+
+    def run(render):
+        return min(timeit.repeat(lambda: [render(q) for q in questions], number=number, repeat=5)) / (number * len(questions))
+
+    for question in questions:
+        renderer.question_message(question, 3, feedback=FEEDBACK, replace_original=True)
+
+    results = {
+        'legacy (+log dumps)': run(legacy_response),
+        'dict + json.dumps': run(dict_response),
+        'cached renderer': run(lambda q: renderer.question_message(q, 3, feedback=FEEDBACK, replace_original=True)),
+    }
+    baseline = results['legacy (+log dumps)']
+    for label, seconds in results.items():
+        print(f"{label:>20} | {seconds * 1e6:7.2f} us/response | {baseline / seconds:5.1f}x")
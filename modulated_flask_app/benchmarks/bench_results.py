@@ -0,0 +1,54 @@
+"""Results recording cost on the request path (enqueue vs. a commit per answer) and leaderboard query time.
+
+Usage: python benchmarks/bench_results.py [num_answers]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from results_store import SCHEMA, UPSERT_LEADERBOARD, ResultsStore
+
+
+def commit_per_answer(path, count):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    start = time.perf_counter()
+    for i in range(count):
+        conn.execute("BEGIN")
+        conn.execute("INSERT INTO answers VALUES (?, ?, ?, ?, ?, ?)", ('T1', f"U{i % 5000}", None, i % 280, i % 2, 0.0))
+        conn.execute(UPSERT_LEADERBOARD, ('T1', f"U{i % 5000}", 0, 1, i % 2, 0.0))
+        conn.execute("COMMIT")
+    return (time.perf_counter() - start) / count
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    with tempfile.TemporaryDirectory() as directory:
+        inline = commit_per_answer(os.path.join(directory, 'inline.db'), count)
+
+        store = ResultsStore(os.path.join(directory, 'results.db'))
+        start = time.perf_counter()
+        for i in range(count):
+            store.record_answer(f"T1:U{i % 5000}", None, i % 280, i % 2)
+            # Stay under the queue bound; a real handler records one answer per request
+            if i % 5000 == 4999:
+                store.drain()
+        enqueue = (time.perf_counter() - start) / count
+        store.drain()
+
+        store.leaderboard('T1')
+        number = 1000
+        start = time.perf_counter()
+        for _ in range(number):
+            store.leaderboard('T1')
+        query = (time.perf_counter() - start) / number
+
+    print(f"{'commit per answer':>20} | {inline * 1e6:8.2f} us/answer on the request path")
+    print(f"{'batched writer':>20} | {enqueue * 1e6:8.2f} us/answer on the request path (incl. drains)")
+    print(f"{'leaderboard top 10':>20} | {query * 1e6:8.2f} us/query over 5000 users")
@@ -0,0 +1,47 @@
+"""Draw latency of the adaptive sampler against bank size, with a populated answer history.
+
+Usage: python benchmarks/bench_sampler.py [--users N] [--history N] [--k N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sampler import AdaptiveSampler
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--history', type=int, default=20)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--draws', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    for bank_size in (1000, 10000, 100000):
+        start = time.perf_counter()
+        sampler = AdaptiveSampler(bank_size, rng=random.Random(7))
+        for user in range(args.users):
+            for qid in rng.sample(range(bank_size), args.history):
+                sampler.record(f"U{user}", qid, rng.random() < 0.6)
+        setup = time.perf_counter() - start
+
+        latencies = []
+        for i in range(args.draws):
+            user_id = f"U{rng.randrange(args.users)}"
+            start = time.perf_counter()
+            sampler.draw(user_id, args.k)
+            latencies.append(time.perf_counter() - start)
+        uniform = min(timeit.repeat(lambda: rng.sample(range(bank_size), args.k), number=200, repeat=5)) / 200
+        print(f"bank {bank_size:>7} | setup {setup:6.2f} s | draw p50 {percentile(latencies, 0.5) * 1e6:7.1f} us | "
+              f"p99 {percentile(latencies, 0.99) * 1e6:7.1f} us | uniform {uniform * 1e6:5.1f} us")
@@ -0,0 +1,66 @@
+"""Session ops/sec per backend (one get + put per op, the shape of a select/submit event).
+
+Usage: python benchmarks/bench_session_store.py [--ops N] [--redis-url URL]
+
+Redis is benchmarked against --redis-url when given, otherwise against fakeredis if installed.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from session_store import MemorySessionStore, SQLiteSessionStore, RedisSessionStore
+
+USERS = 1000
+
+
+def make_session(i):
+    return {
+        "questions": list(range(i, i + 10)),
+        "current_question": 0,
+        "score": 0,
+        "num_questions": 10,
+        "selected_answers": []
+    }
+
+
+def run(label, store, ops):
+    for i in range(USERS):
+        store.put(f"U{i}", make_session(i))
+    start = time.perf_counter()
+    for i in range(ops):
+        key = f"U{i % USERS}"
+        session = store.get(key)
+        session["selected_answers"] = ["1"]
+        store.put(key, session)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>8} | {ops / elapsed:12,.0f} ops/sec | {elapsed / ops * 1e6:8.2f} us/op")
+
+
+def redis_store(url):
+    if url:
+        return RedisSessionStore.from_url(url)
+    try:
+        import fakeredis
+    except ImportError:
+        return None
+    return RedisSessionStore(fakeredis.FakeRedis())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ops', type=int, default=20000)
+    parser.add_argument('--redis-url')
+    args = parser.parse_args()
+
+    run('memory', MemorySessionStore(), args.ops)
+    with tempfile.TemporaryDirectory() as tmp:
+        run('sqlite', SQLiteSessionStore(os.path.join(tmp, 'sessions.db')), args.ops)
+    store = redis_store(args.redis_url)
+    if store is None:
+        print("   redis | skipped (pass --redis-url or install fakeredis)")
+    else:
+        run('redis', store, args.ops)
@@ -0,0 +1,61 @@
+"""Session snapshot cost: put() on the request path, background flush and compaction, and restore on startup.
+
+Usage: python benchmarks/bench_snapshot.py [num_sessions]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from session_store import MemorySessionStore, SnapshotSessionStore
+
+
+def session(i):
+    # Shaped like quiz.new_session for a 10-question quiz, half answered
+    return {"questions": [(i + n * 7919) % 50000 for n in range(10)], "current_question_index": 5,
+            "score": i % 6, "answers": [[i % 4], [1], [0, 2], [3], [1]], "bank": None}
+
+
+def time_puts(store, count):
+    start = time.perf_counter()
+    for i in range(count):
+        store.put(f"T1:U{i:07d}", session(i))
+    return (time.perf_counter() - start) / count
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'sessions.snapshot')
+        plain = time_puts(MemorySessionStore(max_sessions=count), count)
+
+        # A long interval keeps the background thread out of the way; flushes are timed explicitly
+        store = SnapshotSessionStore(path, max_sessions=count, interval=3600)
+        put = time_puts(store, count)
+        start = time.perf_counter()
+        store.flush(True)
+        flush = time.perf_counter() - start
+        # Every session again, plus a deleted tenth: the log outgrows the live set enough that the next flush compacts
+        for i in range(count):
+            store.put(f"T1:U{i:07d}", session(i + 1))
+        for i in range(0, count, 10):
+            store.delete(f"T1:U{i:07d}")
+        store.flush(True)
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        store.flush(True)
+        compact = time.perf_counter() - start
+
+        start = time.perf_counter()
+        restored = SnapshotSessionStore(path, max_sessions=count, interval=3600)
+        # The file is read on first use
+        restored.get("T1:U0000001")
+        restore = time.perf_counter() - start
+
+    print(f"{'memory put':>16} | {plain * 1e6:8.2f} us/session")
+    print(f"{'snapshot put':>16} | {put * 1e6:8.2f} us/session on the request path")
+    print(f"{'flush':>16} | {flush * 1e3:8.1f} ms for {count} dirty sessions (background thread)")
+    print(f"{'compaction':>16} | {compact * 1e3:8.1f} ms, log {size / 1e6:.1f} MB -> {len(restored)} sessions")
+    print(f"{'restore':>16} | {restore * 1e3:8.1f} ms for {len(restored)} sessions")
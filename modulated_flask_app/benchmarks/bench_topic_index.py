@@ -0,0 +1,85 @@
+"""Topic filtering on a large bank: what the inverted index costs to build and open, and how fast queries are.
+
+The bank is the real lookup_table.json repeated up to the requested size, so term frequencies (and so
+posting list lengths) look like production rather than synthetic "Option 3 for question 17" text.
+
+Usage: python benchmarks/bench_topic_index.py [num_questions]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bank_store import SQLiteQuestionBank
+from compile_bank import main as compile_main
+from bench_question_bank import DEFAULT_TABLE
+from question_bank import QuestionBank
+from topic_index import sample
+
+QUERIES = [['lambda'], ['s3'], ['lambda', 's3'], ['ec2', 'instance'], ['dynamodb', 'partition', 'key'],
+           ['iam', 'role', 'policy'], ['kubernetes']]
+
+
+def replicated_table(size):
+    with open(DEFAULT_TABLE) as file:
+        source = list(json.load(file).items())
+    table = {}
+    for n in range(size):
+        key, value = source[n % len(source)]
+        number, rest = key.split('. ', 1)
+        # Renumbered and tagged so every copy is its own question
+        table[f"{n + 1}. ({n // len(source)}) {rest}"] = value
+    return table
+
+
+def draw(bank, words, num_questions=10):
+    # What quiz.draw_questions does for a topic quiz, without importing quiz and its session store
+    return sample(bank.match(words), num_questions)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def query_latency(bank, words, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        draw(bank, words)
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, 'lookup_table.json')
+        sqlite_path = os.path.join(directory, 'bank.sqlite')
+        with open(json_path, 'w') as file:
+            json.dump(replicated_table(size), file)
+        _, compile_seconds = timed(lambda: compile_main([json_path, '-o', sqlite_path]))
+
+        json_bank, json_seconds = timed(lambda: QuestionBank.from_json_file(json_path))
+        index, build_seconds = timed(json_bank.index_topics)
+        sqlite_bank, open_seconds = timed(lambda: SQLiteQuestionBank(sqlite_path))
+
+        print(f"{size} questions, {len(index)} terms, compiled with postings in {compile_seconds:.2f} s")
+        print(f"{'json.load + QuestionBank':>26} | {json_seconds * 1e3:9.2f} ms")
+        print(f"{'index build (json)':>26} | {build_seconds * 1e3:9.2f} ms (on a background thread in each serving process)")
+        print(f"{'open compiled bank':>26} | {open_seconds * 1e3:9.2f} ms (postings read per term)")
+        print()
+        print(f"{'query':>26} | {'matches':>8} | {'json bank':>10} | {'compiled cold':>13} | {'compiled warm':>13}")
+        for words in QUERIES:
+            matches = json_bank.match(words)
+            _, cold = timed(lambda: draw(sqlite_bank, words))
+            print(f"{' '.join(words):>26} | {len(matches):8} | {query_latency(json_bank, words) * 1e6:7.1f} us | "
+                  f"{cold * 1e6:10.1f} us | {query_latency(sqlite_bank, words) * 1e6:10.1f} us")
+        _, plain = timed(lambda: [json_bank.sample(10) for _ in range(1000)])
+        print(f"{'(no topic, whole bank)':>26} | {size:8} | {plain / 1000 * 1e6:7.1f} us |")
+        for words in QUERIES:
+            assert list(sqlite_bank.match(words)) == list(json_bank.match(words)), words
+        sqlite_bank.close()
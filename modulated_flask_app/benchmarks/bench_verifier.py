@@ -0,0 +1,56 @@
+"""Verifications per second: verify_slack_request vs. SlackVerifier, for genuine, forged, stale and replayed requests.
+
+Usage: python benchmarks/bench_verifier.py [--requests N]
+"""
+import argparse
+import os
+import sys
+import time
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from slack_payloads import sign
+from utils import SlackVerifier, verify_slack_request
+
+SECRET = 'bench-signing-secret'
+
+
+def rate(func, items):
+    start = time.perf_counter()
+    for headers, body in items:
+        func(headers, body)
+    return len(items) / (time.perf_counter() - start)
+
+
+def legacy(headers, body):
+    # The old handler prelude: header checks, timestamp check, then HMAC
+    if 'X-Slack-Request-Timestamp' not in headers or 'X-Slack-Signature' not in headers:
+        return False
+    timestamp = headers['X-Slack-Request-Timestamp']
+    if abs(time.time() - int(timestamp)) > 60 * 5:
+        return False
+    return verify_slack_request(body, timestamp, headers['X-Slack-Signature'], SECRET)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=50000)
+    args = parser.parse_args()
+
+    bodies = [urlencode({'payload': '{"type":"block_actions","n":%d,"pad":"%s"}' % (i, 'x' * 2000)}).encode()
+              for i in range(args.requests)]
+    genuine = [(sign(body, SECRET), body) for body in bodies]
+    forged = [(sign(body, 'wrong-secret'), body) for body in bodies]
+    stale = [(sign(body, SECRET, timestamp=int(time.time()) - 3600), body) for body in bodies]
+
+    verifier = SlackVerifier(SECRET, replay_size=args.requests * 2)
+    print(f"{'case':>8} | {'legacy/s':>12} | {'verifier/s':>12}")
+    results = [
+        ('genuine', rate(legacy, genuine), rate(verifier.verify, genuine)),
+        ('replayed', rate(legacy, genuine), rate(verifier.verify, genuine)),
+        ('forged', rate(legacy, forged), rate(verifier.verify, forged)),
+        ('stale', rate(legacy, stale), rate(verifier.verify, stale)),
+    ]
+    for label, old, new in results:
+        print(f"{label:>8} | {old:12,.0f} | {new:12,.0f}")
@@ -0,0 +1,187 @@
+"""Reproducible load test: N simulated users take full quizzes with signed Slack requests.
+
+Targets are the Flask test client (in-process), and real local WSGI/ASGI servers. response_url points
+at a local sink. Reports throughput, p50/p99 latency, peak RSS and response_url deliveries, and writes
+them to results/<commit>.json so runs can be compared between commits with --compare.
+
+Usage: python benchmarks/load_test.py [--users N] [--questions N] [--concurrency N]
+                                      [--targets testclient wsgi asgi] [--output PATH] [--compare PATH]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from load_test_asgi import APP_DIR, DEFAULT_TABLE, SIGNING_SECRET, drive, free_port, launch, percentile
+from slack_payloads import ResponseSink, start_quiz_request, block_action_request
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def quiz_requests(user_id, questions, response_url):
+    # Generated lazily so every request is signed with a fresh timestamp
+    yield ('/start_quiz',) + start_quiz_request(SIGNING_SECRET, user_id, questions)
+    for seq in range(questions):
+        for action_id in ('select_answer', 'submit_answer'):
+            yield ('/slack/events',) + block_action_request(SIGNING_SECRET, user_id, action_id, response_url, seq=seq)
+
+
+def wait_for_deliveries(sink, expected, timeout=30):
+    deadline = time.monotonic() + timeout
+    while sink.received < expected and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return sink.received
+
+
+def peak_rss_of(pid):
+    # VmHWM is the peak resident set size; Linux only
+    try:
+        with open(f'/proc/{pid}/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def run_testclient(args, sink):
+    # No snapshot or results database: relative paths would put them in the caller's directory
+    os.environ.update(SLACK_SIGNING_SECRET=SIGNING_SECRET, SLACK_BOT_TOKEN='xoxb-load-test',
+                      LOOKUP_TABLE_PATH=os.environ.get('LOOKUP_TABLE_PATH', DEFAULT_TABLE), SESSION_SNAPSHOT_PATH='',
+                      RESULTS_DB_PATH='')
+    sys.path.insert(0, APP_DIR)
+    random.seed(args.seed)
+    import app
+    import routes
+
+    latencies, errors = [], []
+
+    def user(i):
+        client = app.app.test_client()
+        for path, body, headers in quiz_requests(f"U{i:06d}", args.questions, sink.url):
+            start = time.perf_counter()
+            response = client.post(path, data=body, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(user, range(args.users)))
+    elapsed = time.perf_counter() - start
+    routes.delivery.drain(timeout=30)
+    # ru_maxrss is in KB on Linux; it includes this driver and the sink
+    return latencies, errors, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_server(kind, args, sink, deliveries_target):
+    port = free_port()
+    proc = launch(kind, port, seed=args.seed)
+    try:
+        latencies, errors, elapsed = asyncio.run(
+            drive(f"http://127.0.0.1:{port}", args.users, args.questions, args.concurrency, sink.url))
+        # Deliveries run in the server process, so they must land before it is stopped
+        wait_for_deliveries(sink, deliveries_target)
+        rss = peak_rss_of(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return latencies, errors, elapsed, rss
+
+
+def summarize(latencies, errors, elapsed, rss, deliveries_expected, deliveries_received):
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1e3, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1e3, 3),
+        "max_ms": round(max(latencies) * 1e3, 3),
+        "peak_rss_mb": round(rss, 1) if rss is not None else None,
+        "deliveries_expected": deliveries_expected,
+        "deliveries_received": deliveries_received,
+    }
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=APP_DIR,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('-dirty' if dirty else '')
+
+
+def compare(results, previous_path):
+    with open(previous_path) as file:
+        previous = json.load(file)
+    print(f"vs {previous_path} ({previous['meta']['commit']})")
+    for target, current in results['targets'].items():
+        before = previous['targets'].get(target)
+        if not before:
+            continue
+        changes = []
+        for metric in ('throughput_rps', 'p50_ms', 'p99_ms', 'peak_rss_mb'):
+            if before.get(metric) and current.get(metric) is not None:
+                changes.append(f"{metric} {(current[metric] - before[metric]) / before[metric] * 100:+6.1f}%")
+        print(f"{target:>10} | " + ' | '.join(changes))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--questions', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--targets', nargs='+', default=['testclient', 'wsgi'], choices=['testclient', 'wsgi', 'asgi'])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="defaults to benchmarks/results/<commit>.json")
+    parser.add_argument('--compare', help="an earlier results file to diff against")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "users": args.users,
+            "questions": args.questions,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "targets": {},
+    }
+    sink = ResponseSink()
+    expected = args.users * args.questions
+    for target in args.targets:
+        received_before = sink.received
+        if target == 'testclient':
+            latencies, errors, elapsed, rss = run_testclient(args, sink)
+        else:
+            latencies, errors, elapsed, rss = run_server(target, args, sink, received_before + expected)
+        received = wait_for_deliveries(sink, received_before + expected) - received_before
+        summary = results["targets"][target] = summarize(latencies, errors, elapsed, rss, expected, received)
+        print(f"{target:>10} | {summary['throughput_rps']:8,.0f} req/s | p50 {summary['p50_ms']:7.2f} ms | "
+              f"p99 {summary['p99_ms']:7.2f} ms | peak RSS {summary['peak_rss_mb']} MB | "
+              f"errors {summary['errors']} | delivered {received}/{expected}")
+    sink.close()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f"wrote {output}")
+    if args.compare:
+        compare(results, args.compare)
@@ -0,0 +1,121 @@
+"""Compares req/s and latency of the WSGI app (Flask dev server, or one gunicorn worker) and the ASGI app (uvicorn).
+
+Each simulated user starts a quiz and answers every question with a select + submit, all signed
+with the same scheme Slack uses. response_url points at a local sink.
+
+Usage: python benchmarks/load_test_asgi.py [--users N] [--questions N] [--concurrency N]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from slack_payloads import ResponseSink, start_quiz_request, block_action_request
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_TABLE = os.path.join(APP_DIR, '..', 'flask_app', 'lookup_table.json')
+SIGNING_SECRET = 'load-test-secret'
+# Servers run from the app directory; whatever they write goes here instead, and is removed on exit
+SCRATCH = tempfile.TemporaryDirectory(prefix='quizbot-bench-')
+
+SERVERS = {
+    'wsgi': "import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)",
+    'asgi': "import uvicorn; uvicorn.run('asgi_app:app', host='127.0.0.1', port={port}, log_level='warning')",
+    # One gthread worker: the production launcher (gunicorn.conf.py) on a single process
+    'gunicorn': "import os, sys; from gunicorn.app.wsgiapp import run; os.environ['GUNICORN_WORKERS'] = '1'; "
+                "sys.argv = ['gunicorn', '-c', 'gunicorn.conf.py', '-b', '127.0.0.1:{port}', 'app:app']; run()",
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def launch(kind, port, seed=None, env=None):
+    # No snapshot or results database, so no run starts from an earlier run's sessions
+    scratch = tempfile.mkdtemp(dir=SCRATCH.name)
+    env = dict(os.environ, SLACK_SIGNING_SECRET=SIGNING_SECRET, SLACK_BOT_TOKEN='xoxb-load-test',
+               LOOKUP_TABLE_PATH=os.environ.get('LOOKUP_TABLE_PATH', DEFAULT_TABLE), SESSION_SNAPSHOT_PATH='',
+               RESULTS_DB_PATH='', SESSION_DB_PATH=os.path.join(scratch, 'sessions.db'),
+               SAMPLER_LOG_PATH=os.path.join(scratch, 'answers.log'),
+               BANK_CACHE_PATH=os.path.join(scratch, 'lookup_table.cache.json'), **(env or {}))
+    code = SERVERS[kind].format(port=port)
+    if seed is not None:
+        # Same question draws on every run, so runs are comparable
+        code = f"import random; random.seed({seed}); " + code
+    proc = subprocess.Popen([sys.executable, '-c', code], cwd=APP_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError(f"{kind} server did not start")
+
+
+async def take_quiz(client, user_id, questions, response_url, latencies, errors):
+    async def send(path, body, headers):
+        start = time.perf_counter()
+        response = await client.post(path, content=body, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+    await send('/start_quiz', *start_quiz_request(SIGNING_SECRET, user_id, questions))
+    for seq in range(questions):
+        await send('/slack/events', *block_action_request(SIGNING_SECRET, user_id, 'select_answer', response_url, seq=seq))
+        await send('/slack/events', *block_action_request(SIGNING_SECRET, user_id, 'submit_answer', response_url, seq=seq))
+
+
+async def drive(base_url, users, questions, concurrency, response_url):
+    latencies, errors = [], []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def user(i):
+            async with semaphore:
+                await take_quiz(client, f"U{i:06d}", questions, response_url, latencies, errors)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(users)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--questions', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--servers', nargs='+', default=list(SERVERS))
+    args = parser.parse_args()
+
+    sink = ResponseSink()
+    for kind in args.servers:
+        port = free_port()
+        proc = launch(kind, port)
+        try:
+            latencies, errors, elapsed = asyncio.run(
+                drive(f"http://127.0.0.1:{port}", args.users, args.questions, args.concurrency, sink.url))
+        finally:
+            proc.terminate()
+            proc.wait()
+        print(f"{kind} | {len(latencies) / elapsed:8,.0f} req/s | p50 {percentile(latencies, 0.50) * 1e3:7.2f} ms | "
+              f"p99 {percentile(latencies, 0.99) * 1e3:7.2f} ms | errors {len(errors)}")
+    sink.close()
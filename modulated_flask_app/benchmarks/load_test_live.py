@@ -0,0 +1,139 @@
+"""Live quiz load test: thousands of channel members lock in answers to one shared question at once.
+
+Starts a one-question live quiz on a real local server, with Slack's Web API pointed at a local sink,
+then replays pre-signed "Lock in" clicks as fast as the server takes them. Reports answers/sec and
+latency, answers per second of server CPU (the driver shares the machine, so this is the capacity of
+the server process alone), how many chat.update calls the answers were coalesced into, and checks the
+tally posted when the question closes against the number of answers sent.
+
+Usage: python benchmarks/load_test_live.py [--answers N] [--concurrency N] [--servers asgi gunicorn wsgi]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+import httpx
+
+from bench_launcher import process_tree
+from load_test_asgi import SIGNING_SECRET, free_port, launch, percentile
+from slack_payloads import ResponseSink, live_answer_request, start_quiz_request
+
+
+def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise RuntimeError("timed out waiting for the server")
+        time.sleep(0.05)
+
+
+def cpu_seconds(pid):
+    # utime + stime of the server and its workers (Linux only)
+    ticks = 0
+    for child in process_tree(pid):
+        with open(f'/proc/{child}/stat') as file:
+            fields = file.read().rsplit(')', 1)[1].split()
+        ticks += int(fields[11]) + int(fields[12])
+    return ticks / os.sysconf('SC_CLK_TCK')
+
+
+async def post(port, connection, body, headers):
+    # A bare HTTP/1.1 client: httpx costs more CPU per request than the handler being measured
+    if connection is None:
+        connection = await asyncio.open_connection('127.0.0.1', port)
+    reader, writer = connection
+    head = ''.join(f"{name}: {value}\r\n" for name, value in headers.items())
+    writer.write(f"POST /slack/events HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Length: {len(body)}\r\n{head}\r\n".encode()
+                 + body)
+    status = int((await reader.readline()).split()[1])
+    length, close = 0, False
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.partition(b':')
+        if name.lower() == b'content-length':
+            length = int(value)
+        elif name.lower() == b'connection' and value.strip().lower() == b'close':
+            close = True
+    await reader.readexactly(length)
+    if close:
+        # Flask's dev server answers every request with Connection: close
+        writer.close()
+        connection = None
+    return status, connection
+
+
+async def replay(port, requests, concurrency):
+    latencies, errors = [], []
+
+    async def worker(batch):
+        connection = None
+        for body, headers in batch:
+            start = time.perf_counter()
+            status, connection = await post(port, connection, body, headers)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+        if connection:
+            connection[1].close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(requests[i::concurrency]) for i in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def run(kind, args, sink):
+    port = free_port()
+    proc = launch(kind, port, seed=args.seed, env={'SLACK_API_URL': sink.api_url, 'LIVE_QUESTION_SECONDS': str(args.question_seconds),
+                                   'LIVE_UPDATE_INTERVAL': str(args.update_interval), 'LOG_LEVEL': 'WARNING'})
+    try:
+        before = sink.paths.copy()
+        body, headers = start_quiz_request(SIGNING_SECRET, 'U0HOST', 1, text='live 1')
+        started = time.monotonic()
+        assert httpx.post(f"http://127.0.0.1:{port}/start_quiz", content=body, headers=headers).status_code == 200
+        wait_for(lambda: sink.paths['/api/chat.postMessage'] > before['/api/chat.postMessage'], 10)
+        message = json.loads(sink.last_body['/api/chat.postMessage'])
+        button_value = message["blocks"][1]["elements"][1]["value"]
+        options = len(message["blocks"][1]["elements"][0]["options"])
+
+        # Signed up front, so the replay measures the server rather than the driver's HMACs
+        rng = random.Random(args.seed)
+        requests = [live_answer_request(SIGNING_SECRET, f"U{i:07d}", button_value, message["blocks"],
+                                        selected=(str(rng.randint(1, options)),), response_url=sink.url)
+                    for i in range(args.answers)]
+        updates_before = sink.paths['/api/chat.update']
+        cpu_before = cpu_seconds(proc.pid)
+        latencies, errors, elapsed = asyncio.run(replay(port, requests, args.concurrency))
+        cpu = cpu_seconds(proc.pid) - cpu_before
+        updates = sink.paths['/api/chat.update'] - updates_before
+
+        # The results replace the question message once it closes, followed by the final standings
+        wait_for(lambda: sink.paths['/api/chat.postMessage'] >= before['/api/chat.postMessage'] + 2,
+                 args.question_seconds - (time.monotonic() - started) + 10)
+        results = json.loads(sink.last_body['/api/chat.update'])
+        # "<correct> of <respondents> got it right."
+        counted = int(results["blocks"][2]["text"]["text"].split(' of ')[1].split()[0])
+    finally:
+        proc.terminate()
+        proc.wait()
+    return latencies, errors, elapsed, cpu, updates, counted
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--answers', type=int, default=10000, help="one per simulated channel member")
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--question-seconds', type=int, default=30)
+    parser.add_argument('--update-interval', type=float, default=1.0)
+    parser.add_argument('--servers', nargs='+', default=['asgi', 'gunicorn'], choices=['asgi', 'gunicorn', 'wsgi'])
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sink = ResponseSink()
+    for kind in args.servers:
+        latencies, errors, elapsed, cpu, updates, counted = run(kind, args, sink)
+        print(f"{kind:>8} | {len(latencies) / elapsed:6,.0f} answers/s | {len(latencies) / cpu:6,.0f} answers/server CPU-s | "
+              f"p50 {percentile(latencies, 0.50) * 1e3:6.2f} ms | p99 {percentile(latencies, 0.99) * 1e3:6.2f} ms | "
+              f"errors {len(errors)} | {updates} chat.update calls | counted at close {counted}/{args.answers}")
+    sink.close()
@@ -0,0 +1,162 @@
+"""Helpers for building correctly signed Slack requests and a local response_url sink."""
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode
+
+FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+
+# A Submit click on a question from the bundled bank, as Slack delivered it; requests are built from it
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'block_actions_payload.json')) as file:
+    BLOCK_ACTION = json.load(file)
+# The clicked question's options by value, as they appear in selected_options
+OPTIONS = {option["value"]: option for option in BLOCK_ACTION["message"]["blocks"][-1]["elements"][0]["options"]}
+
+
+def sign(body, signing_secret, timestamp=None):
+    # Same scheme as utils.verify_slack_request
+    timestamp = str(int(time.time())) if timestamp is None else str(timestamp)
+    digest = hmac.new(signing_secret.encode(), b'v0:' + timestamp.encode() + b':' + body, hashlib.sha256).hexdigest()
+    return {
+        'X-Slack-Request-Timestamp': timestamp,
+        'X-Slack-Signature': 'v0=' + digest,
+        'Content-Type': FORM_CONTENT_TYPE,
+    }
+
+
+def start_quiz_request(signing_secret, user_id, num_questions, team_id='T0001', text=None):
+    body = urlencode({
+        'command': '/start_quiz',
+        'text': str(num_questions) if text is None else text,
+        'user_id': user_id,
+        'team_id': team_id,
+        'channel_id': 'C0001',
+    }).encode()
+    return body, sign(body, signing_secret)
+
+
+def block_action_request(signing_secret, user_id, action_id, response_url, selected=('1',), team_id='T0001', seq=0):
+    # A click on a personal quiz question, filled into a captured delivery so that the request carries what
+    # Slack's does: the clicked message echoed back whole, container, channel and the state snapshot
+    action_ts = f"{time.time():.6f}"
+    options = [OPTIONS.get(value, {"value": value}) for value in selected]
+    if action_id == 'select_answer':
+        action = {"action_id": "select_answer", "block_id": "answer_block", "type": "checkboxes",
+                  "selected_options": options, "action_ts": action_ts}
+    else:
+        action = dict(BLOCK_ACTION["actions"][0], action_id=action_id, action_ts=action_ts)
+    payload = dict(BLOCK_ACTION,
+                   user=dict(BLOCK_ACTION["user"], id=user_id, team_id=team_id),
+                   team=dict(BLOCK_ACTION["team"], id=team_id),
+                   trigger_id=f"{user_id}.{seq}.{action_id}",
+                   response_url=response_url,
+                   actions=[action],
+                   state={"values": {"answer_block": {"select_answer": {"type": "checkboxes",
+                                                                          "selected_options": options}}}})
+    # Compact like Slack's own payloads
+    body = urlencode({'payload': json.dumps(payload, separators=(',', ':'))}).encode()
+    return body, sign(body, signing_secret)
+
+
+def live_answer_request(signing_secret, user_id, button_value, blocks, selected=('1',), team_id='T0001',
+                        channel_id='C0001', message_ts='1700000000.000100', response_url='http://localhost/response'):
+    # A "Lock in" click on a live quiz question posted in a channel; blocks are the posted question's, which
+    # Slack echoes back with every click
+    payload = {
+        "type": "block_actions",
+        "user": {"id": user_id},
+        "team": {"id": team_id},
+        "channel": {"id": channel_id},
+        "container": {"type": "message", "channel_id": channel_id, "message_ts": message_ts},
+        "message": {"type": "message", "ts": message_ts, "bot_id": "B0001", "blocks": blocks},
+        "trigger_id": f"{user_id}.{button_value}.live_submit",
+        "response_url": response_url,
+        "actions": [{"action_id": "live_submit", "block_id": "live_answer_block", "type": "button",
+                     "value": button_value, "action_ts": f"{time.time():.6f}"}],
+        "state": {"values": {"live_answer_block": {"live_select": {
+            "type": "checkboxes", "selected_options": [{"value": value} for value in selected]}}}},
+    }
+    body = urlencode({'payload': json.dumps(payload, separators=(',', ':'))}).encode()
+    return body, sign(body, signing_secret)
+
+
+def view_submission_request(signing_secret, user_id, private_metadata, answers, team_id='T0001', view_id='V0001'):
+    # answers: selected option values per question, as a batch quiz modal would submit them
+    payload = {
+        "type": "view_submission",
+        "user": {"id": user_id, "team_id": team_id},
+        "team": {"id": team_id},
+        "trigger_id": f"{user_id}.{view_id}.submit",
+        "view": {
+            "id": view_id,
+            "callback_id": "batch_quiz",
+            "private_metadata": private_metadata,
+            "state": {"values": {f"q{n}": {"answer": {
+                "type": "checkboxes", "selected_options": [{"value": value} for value in selected]}}
+                for n, selected in enumerate(answers)}},
+        },
+    }
+    body = urlencode({'payload': json.dumps(payload)}).encode()
+    return body, sign(body, signing_secret)
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients going away mid keep-alive (e.g. a server under test being stopped) is expected here
+        pass
+
+
+class ResponseSink:
+    """Local stand-in for Slack's response_url and Web API endpoints; counts what it receives.
+
+    Web API calls can be pointed at it with SLACK_API_URL=sink.api_url; per-path counts and the last body
+    posted to each path are kept.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        sink = self
+        self.received = 0
+        self.paths = Counter()
+        self.last_body = {}
+        self._lock = threading.Lock()
+
+        class SinkHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with sink._lock:
+                    sink.received += 1
+                    sink.paths[self.path] += 1
+                    sink.last_body[self.path] = body
+                    count = sink.received
+                self.send_response(200)
+                if self.path.startswith('/api/'):
+                    # Web API calls answer with JSON; chat.postMessage's ts is what later updates need
+                    reply = json.dumps({"ok": True, "channel": json.loads(body or b'{}').get("channel"),
+                                        "ts": f"1700000000.{count:06d}"}).encode()
+                    self.send_header('Content-Type', 'application/json; charset=utf-8')
+                else:
+                    reply = b'ok'
+                self.send_header('Content-Length', str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = _QuietServer((host, port), SinkHandler)
+        self.url = f"http://{host}:{self.server.server_address[1]}/response"
+        self.api_url = f"http://{host}:{self.server.server_address[1]}/api"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
@@ -0,0 +1,82 @@
+"""Build the AWS Lambda deployment package: lambda_app.py, the modules it imports and a compiled bank.
+
+Usage: python build_lambda.py lookup_table.json -o lambda.zip [--dir build/lambda] [--session-backend redis]
+
+Besides the standard library, only the redis client is packaged: instances share no memory or /tmp, so
+a quiz's next click, which may reach another instance, finds its session only in Redis (REDIS_URL).
+Building for any other session backend fails. The bank is validated and compiled (compile_bank.py)
+to bank.sqlite, and every module is shipped with its bytecode, since the function's package directory
+is read-only and a cold start would otherwise compile each module again. Build with the same Python
+version as the function's runtime; bytecode for another version is ignored, not wrong.
+"""
+import argparse
+import compileall
+import os
+import py_compile
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+from compile_bank import main as compile_main
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES = ('lambda_app', 'config', 'bank_loader', 'bank_registry', 'bank_store', 'question_bank', 'topic_index',
+           'quiz', 'render', 'sampler', 'session_store', 'utils', 'slack_handlers', 'live_quiz', 'metrics',
+           'quiz_logging')
+REDIS_REQUIREMENT = 'redis==5.0.8'
+
+
+def build(source, directory):
+    """Writes the unpacked package to directory; returns compile_bank's or pip's exit status."""
+    os.makedirs(directory, exist_ok=True)
+    status = compile_main([source, '-o', os.path.join(directory, 'bank.sqlite')])
+    if status:
+        return status
+    status = subprocess.call([sys.executable, '-m', 'pip', 'install', '--quiet', '--disable-pip-version-check',
+                              '--target', directory, REDIS_REQUIREMENT])
+    if status:
+        return status
+    for module in MODULES:
+        shutil.copy2(os.path.join(APP_DIR, module + '.py'), directory)
+    # Checked by hash rather than mtime, which zip archives only keep to two seconds
+    compileall.compile_dir(directory, quiet=1, optimize=0,
+                           invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+    return 0
+
+
+def write_zip(directory, path):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                archive.write(full, os.path.relpath(full, directory))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='build_lambda', description=__doc__.split('\n', 1)[0])
+    parser.add_argument('source', help="lookup_table.json to compile into the package")
+    parser.add_argument('-o', '--output', required=True, help="zip file to write")
+    parser.add_argument('--dir', help="also keep the unpacked package here")
+    parser.add_argument('--session-backend', default=os.environ.get('SESSION_BACKEND', 'redis'),
+                        help="the function's SESSION_BACKEND; only redis is shared between instances")
+    args = parser.parse_args(argv)
+    if args.session_backend != 'redis':
+        print(f"SESSION_BACKEND={args.session_backend} keeps each Lambda instance's sessions to itself, so quizzes "
+              "would be lost between clicks; deploy with SESSION_BACKEND=redis and a REDIS_URL", file=sys.stderr)
+        return 2
+
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = args.dir or scratch
+        status = build(args.source, directory)
+        if status:
+            print("package did not build; nothing written", file=sys.stderr)
+            return status
+        write_zip(directory, args.output)
+    print(f"wrote {args.output} ({os.path.getsize(args.output) / 1e3:.0f} kB); handler lambda_app.handler")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
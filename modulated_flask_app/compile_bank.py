@@ -0,0 +1,126 @@
+"""quizbot-compile: validate a lookup_table.json and compile it into a prebuilt SQLite bank.
+
+Usage: python compile_bank.py lookup_table.json -o banks/saa.sqlite [--report report.json]
+
+Every entry is checked before anything is written; if any entry is malformed the report lists
+all of them and the command exits non-zero without touching the output file.
+"""
+import argparse
+import hashlib
+import json
+import re
+import sys
+import time
+
+from bank_store import write_sqlite_bank
+from question_bank import parse_entry
+
+KEY_PATTERN = re.compile(r'^\s*(\d+)\. (.+)$', re.S)
+OPTION_PATTERN = re.compile(r'^(\d+)\. \S')
+VALUE_PATTERN = re.compile(r'^\s*(\d+(?:\s*,\s*\d+)*)\. (.+)$', re.S)
+
+
+def validate_entry(key, value):
+    """Returns a list of problems with one lookup_table entry; empty when it is well-formed."""
+    if not isinstance(key, str) or not isinstance(value, str):
+        return ["key and value must both be strings"]
+    problems = []
+    match = KEY_PATTERN.match(key)
+    if not match:
+        return ["key does not start with '<number>. '"]
+    lines = [line.strip() for line in match.group(2).split('\n') if line.strip()]
+    options = lines[1:]
+    if not lines or not lines[0]:
+        problems.append("empty prompt")
+    if len(options) < 2:
+        problems.append(f"expected at least 2 options, found {len(options)}")
+    for position, option in enumerate(options, start=1):
+        option_match = OPTION_PATTERN.match(option)
+        if not option_match:
+            problems.append(f"option {position} is not numbered: {option[:40]!r}")
+        elif int(option_match.group(1)) != position:
+            problems.append(f"option {position} is numbered {option_match.group(1)}")
+
+    value_match = VALUE_PATTERN.match(value)
+    if not value_match:
+        problems.append("answer does not start with '<n>[, <n>...]. '")
+        return problems
+    answers = [answer.strip() for answer in value_match.group(1).split(',')]
+    if len(set(answers)) != len(answers):
+        problems.append(f"duplicate answers {answers}")
+    for answer in answers:
+        if not 1 <= int(answer) <= len(options):
+            problems.append(f"answer {answer} is outside options 1-{len(options)}")
+    if not value_match.group(2).strip():
+        problems.append("empty explanation")
+    return problems
+
+
+def compile_table(lookup_table):
+    """Validates and parses a whole table. Returns (questions, report)."""
+    questions, errors, warnings = [], [], []
+    prompts = {}
+    for index, (key, value) in enumerate(lookup_table.items()):
+        problems = validate_entry(key, value)
+        label = key.split('\n', 1)[0][:80] if isinstance(key, str) else repr(key)
+        if problems:
+            errors.append({"entry": index, "question": label, "problems": problems})
+            continue
+        question = parse_entry(len(questions), key, value)
+        if question.prompt in prompts:
+            warnings.append({"entry": index, "question": label,
+                             "problems": [f"same prompt as entry {prompts[question.prompt]}"]})
+        prompts.setdefault(question.prompt, index)
+        questions.append(question)
+    report = {
+        "entries": len(lookup_table),
+        "valid": len(questions),
+        "errors": errors,
+        "warnings": warnings,
+    }
+    return questions, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='quizbot-compile', description=__doc__.split('\n', 1)[0])
+    parser.add_argument('source', help="lookup_table.json to compile")
+    parser.add_argument('-o', '--output', required=True, help="SQLite bank to write")
+    parser.add_argument('--report', help="also write the validation report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    with open(args.source, 'rb') as file:
+        raw = file.read()
+    try:
+        lookup_table = json.loads(raw)
+    except ValueError as e:
+        print(f"{args.source}: not valid JSON: {e}", file=sys.stderr)
+        return 2
+    if not isinstance(lookup_table, dict):
+        print(f"{args.source}: expected a JSON object of question -> answer", file=sys.stderr)
+        return 2
+
+    questions, report = compile_table(lookup_table)
+    report["source"] = args.source
+    report["version"] = hashlib.sha256(raw).hexdigest()[:16]
+
+    for kind in ("errors", "warnings"):
+        for item in report[kind]:
+            print(f"{kind[:-1]}: entry {item['entry']} ({item['question']!r}): {'; '.join(item['problems'])}",
+                  file=sys.stderr)
+
+    if not report["errors"]:
+        write_sqlite_bank(questions, args.output, version=report["version"])
+        report["output"] = args.output
+    report["seconds"] = round(time.perf_counter() - start, 3)
+
+    if args.report:
+        with open(args.report, 'w') as file:
+            json.dump(report, file, indent=2)
+    print(f"{report['valid']}/{report['entries']} entries valid, {len(report['errors'])} errors, "
+          f"{len(report['warnings'])} warnings" + (f"; wrote {args.output}" if "output" in report else "; nothing written"))
+    return 1 if report["errors"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,68 @@
 import os
 
 SLACK_SIGNING_SECRET = os.environ['SLACK_SIGNING_SECRET']
-SLACK_BOT_TOKEN = os.environ['SLACK_BOT_TOKEN']
\ No newline at end of file
+SLACK_BOT_TOKEN = os.environ['SLACK_BOT_TOKEN']
+SLACK_API_URL = os.environ.get('SLACK_API_URL', 'https://slack.com/api')
+LOOKUP_TABLE_PATH = os.environ.get(
+    'LOOKUP_TABLE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'flask_app', 'lookup_table.json'))
+# A .sqlite path loads a bank prebuilt by compile_bank.py (quizbot-compile) without any parsing
+# When set, the bank is pulled from S3 and hot-reloaded instead of read from LOOKUP_TABLE_PATH
+S3_BUCKET = os.environ.get('S3_BUCKET')
+S3_KEY = os.environ.get('S3_KEY')
+BANK_CACHE_PATH = os.environ.get('BANK_CACHE_PATH', 'lookup_table.cache.json')
+BANK_REFRESH_INTERVAL = int(os.environ.get('BANK_REFRESH_INTERVAL', 60))
+# Extra named banks (<name>.sqlite or <name>.json), picked with e.g. "/start_quiz saa 10"
+BANK_DIR = os.environ.get('BANK_DIR')
+BANK_DEFAULT_NAME = os.environ.get('BANK_DEFAULT_NAME', 'default')
+BANK_MAX_RESIDENT = int(os.environ.get('BANK_MAX_RESIDENT', 4))
+# e.g. "T0123=saa,T0456=sysops"
+BANK_TEAM_DEFAULTS = os.environ.get('BANK_TEAM_DEFAULTS', '')
+
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')
+SESSION_TTL = int(os.environ.get('SESSION_TTL', 3600))
+SESSION_MAX = int(os.environ.get('SESSION_MAX', 10000))
+SESSION_DB_PATH = os.environ.get('SESSION_DB_PATH', 'sessions.db')
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+# Memory backend only: journal sessions to this file so a restart resumes them; empty turns it off
+SESSION_SNAPSHOT_PATH = os.environ.get('SESSION_SNAPSHOT_PATH', 'sessions.snapshot')
+SESSION_SNAPSHOT_INTERVAL = float(os.environ.get('SESSION_SNAPSHOT_INTERVAL', 1.0))
+SHUTDOWN_TIMEOUT = float(os.environ.get('SHUTDOWN_TIMEOUT', 10.0))
+
+DELIVERY_WORKERS = int(os.environ.get('DELIVERY_WORKERS', 4))
+DELIVERY_QUEUE_SIZE = int(os.environ.get('DELIVERY_QUEUE_SIZE', 1000))
+DELIVERY_TIMEOUT = float(os.environ.get('DELIVERY_TIMEOUT', 3.0))
+DELIVERY_MAX_RETRIES = int(os.environ.get('DELIVERY_MAX_RETRIES', 3))
+
+# Answer/quiz history and leaderboard aggregates; an empty path turns recording off
+RESULTS_DB_PATH = os.environ.get('RESULTS_DB_PATH', 'results.db')
+RESULTS_FLUSH_MS = int(os.environ.get('RESULTS_FLUSH_MS', 50))
+
+RENDER_CACHE_SIZE = int(os.environ.get('RENDER_CACHE_SIZE', 1024))
+
+# "/start_quiz live" channel quizzes; they are held by the process that started them, so they are refused
+# when answers could reach another worker. gunicorn.conf.py exports its worker count here, and uvicorn and
+# gunicorn both take it as their default number of workers.
+SERVER_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 1))
+LIVE_QUESTION_SECONDS = int(os.environ.get('LIVE_QUESTION_SECONDS', 30))
+LIVE_UPDATE_INTERVAL = float(os.environ.get('LIVE_UPDATE_INTERVAL', 1.0))
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_PAYLOADS = os.environ.get('LOG_PAYLOADS', '0') == '1'
+# e.g. "slack_events=0.05,block_action=0.05"; events not listed are always logged
+LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', '')
+
+SLACK_MAX_BODY = int(os.environ.get('SLACK_MAX_BODY', 64 * 1024))
+
+# 'state' grades from the selections Slack sends with the submit click and acks checkbox clicks without
+# any work; 'session' stores every checkbox click in the session as before
+ANSWER_SOURCE = os.environ.get('ANSWER_SOURCE', 'state')
+
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 600))
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get('IDEMPOTENCY_MAX_KEYS', 100000))
+
+SAMPLER = os.environ.get('SAMPLER', 'uniform')
+SAMPLER_LOG_PATH = os.environ.get('SAMPLER_LOG_PATH', 'answers.log')
+SAMPLER_RECENT = int(os.environ.get('SAMPLER_RECENT', 50))
+
+# Per-stage latency histograms on /metrics; also toggled at runtime with SIGUSR2
+METRICS_TIMERS = os.environ.get('METRICS_TIMERS', '1') == '1'
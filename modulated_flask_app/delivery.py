@@ -0,0 +1,175 @@
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import PerProcess, api_error
+
+logger = logging.getLogger(__name__)
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+# Queue wait plus every attempt: with retries backing off, a slow post takes tens of seconds to land
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 30.0)
+
+
+class ResponseDelivery:
+    """Posts response_url messages from a pool of background workers so handlers can ack immediately."""
+
+    def __init__(self, workers=4, max_queue=1000, timeout=3.0, max_retries=3, backoff=0.5, latency=None):
+        self.workers = workers
+        # A metrics Histogram observing each delivered post's seconds from submit to Slack's acceptance
+        self.latency = latency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._retries = []
+        self._retry_seq = itertools.count()
+        self._retry_cond = threading.Condition()
+        self._threads = []
+        self._ensure_started = PerProcess(self._start)
+        self._stats_lock = threading.Lock()
+        self.delivered = 0
+        self.failed = 0
+        self.retried = 0
+        self.dropped = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def _start(self):
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.workers)
+        self.http.mount('https://', adapter)
+        self.http.mount('http://', adapter)
+        self._threads = [threading.Thread(target=self._work, name=f"delivery-{i}", daemon=True)
+                         for i in range(self.workers)]
+        self._threads.append(threading.Thread(target=self._schedule_retries, name="delivery-retry", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, url, payload, headers=None):
+        # headers are sent on top of the JSON content type, e.g. a bot token for Web API calls
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((url, payload, 0, time.monotonic(), headers))
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            logger.error("Delivery queue full, dropping response for %s", url)
+            return False
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self._deliver(*item)
+            finally:
+                self._queue.task_done()
+
+    def _post(self, url, payload, headers):
+        # Payloads arrive either pre-serialized by the renderer or as plain dicts
+        if isinstance(payload, bytes):
+            return self.http.post(url, data=payload, headers={**JSON_HEADERS, **(headers or {})}, timeout=self.timeout)
+        return self.http.post(url, json=payload, headers=headers, timeout=self.timeout)
+
+    def _succeeded(self, url, response):
+        # Web API calls report most failures (not_in_channel, expired_trigger_id) in a 200's body
+        error = api_error(response.headers.get('Content-Type'), response.content)
+        if error:
+            logger.error("Slack rejected the post to %s: %s", url, error)
+        return response.status_code < 400 and error is None
+
+    def _record(self, ok, enqueued_at):
+        with self._stats_lock:
+            if ok:
+                latency = time.monotonic() - enqueued_at
+                self.delivered += 1
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+            else:
+                self.failed += 1
+        if ok and self.latency is not None:
+            self.latency.observe(latency)
+
+    def call(self, url, payload, headers=None):
+        """Posts in the calling thread, for Web API calls whose reply is needed (the ts of chat.postMessage).
+
+        Returns the reply's JSON, {"ok": false, ...} included, or None when there was no JSON reply. One
+        attempt: a retried chat.postMessage could post twice.
+        """
+        self._ensure_started()
+        started = time.monotonic()
+        try:
+            response = self._post(url, payload, headers)
+        except requests.RequestException as e:
+            logger.error("Call to %s failed: %s", url, e)
+            self._record(False, started)
+            return None
+        self._record(self._succeeded(url, response), started)
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    def _deliver(self, url, payload, attempt, enqueued_at, headers=None):
+        try:
+            response = self._post(url, payload, headers)
+            retryable = response.status_code == 429 or response.status_code >= 500
+            ok = self._succeeded(url, response)
+        except requests.RequestException as e:
+            logger.warning("Delivery to %s failed: %s", url, e)
+            retryable, ok = True, False
+
+        if ok:
+            self._record(True, enqueued_at)
+        elif retryable and attempt < self.max_retries:
+            with self._stats_lock:
+                self.retried += 1
+            with self._retry_cond:
+                due = time.monotonic() + self.backoff * (2 ** attempt)
+                heapq.heappush(self._retries, (due, next(self._retry_seq), (url, payload, attempt + 1, enqueued_at, headers)))
+                self._retry_cond.notify()
+        else:
+            self._record(False, enqueued_at)
+            logger.error("Giving up on delivery to %s after %d attempts", url, attempt + 1)
+
+    def _schedule_retries(self):
+        while True:
+            with self._retry_cond:
+                while not self._retries or self._retries[0][0] > time.monotonic():
+                    wait = self._retries[0][0] - time.monotonic() if self._retries else None
+                    self._retry_cond.wait(wait)
+                _, _, item = heapq.heappop(self._retries)
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                with self._stats_lock:
+                    self.dropped += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "retry_depth": len(self._retries),
+                "delivered": self.delivered,
+                "failed": self.failed,
+                "retried": self.retried,
+                "dropped": self.dropped,
+                "latency_avg": self.latency_total / self.delivered if self.delivered else 0.0,
+                "latency_max": self.latency_max,
+            }
+
+    def drain(self, timeout=None):
+        # Waits for queued messages (not pending retries) to be attempted
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
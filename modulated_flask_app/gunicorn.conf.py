@@ -0,0 +1,55 @@
+"""Production launcher: gunicorn -c gunicorn.conf.py app:app
+
+The app (and with it the parsed question bank) is loaded once in the master and shared copy-on-write
+by the workers. Tunable with GUNICORN_BIND, GUNICORN_WORKERS, GUNICORN_THREADS, GUNICORN_TIMEOUT
+and GUNICORN_PRELOAD. Set the worker count with GUNICORN_WORKERS rather than -w: the app reads it
+while loading, before command line options are applied.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Read by config as SERVER_WORKERS; live quizzes are refused when answers could land on another worker
+os.environ['WEB_CONCURRENCY'] = str(workers)
+# Per-process session state would split a user's quiz across workers
+if workers > 1:
+    os.environ.setdefault('SESSION_BACKEND', 'sqlite')
+
+# No collections while the app loads; freezing afterwards moves everything loaded so far out of the
+# collector's reach, so workers never write to (and un-share) those pages just by scanning them
+gc.disable()
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded, before the first worker is forked
+    gc.freeze()
+    server.log.info("Froze %d objects before forking", gc.get_freeze_count())
+    if server.cfg.workers != workers:
+        server.log.warning("Running %d workers, but the app was loaded for %d; set GUNICORN_WORKERS instead of -w",
+                           server.cfg.workers, workers)
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def post_worker_init(worker):
+    # Threads do not survive fork, so logging's queue listener is started per worker, after gunicorn
+    # has installed its own signal handlers. Delivery, results and bank refresh threads start on first use.
+    from app import setup_process
+
+    setup_process()
+
+
+def worker_exit(server, worker):
+    # Runs in the worker after it has stopped accepting requests and finished the ones in flight
+    from routes import shutdown
+
+    shutdown()
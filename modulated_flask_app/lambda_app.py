@@ -0,0 +1,186 @@
+"""AWS Lambda entry point for the Slack endpoints, serving the same contracts as routes.py without Flask.
+
+Takes API Gateway (REST or HTTP API) and function URL events; the handler is lambda_app.handler.
+A cold start imports only the standard library and the quiz modules, and opens the compiled bank shipped
+inside the package (build_lambda.py) without parsing it. Everything opened or parsed lives at module scope,
+so warm invocations reuse it.
+
+Lambda freezes the process between invocations, so nothing runs in the background: response_url and Web
+API posts are made before the handler returns, and live quizzes, which need a ticker, are not offered.
+Sessions are kept in Redis (REDIS_URL), since instances share no memory and a quiz's next click may reach
+another one; build_lambda.py packages the client and refuses to build for any other backend.
+"""
+import base64
+import json
+import logging
+import os
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# The package directory is read-only and only /tmp is writable; these apply unless the function's
+# environment says otherwise, and must be set before config is read
+for name, value in (('LOOKUP_TABLE_PATH', os.path.join(PACKAGE_DIR, 'bank.sqlite')), ('SESSION_SNAPSHOT_PATH', ''),
+                    ('SESSION_BACKEND', 'redis'), ('SESSION_DB_PATH', '/tmp/sessions.db'), ('RESULTS_DB_PATH', ''),
+                    ('SAMPLER_LOG_PATH', '/tmp/answers.log')):
+    os.environ.setdefault(name, value)
+
+from config import (SLACK_SIGNING_SECRET, SLACK_BOT_TOKEN, SLACK_API_URL, SLACK_MAX_BODY, LOOKUP_TABLE_PATH,
+                    RENDER_CACHE_SIZE, DELIVERY_TIMEOUT, IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_KEYS, SAMPLER,
+                    SAMPLER_LOG_PATH, SAMPLER_RECENT, BANK_DIR, BANK_DEFAULT_NAME, BANK_MAX_RESIDENT,
+                    BANK_TEAM_DEFAULTS, ANSWER_SOURCE, LOG_LEVEL, LOG_PAYLOADS, LOG_SAMPLE_RATES, SESSION_BACKEND)
+from bank_loader import load_banks
+from bank_registry import BankRegistry, parse_team_defaults
+from metrics import Metrics
+from quiz import session_store
+from quiz_logging import EventLogger, parse_sample_rates
+from render import QuestionRenderer
+from sampler import create_sampler
+from slack_handlers import SlackHandlers, Reply, ok, json_reply
+from utils import SlackVerifier, TTLCache, api_error, parse_form, decode_interaction, is_select_click
+
+logger = logging.getLogger(__name__)
+logger.setLevel(LOG_LEVEL)
+if SESSION_BACKEND != 'redis':
+    logger.warning("SESSION_BACKEND=%s keeps sessions in this instance only; quizzes will be lost between clicks "
+                   "that reach other instances", SESSION_BACKEND)
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+BOT_HEADERS = {'Content-Type': 'application/json', 'Authorization': f"Bearer {SLACK_BOT_TOKEN}"}
+
+# S3 hot reload needs boto3 and a refresh thread; a function ships its bank and is redeployed to change it
+banks, _ = load_banks(LOOKUP_TABLE_PATH)
+renderer = QuestionRenderer(cache_size=RENDER_CACHE_SIZE)
+sampler = create_sampler(SAMPLER, banks.current, log_path=SAMPLER_LOG_PATH, recent_size=SAMPLER_RECENT)
+banks.on_swap(sampler.rebind)
+registry = BankRegistry(banks, bank_dir=BANK_DIR, default_name=BANK_DEFAULT_NAME, max_resident=BANK_MAX_RESIDENT,
+                        team_defaults=parse_team_defaults(BANK_TEAM_DEFAULTS))
+verifier = SlackVerifier(SLACK_SIGNING_SECRET, max_body=SLACK_MAX_BODY)
+interactions = TTLCache(max_size=IDEMPOTENCY_MAX_KEYS, ttl=IDEMPOTENCY_TTL)
+# Nothing scrapes a function, so timers stay off. A results database on one instance's /tmp would only
+# ever see that instance's quizzes, and live quizzes need a ticker, so neither is offered.
+handlers = SlackHandlers(renderer, registry, sampler,
+                         EventLogger(logger, parse_sample_rates(LOG_SAMPLE_RATES), debug_payloads=LOG_PAYLOADS),
+                         Metrics(enabled=False), interactions,
+                         lambda method, body: post_now(f"{SLACK_API_URL}/{method}", body, BOT_HEADERS),
+                         answer_source=ANSWER_SOURCE)
+
+
+class Headers(dict):
+    """Request headers, looked up case-insensitively as in Flask and Starlette (HTTP APIs lowercase them)."""
+
+    def __init__(self, headers):
+        super().__init__((name.lower(), value) for name, value in (headers or {}).items())
+
+    def get(self, name, default=None):
+        return super().get(name.lower(), default)
+
+
+def post_now(url, body, headers=JSON_HEADERS):
+    """Posts and returns the reply's JSON, or None when the post failed or the reply was not JSON."""
+    # urllib.request brings http.client, email and ssl with it, so cold starts that post nothing skip it
+    import urllib.error
+    import urllib.request
+
+    # One attempt within the invocation: a retry could push the ack past Slack's three seconds,
+    # after which Slack redelivers the interaction anyway
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=body, headers=headers),
+                                    timeout=DELIVERY_TIMEOUT) as result:
+            content_type, reply = result.headers.get('Content-Type'), result.read()
+    except (urllib.error.URLError, OSError) as e:
+        logger.error("Delivery to %s failed: %s", url, e)
+        return None
+    # Web API calls report most failures (not_in_channel, expired_trigger_id) in a 200's body
+    error = api_error(content_type, reply)
+    if error:
+        logger.error("Slack rejected the post to %s: %s", url, error)
+    try:
+        return json.loads(reply)
+    except ValueError:
+        return None
+
+
+def respond(reply):
+    # The process may be frozen as soon as the handler returns, so everything happens before it does
+    if reply.save:
+        session_id, session = reply.save
+        if session is None:
+            session_store.delete(session_id)
+        else:
+            session_store.put(session_id, session)
+    for url, body, headers in reply.posts:
+        post_now(url, body, headers or JSON_HEADERS)
+    return {'statusCode': reply.status, 'headers': JSON_HEADERS, 'body': reply.body.decode()}
+
+
+def reject_unverified(headers, body):
+    """The response to send instead of handling the request, or None for a genuine one."""
+    error = verifier.check_headers(headers, len(body))
+    if error is None:
+        error = verifier.check_body(headers, body)
+    if error is None:
+        return None
+    return respond(handlers.rejected(error, headers.get('X-Slack-Retry-Num')))
+
+
+def start_quiz(headers, body):
+    handlers.events.event("start_quiz")
+    rejection = reject_unverified(headers, body)
+    if rejection:
+        return rejection
+    form = parse_form(body)
+    try:
+        return respond(handlers.start_quiz(form))
+    except Exception as e:
+        return respond(handlers.failed('start_quiz', e))
+
+
+def leaderboard(headers, body):
+    handlers.events.event("leaderboard")
+    rejection = reject_unverified(headers, body)
+    if rejection:
+        return rejection
+    form = parse_form(body)
+    return respond(handlers.leaderboard(form))
+
+
+def slack_events(headers, body):
+    handlers.events.event("slack_events")
+    rejection = reject_unverified(headers, body)
+    if rejection:
+        return rejection
+    payload = decode_interaction(parse_form(body))
+    if ANSWER_SOURCE == 'state' and is_select_click(payload):
+        # Selections are read from the state snapshot on submit, so a checkbox click needs no work
+        # beyond the signature check: a forged one must not get a success response either
+        return respond(Reply())
+
+    try:
+        interaction = handlers.interaction(payload)
+        if interaction is None:
+            return respond(ok())
+        try:
+            # One invocation at a time per instance, so no session locks
+            session = None
+            if handlers.needs_session(interaction.action_id):
+                session = session_store.get(interaction.session_id)
+            return respond(handlers.block_action(interaction, session))
+        except Exception:
+            handlers.forget(interaction)
+            raise
+    except Exception as e:
+        return respond(handlers.failed('slack_events', e))
+
+
+ROUTES = {'/start_quiz': start_quiz, '/slack/events': slack_events, '/leaderboard': leaderboard}
+
+
+def handler(event, context=None):
+    # REST APIs send path and httpMethod; HTTP APIs and function URLs send rawPath, which keeps any stage prefix
+    path = event.get('rawPath') or event.get('path') or ''
+    method = event.get('httpMethod') or ((event.get('requestContext') or {}).get('http') or {}).get('method')
+    route = next((route for suffix, route in ROUTES.items() if path.rstrip('/').endswith(suffix)), None)
+    if route is None or method != 'POST':
+        return respond(json_reply({"error": "Not found"}, 404))
+    body = event.get('body') or ''
+    body = base64.b64decode(body) if event.get('isBase64Encoded') else body.encode()
+    return route(Headers(event.get('headers')), body)
@@ -0,0 +1,256 @@
+import logging
+import secrets
+import threading
+import time
+
+from quiz import session_key
+from utils import PerProcess
+
+logger = logging.getLogger(__name__)
+
+ACCEPTED = "accepted"
+ALREADY_ANSWERED = "already_answered"
+CLOSED = "closed"
+
+
+class LiveQuizNotPosted(Exception):
+    """chat.postMessage refused the quiz's first question; args[0] is Slack's error, e.g. not_in_channel."""
+
+
+class ShardedCounters:
+    """Fixed-size counters split into one shard per thread, so concurrent increments never share a lock.
+
+    Only the owning thread writes to a shard; readers sum every shard and may trail the writers slightly.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._shards = []
+        self._local = threading.local()
+        # Taken once per thread, when it first touches these counters
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = [0] * self.size
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def add(self, index, amount=1):
+        self._shard()[index] += amount
+
+    def totals(self):
+        totals = [0] * self.size
+        for shard in list(self._shards):
+            for index, value in enumerate(shard):
+                totals[index] += value
+        return totals
+
+
+class LiveQuestion:
+    def __init__(self, number, question, closes_at, closes_at_epoch):
+        self.number = number
+        self.question = question
+        self.closes_at = closes_at
+        self.closes_at_epoch = closes_at_epoch
+        # user_id -> selected option values; the first lock-in counts
+        self.votes = {}
+        # One counter per option plus a last one for the number of respondents
+        self.counters = ShardedCounters(len(question.options) + 1)
+        self.channel_id = None
+        self.message_ts = None
+        self.rendered_answers = 0
+        self.closed = False
+        # (counts, respondents, per-user correctness), set once the votes have been graded
+        self.tally = None
+        # Held only for the closed check and the insert, so closing sees a vote dict nobody is writing to
+        self._lock = threading.Lock()
+
+    def vote(self, user_id, selected):
+        with self._lock:
+            if self.closed:
+                return CLOSED
+            if user_id in self.votes:
+                return ALREADY_ANSWERED
+            self.votes[user_id] = selected
+        options = len(self.question.options)
+        for value in selected:
+            if value.isdigit() and 0 < int(value) <= options:
+                self.counters.add(int(value) - 1)
+        self.counters.add(options)
+        return ACCEPTED
+
+    def close(self):
+        """Stops accepting votes; returns (per-option counts, respondents, {user_id: correct}) for the votes cast."""
+        with self._lock:
+            self.closed = True
+        # No vote can be added once closed is set, so the dict is read without the lock
+        counts = [0] * len(self.question.options)
+        correct = {}
+        for user_id, selected in self.votes.items():
+            for value in selected:
+                if value.isdigit() and 0 < int(value) <= len(counts):
+                    counts[int(value) - 1] += 1
+            correct[user_id] = set(selected) == self.question.correct
+        return counts, len(self.votes), correct
+
+
+class LiveQuiz:
+    def __init__(self, quiz_id, channel_id, team_id, bank_name, bank, question_ids):
+        self.id = quiz_id
+        self.channel_id = channel_id
+        self.team_id = team_id
+        self.bank_name = bank_name
+        self.bank = bank
+        self.question_ids = question_ids
+        self.current = None
+        self.scores = {}
+
+    @property
+    def total(self):
+        return len(self.question_ids)
+
+    def button_value(self, number):
+        return f"{self.id}:{number}"
+
+
+class LiveQuizzes:
+    """Channel-wide quizzes: one shared question at a time, answered by everyone in the channel.
+
+    Answers only touch the current question's vote dict and sharded counters. A ticker thread refreshes
+    each question message with chat.update at most once per update_interval, and closes questions when
+    their time is up, grading every vote in one pass. Quizzes live in the process that started them.
+    """
+
+    def __init__(self, renderer, publish, call, question_seconds=30, update_interval=1.0, results=None,
+                 clock=time.monotonic, wall_clock=time.time):
+        self.renderer = renderer
+        # publish(method, body) sends a Web API call, e.g. chat.update, without waiting for it
+        self.publish = publish
+        # call(method, body) sends one and returns its JSON reply (None if there was none); questions are
+        # posted this way for the ts that later updates need
+        self.call = call
+        self.question_seconds = question_seconds
+        self.update_interval = update_interval
+        self.results = results
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._by_channel = {}
+        self._by_id = {}
+        self._lock = threading.Lock()
+        self._ensure_started = PerProcess(self._start)
+        self._answers = ShardedCounters(1)
+        self.updates = 0
+
+    def __len__(self):
+        return len(self._by_id)
+
+    @property
+    def answers(self):
+        return self._answers.totals()[0]
+
+    def _start(self):
+        threading.Thread(target=self._run, name="live-quiz", daemon=True).start()
+
+    def start(self, channel_id, team_id, bank_name, bank, question_ids):
+        """Starts a quiz in the channel and posts its first question; returns None if one is already running.
+
+        Raises LiveQuizNotPosted, with no quiz left running, when Slack refuses the question.
+        """
+        with self._lock:
+            if channel_id in self._by_channel:
+                return None
+            quiz = LiveQuiz(secrets.token_hex(4), channel_id, team_id, bank_name, bank, question_ids)
+            self._by_channel[channel_id] = quiz
+            self._by_id[quiz.id] = quiz
+        error = self._next_question(quiz)
+        if error:
+            self._remove(quiz)
+            raise LiveQuizNotPosted(error)
+        self._ensure_started()
+        return quiz
+
+    def answer(self, button_value, user_id, selected):
+        """Records a lock-in from the question message's button; returns ACCEPTED, ALREADY_ANSWERED or CLOSED."""
+        quiz_id, _, number = button_value.partition(':')
+        quiz = self._by_id.get(quiz_id)
+        question = quiz.current if quiz else None
+        if question is None or str(question.number) != number:
+            return CLOSED
+        status = question.vote(user_id, selected)
+        if status == ACCEPTED:
+            self._answers.add(0)
+        return status
+
+    def _run(self):
+        while True:
+            time.sleep(self.update_interval)
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error("Live quiz update failed: %s", e)
+
+    def tick(self):
+        now = self._clock()
+        for quiz in list(self._by_id.values()):
+            question = quiz.current
+            if question is None:
+                continue
+            if now >= question.closes_at:
+                self._close(quiz, question)
+                continue
+            answers = question.counters.totals()[-1]
+            # Coalesced: however many answers arrived since the last tick, the message is updated once
+            if question.message_ts and answers != question.rendered_answers:
+                question.rendered_answers = answers
+                self.updates += 1
+                self.publish('chat.update', self.renderer.live_question(
+                    question.channel_id, question.question, question.number, quiz.total,
+                    quiz.button_value(question.number), answers, question.closes_at_epoch, ts=question.message_ts))
+
+    def _next_question(self, quiz):
+        """Posts the quiz's next question; returns Slack's error if the post failed, else None."""
+        number = quiz.current.number + 1 if quiz.current else 1
+        question = LiveQuestion(number, quiz.bank[quiz.question_ids[number - 1]], self._clock() + self.question_seconds,
+                                self._wall_clock() + self.question_seconds)
+        reply = self.call('chat.postMessage', self.renderer.live_question(
+            quiz.channel_id, question.question, number, quiz.total, quiz.button_value(number), 0,
+            question.closes_at_epoch)) or {}
+        if not reply.get('ok'):
+            return reply.get('error') or 'no_reply'
+        question.channel_id, question.message_ts = reply.get('channel') or quiz.channel_id, reply.get('ts')
+        quiz.current = question
+        return None
+
+    def _remove(self, quiz):
+        with self._lock:
+            del self._by_channel[quiz.channel_id]
+            del self._by_id[quiz.id]
+
+    def _close(self, quiz, question):
+        # A failure below leaves the question for the next tick to close again; its votes are only scored once
+        if question.tally is None:
+            question.tally = question.close()
+            for user_id, correct in question.tally[2].items():
+                quiz.scores[user_id] = quiz.scores.get(user_id, 0) + correct
+                if self.results:
+                    self.results.record_answer(session_key(quiz.team_id, user_id), quiz.bank_name,
+                                               question.question.id, correct)
+        counts, respondents, correct = question.tally
+        correct_count = sum(correct.values())
+        self.publish('chat.update', self.renderer.live_results(
+            question.channel_id, question.question, question.number, quiz.total, counts, respondents,
+            correct_count, ts=question.message_ts))
+        if question.number < quiz.total:
+            error = self._next_question(quiz)
+            if error is None:
+                return
+            # Nobody can answer a question that was never posted, so the quiz ends with the scores so far
+            logger.error("Live quiz %s could not post question %d: %s", quiz.id, question.number + 1, error)
+        if self.results:
+            for user_id, score in quiz.scores.items():
+                self.results.record_quiz(session_key(quiz.team_id, user_id), quiz.bank_name, score, quiz.total)
+        self.publish('chat.postMessage', self.renderer.live_standings(quiz.channel_id, quiz.scores, quiz.total))
+        self._remove(quiz)
@@ -0,0 +1,70 @@
+import json
+import random
+
+from topic_index import LazyTopicIndex
+
+
+class Question:
+    __slots__ = ('id', 'prompt', 'options', 'correct', 'explanation')
+
+    def __init__(self, id, prompt, options, correct, explanation):
+        self.id = id
+        self.prompt = prompt
+        self.options = options
+        self.correct = correct
+        self.explanation = explanation
+
+    def __repr__(self):
+        return f"Question(id={self.id}, prompt={self.prompt[:40]!r})"
+
+
+def parse_entry(qid, key, value):
+    # Keys look like "12. Prompt\n   1. opt\n   2. opt", values like "2, 4. Explanation"
+    question_parts = key.split('. ', 1)
+    lines = [part.strip() for part in question_parts[1].split('\n') if part.strip()]
+    correct_answer, explanation = value.split('. ', 1)
+    correct = frozenset(answer.strip() for answer in correct_answer.split(','))
+    return Question(qid, lines[0], tuple(lines[1:]), correct, explanation)
+
+
+class QuestionBank:
+    def __init__(self, questions, version=None):
+        self._questions = tuple(questions)
+        self.version = version
+        self._topics = LazyTopicIndex(lambda: self._questions)
+
+    @classmethod
+    def from_dict(cls, lookup_table, version=None):
+        return cls((parse_entry(qid, key, value) for qid, (key, value) in enumerate(lookup_table.items())), version)
+
+    @classmethod
+    def from_json_file(cls, file_path, version=None):
+        with open(file_path, 'r') as file:
+            return cls.from_dict(json.load(file), version)
+
+    def __len__(self):
+        return len(self._questions)
+
+    def __getitem__(self, qid):
+        return self._questions[qid]
+
+    def __iter__(self):
+        return iter(self._questions)
+
+    def sample(self, k):
+        # Sampling from a range avoids copying the question list on every quiz start
+        return random.sample(range(len(self._questions)), k)
+
+    @property
+    def topics(self):
+        # Raises TopicIndexNotReady while the index is being built (compiled banks ship it prebuilt)
+        return self._topics.get()
+
+    def index_topics(self):
+        return self._topics.build()
+
+    def index_topics_in_background(self):
+        self._topics.start()
+
+    def match(self, words):
+        return self.topics.match(words)
@@ -1,62 +1,112 @@
-import random
-from uuid import uuid4
+import json
 
-quiz_sessions = {}
+from config import (SESSION_BACKEND, SESSION_TTL, SESSION_MAX, SESSION_DB_PATH, REDIS_URL, SESSION_SNAPSHOT_PATH,
+                    SESSION_SNAPSHOT_INTERVAL)
+from session_store import create_session_store
+from topic_index import sample
 
-def start_new_session(user_id, num_questions, lookup_table):
-    questions = list(lookup_table.keys())
-    session_id = str(uuid4())
-    quiz_sessions[user_id] = {
-        "questions": random.sample(questions, num_questions),
+session_store = create_session_store(SESSION_BACKEND, ttl=SESSION_TTL, max_sessions=SESSION_MAX,
+                                     db_path=SESSION_DB_PATH, redis_url=REDIS_URL,
+                                     snapshot_path=SESSION_SNAPSHOT_PATH, snapshot_interval=SESSION_SNAPSHOT_INTERVAL)
+
+# Pure session logic; slack_handlers decides what is stored, and each server stores it its own way
+
+QUIZ_MODES = ('batch', 'live')
+
+def split_modes(words):
+    """Splits the words parse_command left over into quiz modes and topic words ("batch lambda s3")."""
+    modes = {word.lower() for word in words if word.lower() in QUIZ_MODES}
+    return modes, [word for word in words if word.lower() not in QUIZ_MODES]
+
+def no_match_text(topics):
+    return f"No questions in this bank mention all of: {' '.join(topics)}."
+
+def session_key(team_id, user_id):
+    # User ids are only unique within a workspace
+    return f"{team_id}:{user_id}" if team_id else user_id
+
+def draw_questions(bank, num_questions, sampler=None, user_id=None, topics=None):
+    """Question ids for a new quiz; with topic words, only questions mentioning all of them (maybe fewer than asked)."""
+    matches = bank.match(topics) if topics else None
+    if matches is not None:
+        # The adaptive sampler weighs the whole bank, so topic quizzes draw uniformly from the matches
+        return sample(matches, num_questions)
+    return sampler.draw(user_id, num_questions) if sampler else bank.sample(num_questions)
+
+def new_session(num_questions, bank, sampler=None, user_id=None, bank_name=None, topics=None):
+    questions = draw_questions(bank, num_questions, sampler, user_id, topics)
+    return {
+        "bank": bank_name,
+        "bank_version": bank.version,
+        "questions": questions,
         "current_question": 0,
         "score": 0,
-        "num_questions": num_questions,
+        "num_questions": len(questions),
         "selected_answers": []
     }
-    return quiz_sessions[user_id]
-
-def get_current_question(user_id):
-    session = quiz_sessions.get(user_id)
-    if session:
-        current_question = session["questions"][session["current_question"]]
-        question_parts = current_question.split('. ', 1)
-        options = [part.strip() for part in question_parts[1].split('\n') if part.strip()]
-        return current_question, options
-    return None, None
-
-def update_session_with_answer(user_id, selected_answers):
-    session = quiz_sessions.get(user_id)
-    if session:
-        session["selected_answers"] = selected_answers
-        return session
-    return None
-
-def process_answer(user_id, lookup_table):
-    session = quiz_sessions.get(user_id)
-    if not session:
-        return None, "Invalid session"
-
-    current_question = session["questions"][session["current_question"]]
-    correct_answer, explanation = lookup_table[current_question].split('. ', 1)
-
-    correct_answers_set = set([answer.strip() for answer in correct_answer.split(',')])
-    user_answers_set = set(session["selected_answers"])
-
-    if user_answers_set == correct_answers_set:
+
+def get_current_question(session, bank):
+    return bank[session["questions"][session["current_question"]]]
+
+def grade_answer(session, bank, sampler=None, user_id=None, results=None):
+    """Grades the selected answers, records the outcome with the sampler and results store and advances the session.
+
+    Returns (response_text, next_question, question_number); next_question is None once the quiz is over.
+    """
+    question = get_current_question(session, bank)
+
+    correct = set(session["selected_answers"]) == question.correct
+    if sampler:
+        sampler.record(user_id, question.id, correct)
+    if results:
+        results.record_answer(user_id, session.get("bank"), question.id, correct)
+
+    if correct:
         session["score"] += 1
         response_text = "That's correct!\n"
     else:
-        response_text = f"That's incorrect. Correct answer(s): {', '.join(correct_answers_set)}\n"
-    
-    response_text += f"Explanation: {explanation}\n"
+        response_text = f"That's incorrect. Correct answer(s): {', '.join(sorted(question.correct))}\n"
+
+    response_text += f"Explanation: {question.explanation}\n"
 
     session["current_question"] += 1
     session["selected_answers"] = []
 
     if session["current_question"] < session["num_questions"]:
-        next_question, options = get_current_question(user_id)
-        return response_text, next_question, options
-    else:
-        response_text += f"Quiz completed! Your score is {session['score']}/{session['num_questions']}."
-        del quiz_sessions[user_id]
-        return response_text, None, None
\ No newline at end of file
+        return response_text, get_current_question(session, bank), session["current_question"] + 1
+    if results:
+        results.record_quiz(user_id, session.get("bank"), session["score"], session["num_questions"])
+    response_text += f"Quiz completed! Your score is {session['score']}/{session['num_questions']}."
+    return response_text, None, None
+
+def batch_metadata(session):
+    # Batch quizzes keep no server-side session; the modal carries its questions in private_metadata
+    return json.dumps({key: session[key] for key in ("bank", "bank_version", "questions")}, separators=(',', ':'))
+
+def batch_session(metadata):
+    fields = json.loads(metadata)
+    return dict(fields, current_question=0, score=0, num_questions=len(fields["questions"]), selected_answers=[])
+
+def grade_batch(session, bank, selections, sampler=None, user_id=None, results=None):
+    """Grades every question of a batch quiz in one pass.
+
+    selections holds the selected option values per question, in quiz order. Returns (summary, feedback).
+    """
+    questions = [bank[qid] for qid in session["questions"]]
+    outcomes = [set(selected) == question.correct for question, selected in zip(questions, selections)]
+    session["score"] = sum(outcomes)
+
+    feedback = []
+    for number, (question, correct) in enumerate(zip(questions, outcomes), start=1):
+        if sampler:
+            sampler.record(user_id, question.id, correct)
+        if results:
+            results.record_answer(user_id, session.get("bank"), question.id, correct)
+        if correct:
+            verdict = "That's correct!"
+        else:
+            verdict = f"That's incorrect. Correct answer(s): {', '.join(sorted(question.correct))}"
+        feedback.append(f"*Question {number}:* {verdict}\nExplanation: {question.explanation}")
+    if results:
+        results.record_quiz(user_id, session.get("bank"), session["score"], session["num_questions"])
+    return f"Quiz completed! Your score is {session['score']}/{session['num_questions']}.", feedback
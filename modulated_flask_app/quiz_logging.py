@@ -0,0 +1,97 @@
+import atexit
+import json
+import logging
+import random
+
+
+class JsonFormatter(logging.Formatter):
+    """One compact JSON object per line; structured fields ride along on record.fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, separators=(',', ':'), default=str)
+
+
+class DeferredQueueHandler(logging.Handler):
+    """logging.handlers.QueueHandler without its prepare(), which formats on the caller's thread.
+
+    Records go on the queue as they are and the listener does all formatting. Not a subclass, so that
+    importing EventLogger alone (the Lambda handler) does not pull in logging.handlers and socket.
+    """
+
+    def __init__(self, queue):
+        super().__init__()
+        self.queue = queue
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except Exception:
+            self.handleError(record)
+
+
+class EventLogger:
+    """Structured, sampled event logging. Nothing is formatted unless the record is actually emitted."""
+
+    def __init__(self, logger, sample_rates=None, debug_payloads=False):
+        self.logger = logger
+        self.sample_rates = sample_rates or {}
+        self.debug_payloads = debug_payloads
+
+    def event(self, name, level=logging.INFO, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        # Warnings and errors are never sampled away
+        if level < logging.WARNING:
+            rate = self.sample_rates.get(name, 1.0)
+            if rate < 1.0 and random.random() >= rate:
+                return
+        fields["event"] = name
+        self.logger.log(level, name, extra={"fields": fields})
+
+    def payload(self, name, payload):
+        # Full payload dumps are a debugging aid only; they cost a serialization per record
+        if self.debug_payloads and self.logger.isEnabledFor(logging.INFO):
+            if isinstance(payload, bytes):
+                payload = payload.decode()
+            self.logger.info(name, extra={"fields": {"event": name, "payload": payload}})
+
+
+def parse_sample_rates(spec):
+    # "slack_events=0.1,start_quiz=1" -> {"slack_events": 0.1, "start_quiz": 1.0}
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, rate = item.split('=', 1)
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(level=logging.INFO, stream_handler=None):
+    """Routes the root logger through a queue so formatting and I/O happen on a listener thread."""
+    import logging.handlers
+    import queue
+
+    handler = stream_handler or logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,244 @@
+import json
+from functools import lru_cache
+
+BATCH_CALLBACK_ID = "batch_quiz"
+# Live quiz messages are shared by a whole channel; their checkboxes sit in their own block so that
+# clicks on them are never mistaken for a personal quiz's
+LIVE_BLOCK_ID = "live_answer_block"
+LIVE_SUBMIT_ACTION = "live_submit"
+# Not select_answer: a live question's checkboxes must never be handled as a personal quiz's
+LIVE_SELECT_ACTION = "live_select"
+# Slack allows at most 100 blocks in a modal; batch quizzes use one input block per question
+MAX_BATCH_QUESTIONS = 100
+SECTION_TEXT_LIMIT = 3000
+
+
+def question_blocks(question, question_number, feedback=None):
+    blocks = []
+    if feedback:
+        blocks.append({
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": feedback
+            }
+        })
+    blocks.append({
+        "type": "section",
+        "text": {
+            "type": "mrkdwn",
+            "text": f"Question {question_number}: {question.prompt}"
+        }
+    })
+    blocks.append({
+        "type": "actions",
+        "block_id": "answer_block",
+        "elements": [
+            {
+                "type": "checkboxes",
+                "action_id": "select_answer",
+                "options": [{"text": {"type": "plain_text", "text": opt}, "value": str(i+1)} for i, opt in enumerate(question.options)]
+            },
+            {
+                "type": "button",
+                "text": {
+                    "type": "plain_text",
+                    "text": "Submit"
+                },
+                "value": "submit",
+                "action_id": "submit_answer"
+            }
+        ]
+    })
+    return blocks
+
+
+def batch_quiz_view(questions, private_metadata):
+    blocks = [{
+        "type": "input",
+        "block_id": f"q{n}",
+        "optional": True,
+        "label": {"type": "plain_text", "text": f"{n + 1}. {question.prompt}"[:2000]},
+        "element": {
+            "type": "checkboxes",
+            "action_id": "answer",
+            "options": [{"text": {"type": "plain_text", "text": opt}, "value": str(i+1)} for i, opt in enumerate(question.options)]
+        }
+    } for n, question in enumerate(questions)]
+    return {
+        "type": "modal",
+        "callback_id": BATCH_CALLBACK_ID,
+        "private_metadata": private_metadata,
+        "title": {"type": "plain_text", "text": "Quiz"},
+        "submit": {"type": "plain_text", "text": "Submit"},
+        "close": {"type": "plain_text", "text": "Cancel"},
+        "blocks": blocks
+    }
+
+
+def read_batch_answers(view, count):
+    """Selected option values per question, in quiz order, from a batch quiz view_submission."""
+    values = view["state"]["values"]
+    return [[option["value"] for option in (values.get(f"q{n}", {}).get("answer") or {}).get("selected_options") or []]
+            for n in range(count)]
+
+
+def batch_results_view(summary, feedback):
+    blocks = [{"type": "section", "text": {"type": "mrkdwn", "text": summary}}, {"type": "divider"}]
+    # Pack feedback into as few sections as the text limit allows, to stay well under the block limit
+    chunk = ""
+    for text in feedback:
+        if chunk and len(chunk) + len(text) + 2 > SECTION_TEXT_LIMIT:
+            blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": chunk}})
+            chunk = ""
+        chunk = f"{chunk}\n\n{text}" if chunk else text[:SECTION_TEXT_LIMIT]
+    if chunk:
+        blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": chunk}})
+    return {
+        "type": "modal",
+        "title": {"type": "plain_text", "text": "Quiz results"},
+        "close": {"type": "plain_text", "text": "Done"},
+        "blocks": blocks
+    }
+
+
+def live_question_blocks(question, number, total, button_value, answers, closes_at):
+    return [{
+        "type": "section",
+        "text": {"type": "mrkdwn", "text": f"*Live question {number}/{total}:* {question.prompt}"}
+    }, {
+        "type": "actions",
+        "block_id": LIVE_BLOCK_ID,
+        "elements": [
+            {
+                "type": "checkboxes",
+                "action_id": LIVE_SELECT_ACTION,
+                "options": [{"text": {"type": "plain_text", "text": opt}, "value": str(i+1)} for i, opt in enumerate(question.options)]
+            },
+            {
+                "type": "button",
+                "text": {"type": "plain_text", "text": "Lock in"},
+                "value": button_value,
+                "action_id": LIVE_SUBMIT_ACTION
+            }
+        ]
+    }, {
+        "type": "context",
+        # Slack renders the closing time in each reader's timezone, so it never needs refreshing
+        "elements": [{"type": "mrkdwn", "text": f"{answers} answer{'s' if answers != 1 else ''} so far, "
+                                                f"closes at <!date^{int(closes_at)}^{{time_secs}}|soon>"}]
+    }]
+
+
+def live_results_blocks(question, number, total, counts, respondents, correct_count):
+    lines = []
+    for i, opt in enumerate(question.options):
+        mark = ":white_check_mark:" if str(i+1) in question.correct else ":white_large_square:"
+        share = counts[i] / respondents * 100 if respondents else 0
+        lines.append(f"{mark} {opt}: {counts[i]} ({share:.0f}%)")
+    return [{
+        "type": "section",
+        "text": {"type": "mrkdwn", "text": f"*Live question {number}/{total} (closed):* {question.prompt}"}
+    }, {
+        "type": "section",
+        "text": {"type": "mrkdwn", "text": "\n".join(lines)[:SECTION_TEXT_LIMIT]}
+    }, {
+        "type": "section",
+        "text": {"type": "mrkdwn",
+                 "text": f"{correct_count} of {respondents} got it right.\nExplanation: {question.explanation}"[:SECTION_TEXT_LIMIT]}
+    }]
+
+
+def live_standings_text(scores, total, limit=10):
+    if not scores:
+        return f"*Live quiz finished!* Nobody answered any of the {total} questions."
+    ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+    lines = [f"*Live quiz finished!* {len(scores)} player{'s' if len(scores) != 1 else ''} took part."]
+    for rank, (user_id, score) in enumerate(ranked, start=1):
+        lines.append(f"{rank}. <@{user_id}>: {score}/{total}")
+    return "\n".join(lines)
+
+
+def leaderboard_text(rows):
+    if not rows:
+        return "No quizzes have been completed in this workspace yet."
+    lines = ["*Leaderboard*"]
+    for rank, row in enumerate(rows, start=1):
+        accuracy = row["correct"] / row["questions"] * 100 if row["questions"] else 0
+        lines.append(f"{rank}. <@{row['user_id']}>: {row['correct']} correct ({accuracy:.0f}%) "
+                     f"over {row['quizzes']} quiz{'zes' if row['quizzes'] != 1 else ''}")
+    return "\n".join(lines)
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':')).encode()
+
+
+class QuestionRenderer:
+    """Serializes question messages, caching the static per-question JSON fragments.
+
+    Fragments are keyed by the Question record itself, so a reloaded bank never serves stale entries.
+    """
+
+    def __init__(self, cache_size=1024):
+        self._fragments = lru_cache(maxsize=cache_size)(self._build_fragments)
+
+    def _build_fragments(self, question):
+        # The prompt is cached pre-escaped (without quotes) so the "Question N: " prefix can be spliced in
+        prompt = _dumps(question.prompt)[1:-1]
+        actions = _dumps(question_blocks(question, 0)[-1])
+        return prompt, actions
+
+    def question_message(self, question, question_number, feedback=None, replace_original=False):
+        prompt, actions = self._fragments(question)
+        parts = [b'{"response_type":"in_channel",']
+        if replace_original:
+            parts.append(b'"replace_original":true,')
+        parts.append(b'"blocks":[')
+        if feedback:
+            parts.append(_dumps({"type": "section", "text": {"type": "mrkdwn", "text": feedback}}))
+            parts.append(b',')
+        parts.append(b'{"type":"section","text":{"type":"mrkdwn","text":"Question %d: ' % question_number)
+        parts.append(prompt)
+        parts.append(b'"}},')
+        parts.append(actions)
+        parts.append(b']}')
+        return b''.join(parts)
+
+    def open_batch_quiz(self, trigger_id, questions, private_metadata):
+        # views.open request body
+        return _dumps({"trigger_id": trigger_id, "view": batch_quiz_view(questions, private_metadata)})
+
+    def batch_results(self, summary, feedback):
+        # view_submission response that swaps the quiz modal for the results
+        return _dumps({"response_action": "update", "view": batch_results_view(summary, feedback)})
+
+    def leaderboard_message(self, rows):
+        return _dumps({"response_type": "in_channel", "text": leaderboard_text(rows)})
+
+    def live_question(self, channel, question, number, total, button_value, answers, closes_at, ts=None):
+        # chat.postMessage body, or chat.update for the tally refreshes once the message ts is known
+        message = {"channel": channel, "text": f"Live question {number}/{total}: {question.prompt}",
+                   "blocks": live_question_blocks(question, number, total, button_value, answers, closes_at)}
+        if ts:
+            message["ts"] = ts
+        return _dumps(message)
+
+    def live_results(self, channel, question, number, total, counts, respondents, correct_count, ts=None):
+        message = {"channel": channel, "text": f"Live question {number}/{total} closed",
+                   "blocks": live_results_blocks(question, number, total, counts, respondents, correct_count)}
+        if ts:
+            message["ts"] = ts
+        return _dumps(message)
+
+    def live_standings(self, channel, scores, total):
+        return _dumps({"channel": channel, "text": live_standings_text(scores, total)})
+
+    def ephemeral_message(self, text):
+        return _dumps({"response_type": "ephemeral", "replace_original": False, "text": text})
+
+    def text_message(self, text, replace_original=True):
+        return _dumps({"response_type": "in_channel", "replace_original": replace_original, "text": text})
+
+    def cache_info(self):
+        return self._fragments.cache_info()
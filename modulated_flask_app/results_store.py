@@ -0,0 +1,175 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from utils import PerProcess
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    team_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    bank TEXT,
+    question_id INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    answered_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS quizzes (
+    team_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    bank TEXT,
+    score INTEGER NOT NULL,
+    num_questions INTEGER NOT NULL,
+    completed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leaderboard (
+    team_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    quizzes INTEGER NOT NULL DEFAULT 0,
+    questions INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0,
+    best_score REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (team_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS leaderboard_rank ON leaderboard (team_id, correct DESC, questions);
+"""
+
+UPSERT_LEADERBOARD = """
+INSERT INTO leaderboard (team_id, user_id, quizzes, questions, correct, best_score) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (team_id, user_id) DO UPDATE SET
+    quizzes = quizzes + excluded.quizzes,
+    questions = questions + excluded.questions,
+    correct = correct + excluded.correct,
+    best_score = MAX(best_score, excluded.best_score)
+"""
+
+
+def split_session_key(key):
+    # Inverse of quiz.session_key; keys without a workspace belong to team ""
+    team_id, _, user_id = key.rpartition(':')
+    return team_id, user_id
+
+
+class ResultsStore:
+    """Answer and quiz history in SQLite, with per-user aggregates kept up to date for the leaderboard.
+
+    Handlers only enqueue; a writer thread group-commits everything that arrives within flush_interval
+    seconds, so the request path never waits on the disk.
+    """
+
+    def __init__(self, path, flush_interval=0.05, max_batch=1000, max_queue=10000, clock=time.time):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._clock = clock
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._local = threading.local()
+        self._ensure_started = PerProcess(self._start)
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _start(self):
+        threading.Thread(target=self._run, name="results-writer", daemon=True).start()
+
+    def _enqueue(self, item):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.error("Results queue full, dropping %s record", item[0])
+            return False
+
+    def record_answer(self, session_id, bank, question_id, correct):
+        team_id, user_id = split_session_key(session_id)
+        return self._enqueue(('answer', team_id, user_id, bank, question_id, int(correct), self._clock()))
+
+    def record_quiz(self, session_id, bank, score, num_questions):
+        team_id, user_id = split_session_key(session_id)
+        return self._enqueue(('quiz', team_id, user_id, bank, score, num_questions, self._clock()))
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._write(conn, batch)
+                self.written += len(batch)
+            except sqlite3.Error as e:
+                self.failed += len(batch)
+                logger.error("Failed to write %d results: %s", len(batch), e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, conn, batch):
+        answers, quizzes = [], []
+        # [quizzes, questions, correct, best_score] deltas, folded per user so each gets one upsert
+        totals = defaultdict(lambda: [0, 0, 0, 0.0])
+        for kind, team_id, user_id, bank, a, b, at in batch:
+            delta = totals[team_id, user_id]
+            if kind == 'answer':
+                answers.append((team_id, user_id, bank, a, b, at))
+                delta[1] += 1
+                delta[2] += b
+            else:
+                quizzes.append((team_id, user_id, bank, a, b, at))
+                delta[0] += 1
+                delta[3] = max(delta[3], a / b if b else 0.0)
+        conn.execute("BEGIN")
+        try:
+            conn.executemany("INSERT INTO answers VALUES (?, ?, ?, ?, ?, ?)", answers)
+            conn.executemany("INSERT INTO quizzes VALUES (?, ?, ?, ?, ?, ?)", quizzes)
+            conn.executemany(UPSERT_LEADERBOARD, [key + tuple(delta) for key, delta in totals.items()])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def leaderboard(self, team_id, limit=10):
+        """Top users of a workspace by correct answers; reads the aggregate index, never the history."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        rows = conn.execute(
+            "SELECT user_id, quizzes, questions, correct, best_score FROM leaderboard "
+            "WHERE team_id = ? ORDER BY correct DESC, questions LIMIT ?", (team_id or '', limit)).fetchall()
+        return [{"user_id": user_id, "quizzes": quizzes, "questions": questions, "correct": correct,
+                 "best_score": best_score} for user_id, quizzes, questions, correct, best_score in rows]
+
+    def stats(self):
+        return {"queue_depth": self._queue.qsize(), "written": self.written, "dropped": self.dropped,
+                "failed": self.failed}
+
+    def drain(self, timeout=None):
+        # Waits until everything recorded so far has been committed
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
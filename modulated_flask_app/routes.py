@@ -1,176 +1,189 @@
-from flask import request, jsonify
-import json
+from flask import request, g
 import logging
-import requests
-from utils import verify_slack_request, load_lookup_table
-from quiz import start_new_session, get_current_question, update_session_with_answer, process_answer
-
-lookup_table = load_lookup_table('lookup_table.json')
+import time
+from config import (SAMPLER, SAMPLER_LOG_PATH, SAMPLER_RECENT, SLACK_MAX_BODY, IDEMPOTENCY_TTL,
+                    IDEMPOTENCY_MAX_KEYS, LOG_PAYLOADS, LOG_SAMPLE_RATES, LOOKUP_TABLE_PATH, S3_BUCKET,
+                    S3_KEY, BANK_CACHE_PATH, BANK_REFRESH_INTERVAL, RENDER_CACHE_SIZE, DELIVERY_WORKERS,
+                    DELIVERY_QUEUE_SIZE, DELIVERY_TIMEOUT, DELIVERY_MAX_RETRIES, BANK_DIR, BANK_DEFAULT_NAME,
+                    BANK_MAX_RESIDENT, BANK_TEAM_DEFAULTS, METRICS_TIMERS, SLACK_API_URL, ANSWER_SOURCE,
+                    RESULTS_DB_PATH, RESULTS_FLUSH_MS, SHUTDOWN_TIMEOUT, SERVER_WORKERS, LIVE_QUESTION_SECONDS,
+                    LIVE_UPDATE_INTERVAL)
+from delivery import LATENCY_BUCKETS, ResponseDelivery
+from quiz_logging import EventLogger, parse_sample_rates
+from utils import SlackVerifier, TTLCache, StripedLocks, parse_form, decode_interaction, is_select_click
+from bank_loader import load_banks
+from bank_registry import BankRegistry, parse_team_defaults
+from render import QuestionRenderer
+from live_quiz import LiveQuizzes
+from sampler import create_sampler
+from metrics import Metrics
+from results_store import ResultsStore
+from quiz import session_store
+from slack_handlers import SlackHandlers, ok
+
+banks, bank_loader = load_banks(LOOKUP_TABLE_PATH, S3_BUCKET, S3_KEY, BANK_CACHE_PATH, BANK_REFRESH_INTERVAL)
+renderer = QuestionRenderer(cache_size=RENDER_CACHE_SIZE)
+sampler = create_sampler(SAMPLER, banks.current, log_path=SAMPLER_LOG_PATH, recent_size=SAMPLER_RECENT)
+banks.on_swap(sampler.rebind)
+registry = BankRegistry(banks, bank_dir=BANK_DIR, default_name=BANK_DEFAULT_NAME, max_resident=BANK_MAX_RESIDENT,
+                        team_defaults=parse_team_defaults(BANK_TEAM_DEFAULTS))
+metrics = Metrics(enabled=METRICS_TIMERS)
+request_seconds = metrics.histogram('request_seconds', "Time to ack a request", ('endpoint', 'status'))
+delivery = ResponseDelivery(workers=DELIVERY_WORKERS, max_queue=DELIVERY_QUEUE_SIZE,
+                            timeout=DELIVERY_TIMEOUT, max_retries=DELIVERY_MAX_RETRIES,
+                            latency=metrics.histogram('delivery_seconds', "Time from queueing a Slack post to its "
+                                                      "acceptance, retries included", buckets=LATENCY_BUCKETS))
+interactions = TTLCache(max_size=IDEMPOTENCY_MAX_KEYS, ttl=IDEMPOTENCY_TTL)
+session_locks = StripedLocks()
+results = ResultsStore(RESULTS_DB_PATH, flush_interval=RESULTS_FLUSH_MS / 1000) if RESULTS_DB_PATH else None
+
+metrics.gauge_function('active_sessions', "Quiz sessions currently stored", lambda: len(session_store))
+metrics.counter_function('session_evictions_total', "Sessions evicted by the LRU or expired",
+                         lambda: getattr(session_store, 'evictions', 0))
+metrics.gauge_function('delivery_queue_depth', "Responses waiting for a delivery worker",
+                       lambda: delivery.stats()["queue_depth"])
+metrics.counter_function('delivery_failures_total', "Slack posts given up on or rejected",
+                         lambda: delivery.stats()["failed"])
+metrics.counter_function('delivery_dropped_total', "Responses dropped because the queue was full",
+                         lambda: delivery.stats()["dropped"])
+metrics.counter_function('delivery_retries_total', "response_url posts retried",
+                         lambda: delivery.stats()["retried"])
+if results:
+    metrics.gauge_function('results_queue_depth', "Results waiting for the next group commit",
+                           lambda: results.stats()["queue_depth"])
+    metrics.counter_function('results_dropped_total', "Results dropped because the writer fell behind",
+                             lambda: results.stats()["dropped"])
+
+def shutdown(timeout=SHUTDOWN_TIMEOUT):
+    # Called once the server has stopped taking requests: let queued response_url posts and results
+    # go out, then make the session snapshot durable so the next process resumes every quiz
+    logger = logging.getLogger(__name__)
+    deadline = time.monotonic() + timeout
+    if not delivery.drain(timeout=timeout):
+        logger.warning("Shutting down with %d responses undelivered", delivery.stats()["queue_depth"])
+    if results and not results.drain(timeout=max(deadline - time.monotonic(), 0)):
+        logger.warning("Shutting down with %d results unwritten", results.stats()["queue_depth"])
+    if hasattr(session_store, 'flush'):
+        session_store.flush(True)
 
 def init_routes(app):
+    events = EventLogger(app.logger, parse_sample_rates(LOG_SAMPLE_RATES), debug_payloads=LOG_PAYLOADS)
+    verifier = SlackVerifier(app.config['SLACK_SIGNING_SECRET'], max_body=SLACK_MAX_BODY)
+    bot_headers = {'Authorization': f"Bearer {app.config['SLACK_BOT_TOKEN']}"}
+    def call_api(method, body):
+        return delivery.call(f"{SLACK_API_URL}/{method}", body, headers=bot_headers)
+
+    live = LiveQuizzes(renderer, lambda method, body: delivery.submit(f"{SLACK_API_URL}/{method}", body, headers=bot_headers),
+                       call_api, question_seconds=LIVE_QUESTION_SECONDS, update_interval=LIVE_UPDATE_INTERVAL,
+                       results=results)
+    handlers = SlackHandlers(renderer, registry, sampler, events, metrics, interactions, call_api,
+                             answer_source=ANSWER_SOURCE, results=results, live=live,
+                             live_question_seconds=LIVE_QUESTION_SECONDS, server_workers=SERVER_WORKERS)
+    app.extensions['slack_handlers'] = handlers
+    stage_seconds = handlers.stage_seconds
+    metrics.gauge_function('live_quizzes', "Channel quizzes in progress", lambda: len(live))
+    metrics.counter_function('live_answers_total', "Live quiz answers counted", lambda: live.answers)
+    metrics.counter_function('live_updates_total', "Coalesced live question message updates", lambda: live.updates)
+
+    @app.before_request
+    def start_bank_threads():
+        # Started on first use rather than at import, so a server that preloads the app and forks
+        # (gunicorn.conf.py) gets one refresh thread and one topic index per worker and none in the master
+        if bank_loader:
+            bank_loader.start()
+        banks.current.index_topics_in_background()
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter() if metrics.enabled else None
+
+    @app.after_request
+    def record_request_time(response):
+        start = g.get('request_start')
+        if start is not None:
+            request_seconds.observe(time.perf_counter() - start, request.endpoint or 'unknown', response.status_code)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        return app.response_class(metrics.render(), content_type=Metrics.CONTENT_TYPE)
+
+    def respond(reply):
+        if reply.save:
+            session_id, session = reply.save
+            with stage_seconds.time('session'):
+                if session is None:
+                    session_store.delete(session_id)
+                else:
+                    session_store.put(session_id, session)
+        with stage_seconds.time('enqueue'):
+            for url, body, headers in reply.posts:
+                delivery.submit(url, body, headers=headers)
+        return app.response_class(reply.body, status=reply.status, mimetype='application/json')
+
+    def reject_unverified():
+        # Header, size and timestamp checks run before the body is buffered
+        with stage_seconds.time('verify'):
+            error = verifier.check_headers(request.headers, request.content_length)
+            if error is None:
+                error = verifier.check_body(request.headers, request.get_data())
+        if error is None:
+            return None
+        return respond(handlers.rejected(error, request.headers.get('X-Slack-Retry-Num')))
+
+    def interaction_payload():
+        # Interactions carry one urlencoded JSON field; parse_form decodes it far faster than request.form,
+        # and leaves the raw body buffered for the signature check. Decoded once, None if malformed.
+        if 'payload' not in g:
+            g.payload = decode_interaction(parse_form(request.get_data()))
+        return g.payload
+
     @app.route('/start_quiz', methods=['POST'])
     def start_quiz():
-        app.logger.info("start_quiz endpoint called")
-        if 'X-Slack-Request-Timestamp' not in request.headers or 'X-Slack-Signature' not in request.headers:
-            app.logger.error("Missing headers")
-            return jsonify({"error": "Unauthorized"}), 403
-
-        timestamp = request.headers['X-Slack-Request-Timestamp']
-        signature = request.headers['X-Slack-Signature']
-        
-        if abs(time.time() - int(timestamp)) > 60 * 5:
-            app.logger.error("Request timestamp too old")
-            return jsonify({"error": "Unauthorized"}), 403
-
-        if not verify_slack_request(request.get_data(), timestamp, signature, app.config['SLACK_SIGNING_SECRET']):
-            app.logger.error("Slack request verification failed")
-            return jsonify({"error": "Unauthorized"}), 403
-
+        events.event("start_quiz")
+        rejection = reject_unverified()
+        if rejection:
+            return rejection
         try:
-            data = request.form
-            app.logger.info(f"Form data: {data}")
-            num_questions = int(data.get('text', 5))
-            user_id = data.get('user_id')
-            session = start_new_session(user_id, num_questions, lookup_table)
-
-            current_question, options = get_current_question(user_id)
-            blocks = [
-                {
-                    "type": "section",
-                    "text": {
-                        "type": "mrkdwn",
-                        "text": f"Question 1: {options[0]}"
-                    }
-                },
-                {
-                    "type": "actions",
-                    "block_id": "answer_block",
-                    "elements": [
-                        {
-                            "type": "checkboxes",
-                            "action_id": "select_answer",
-                            "options": [{"text": {"type": "plain_text", "text": opt}, "value": str(i+1)} for i, opt in enumerate(options[1:])]
-                        },
-                        {
-                            "type": "button",
-                            "text": {
-                                "type": "plain_text",
-                                "text": "Submit"
-                            },
-                            "value": "submit",
-                            "action_id": "submit_answer"
-                        }
-                    ]
-                }
-            ]
-
-            app.logger.info(f"Sending blocks: {json.dumps(blocks, indent=2)}")
-            return jsonify({
-                "response_type": "in_channel",
-                "blocks": blocks
-            })
+            return respond(handlers.start_quiz(parse_form(request.get_data())))
         except Exception as e:
-            app.logger.error(f"Error processing start_quiz: {str(e)}")
-            return jsonify({"error": str(e)}), 500
+            return respond(handlers.failed('start_quiz', e))
+
+    @app.route('/leaderboard', methods=['POST'])
+    def leaderboard():
+        events.event("leaderboard")
+        rejection = reject_unverified()
+        if rejection:
+            return rejection
+        return respond(handlers.leaderboard(parse_form(request.get_data())))
 
     @app.route('/slack/events', methods=['POST'])
     def slack_events():
-        app.logger.info("slack_events endpoint called")
-        if 'X-Slack-Request-Timestamp' not in request.headers or 'X-Slack-Signature' not in request.headers:
-            app.logger.error("Missing headers")
-            return jsonify({"error": "Unauthorized"}), 403
-
-        timestamp = request.headers['X-Slack-Request-Timestamp']
-        signature = request.headers['X-Slack-Signature']
-        
-        if abs(time.time() - int(timestamp)) > 60 * 5:
-            app.logger.error("Request timestamp too old")
-            return jsonify({"error": "Unauthorized"}), 403
-
-        if not verify_slack_request(request.get_data(), timestamp, signature, app.config['SLACK_SIGNING_SECRET']):
-            app.logger.error("Slack request verification failed")
-            return jsonify({"error": "Unauthorized"}), 403
+        events.event("slack_events")
+        rejection = reject_unverified()
+        if rejection:
+            return rejection
+        if ANSWER_SOURCE == 'state' and is_select_click(interaction_payload()):
+            # Selections are read from the state snapshot on submit, so a checkbox click needs no work
+            # beyond the signature check: a forged one must not get a success response either
+            return "", 200
 
         try:
-            payload = json.loads(request.form["payload"])
-            app.logger.info(f"Payload received: {json.dumps(payload, indent=2)}")
-            user_id = payload["user"]["id"]
-            actions = payload["actions"][0]
-            action_id = actions["action_id"]
-            app.logger.info(f"Action ID: {action_id}")
-
-            if user_id not in quiz_sessions:
-                app.logger.error("Invalid session")
-                return jsonify({"error": "Invalid session"}), 400
-
-            session = quiz_sessions[user_id]
-
-            if action_id == "select_answer":
-                session["selected_answers"] = [option["value"] for option in actions.get("selected_options", [])]
-                app.logger.info(f"Selected answers updated: {session['selected_answers']}")
-                return jsonify({"status": "ok"})
-            elif action_id == "submit_answer":
-                app.logger.info("Submit button clicked")
-                if not session["selected_answers"]:
-                    app.logger.error("No answers selected")
-                    return jsonify({"error": "No answers selected"}), 400
-
-                response_text, next_question, options = process_answer(user_id, lookup_table)
-                app.logger.info(f"Response text: {response_text}")
-
-                if next_question:
-                    blocks = [
-                        {
-                            "type": "section",
-                            "text": {
-                                "type": "mrkdwn",
-                                "text": f"Question {session['current_question'] + 1}: {options[0]}"
-                            }
-                        },
-                        {
-                            "type": "actions",
-                            "block_id": "answer_block",
-                            "elements": [
-                                {
-                                    "type": "checkboxes",
-                                    "action_id": "select_answer",
-                                    "options": [{"text": {"type": "plain_text", "text": opt}, "value": str(i+1)} for i, opt in enumerate(options[1:])]
-                                },
-                                {
-                                    "type": "button",
-                                    "text": {
-                                        "type": "plain_text",
-                                        "text": "Submit"
-                                    },
-                                    "value": "submit",
-                                    "action_id": "submit_answer"
-                                }
-                            ]
-                        }
-                    ]
-
-                    app.logger.info(f"Sending blocks for next question: {json.dumps(blocks, indent=2)}")
-                    response = {
-                        "response_type": "in_channel",
-                        "replace_original": True,
-                        "blocks": blocks
-                    }
-                    app.logger.info(f"Next question response: {json.dumps(response, indent=2)}")
-                    requests.post(payload["response_url"], json=response)
-                    return jsonify({"status": "ok"})
-                else:
-                    app.logger.info("Quiz completed")
-                    response = {
-                        "response_type": "in_channel",
-                        "replace_original": True,
-                        "text": response_text
-                    }
-                    app.logger.info(f"Quiz completed response: {json.dumps(response, indent=2)}")
-                    requests.post(payload["response_url"], json=response)
-                    return jsonify({"status": "ok"})
-
-            app.logger.error("Unknown action ID")
-            return jsonify({"status": "ok"})
+            with stage_seconds.time('parse'):
+                interaction = handlers.interaction(interaction_payload())
+            if interaction is None:
+                return respond(ok())
+            try:
+                with handlers.action_timer(interaction.action_id):
+                    with session_locks.lock_for(interaction.session_id):
+                        session = None
+                        if handlers.needs_session(interaction.action_id):
+                            with stage_seconds.time('session'):
+                                session = session_store.get(interaction.session_id)
+                        # Stored under the lock, so the user's next click sees this one's change
+                        return respond(handlers.block_action(interaction, session))
+            except Exception:
+                handlers.forget(interaction)
+                raise
         except Exception as e:
-            app.logger.error(f"Error processing slack_events: {str(e)}")
-            return jsonify({"error": str(e)}), 500
\ No newline at end of file
+            return respond(handlers.failed('slack_events', e))
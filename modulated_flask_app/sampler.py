@@ -0,0 +1,194 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class FenwickTree:
+    """Prefix sums over non-negative weights with O(log n) updates and weighted index lookup."""
+
+    def __init__(self, weights):
+        self.size = len(weights)
+        self.weights = list(weights)
+        tree = [0.0] + self.weights
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._top = 1 << (self.size.bit_length() - 1) if self.size else 0
+
+    def set(self, index, weight):
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        i = index + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def total(self):
+        total, i = 0.0, self.size
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, target):
+        """Index of the first weight whose running sum exceeds target."""
+        pos, step = 0, self._top
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self._tree[nxt] <= target:
+                pos = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        return min(pos, self.size - 1)
+
+
+class UniformSampler:
+    def __init__(self, bank):
+        self.bank = bank
+
+    def draw(self, user_id, k):
+        return self.bank.sample(k)
+
+    def record(self, user_id, qid, correct):
+        pass
+
+    def rebind(self, bank):
+        self.bank = bank
+
+
+class UserHistory:
+    __slots__ = ('attempts', 'recent')
+
+    def __init__(self, recent_size):
+        self.attempts = OrderedDict()
+        self.recent = deque(maxlen=recent_size)
+
+
+class AdaptiveSampler:
+    """Weighted draws that favour questions the user (and everyone) gets wrong and avoid recent repeats.
+
+    Global per-question weights live in a Fenwick tree. A draw temporarily applies the user's own
+    adjustments (bounded by history_size), picks k questions without replacement and restores the
+    tree, so a draw costs O((history + k) log n) regardless of how many users there are.
+    Every answer is appended to a JSON-lines log, which is replayed on startup.
+    """
+
+    def __init__(self, bank_size, log_path=None, recent_size=50, history_size=500, weak_boost=3.0,
+                 recent_factor=0.01, rng=None):
+        self.recent_size = recent_size
+        self.history_size = history_size
+        self.weak_boost = weak_boost
+        self.recent_factor = recent_factor
+        self._rng = rng or random.Random()
+        self._attempts = [0] * bank_size
+        self._misses = [0] * bank_size
+        self._users = {}
+        self._tree = FenwickTree([self._base_weight(q) for q in range(bank_size)])
+        self._lock = threading.Lock()
+        self._log = None
+        if log_path:
+            self._replay(log_path)
+            self._log = open(log_path, 'a', buffering=1)
+
+    def _base_weight(self, qid):
+        # Laplace-smoothed global miss rate: unseen questions start at 1 + boost / 2
+        return 1.0 + self.weak_boost * (self._misses[qid] + 1) / (self._attempts[qid] + 2)
+
+    def _replay(self, log_path):
+        if not os.path.exists(log_path):
+            return
+        with open(log_path, 'r') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a torn final line from a crash
+                if 0 <= entry["q"] < len(self._attempts):
+                    self._apply(entry["u"], entry["q"], entry["c"])
+        self._tree = FenwickTree([self._base_weight(q) for q in range(len(self._attempts))])
+
+    def _apply(self, user_id, qid, correct):
+        self._attempts[qid] += 1
+        if not correct:
+            self._misses[qid] += 1
+        history = self._users.get(user_id)
+        if history is None:
+            history = self._users[user_id] = UserHistory(self.recent_size)
+        attempts, misses = history.attempts.pop(qid, (0, 0))
+        history.attempts[qid] = (attempts + 1, misses + (0 if correct else 1))
+        if len(history.attempts) > self.history_size:
+            history.attempts.popitem(last=False)
+        history.recent.append(qid)
+
+    def record(self, user_id, qid, correct):
+        with self._lock:
+            if not 0 <= qid < len(self._attempts):
+                # A quiz drawn before the bank was swapped for a smaller one, answered after
+                return
+            self._apply(user_id, qid, correct)
+            self._tree.set(qid, self._base_weight(qid))
+            if self._log:
+                self._log.write(json.dumps({"u": user_id, "q": qid, "c": int(correct), "t": int(time.time())},
+                                           separators=(",", ":")) + "\n")
+
+    def _user_weights(self, history):
+        # History outlives rebind, so it can name questions a smaller bank no longer has
+        size = self._tree.size
+        weights = {}
+        for qid, (attempts, misses) in history.attempts.items():
+            if qid < size:
+                weights[qid] = self._tree.weights[qid] * (1.0 + self.weak_boost * (misses + 1) / (attempts + 2))
+        for qid in history.recent:
+            if qid < size:
+                weights[qid] = weights.get(qid, self._tree.weights[qid]) * self.recent_factor
+        return weights
+
+    def draw(self, user_id, k):
+        if k > self._tree.size:
+            raise ValueError("Sample larger than question bank")
+        with self._lock:
+            history = self._users.get(user_id)
+            overrides = self._user_weights(history) if history else {}
+            saved = {}
+            for qid, weight in overrides.items():
+                saved[qid] = self._tree.weights[qid]
+                self._tree.set(qid, weight)
+            chosen = []
+            try:
+                while len(chosen) < k:
+                    qid = self._tree.find(self._rng.random() * self._tree.total())
+                    if self._tree.weights[qid] <= 0.0:
+                        continue  # float rounding landed on a question drawn already
+                    chosen.append(qid)
+                    saved.setdefault(qid, self._tree.weights[qid])
+                    self._tree.set(qid, 0.0)
+            finally:
+                for qid, weight in saved.items():
+                    self._tree.set(qid, weight)
+            return chosen
+
+    def rebind(self, bank):
+        # Question ids are positions in the bank, so stats carry over as long as reloads only append
+        with self._lock:
+            size = len(bank)
+            extra = max(0, size - len(self._attempts))
+            self._attempts = self._attempts[:size] + [0] * extra
+            self._misses = self._misses[:size] + [0] * extra
+            self._tree = FenwickTree([self._base_weight(q) for q in range(size)])
+
+    def close(self):
+        if self._log:
+            self._log.close()
+
+
+def create_sampler(kind, bank, log_path=None, recent_size=50):
+    if kind == 'uniform':
+        return UniformSampler(bank)
+    if kind == 'adaptive':
+        return AdaptiveSampler(len(bank), log_path=log_path, recent_size=recent_size)
+    raise ValueError(f"Unknown sampler: {kind}")
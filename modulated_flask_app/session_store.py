@@ -0,0 +1,404 @@
+import gc
+import itertools
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from utils import PerProcess
+
+logger = logging.getLogger(__name__)
+
+# Length prefix of each snapshot frame
+FRAME_HEADER = struct.Struct('<I')
+
+
+class SessionStore:
+    """Interface shared by all session backends. Sessions are plain JSON-able dicts."""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def put(self, key, session):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process store, bounded by an LRU and expired after ttl seconds of inactivity.
+
+    Abandoned quizzes are purged every purge_every puts, so they do not hold memory until the LRU evicts them.
+    """
+
+    def __init__(self, max_sessions=10000, ttl=3600, clock=time.monotonic, purge_every=1000):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.evictions = 0
+        self.purge_every = purge_every
+        self._clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = itertools.count(1)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return None
+            expires_at, session = entry
+            now = self._clock()
+            if expires_at <= now:
+                del self._sessions[key]
+                self.evictions += 1
+                return None
+            self._sessions[key] = (now + self.ttl, session)
+            self._sessions.move_to_end(key)
+            return session
+
+    def put(self, key, session):
+        with self._lock:
+            self._sessions[key] = (self._clock() + self.ttl, session)
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        if next(self._puts) % self.purge_every == 0:
+            self.purge_expired()
+
+    def delete(self, key):
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def purge_expired(self):
+        now = self._clock()
+        with self._lock:
+            # Entries are kept in access order, so expired ones sit at the front
+            while self._sessions:
+                key, (expires_at, _) = next(iter(self._sessions.items()))
+                if expires_at > now:
+                    break
+                del self._sessions[key]
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+def _copied(entry):
+    # Handlers update a session's top-level keys in place (its lists are replaced, never appended to), so a
+    # shallow copy cannot change while it is being pickled
+    return None if entry is None else (entry[0], dict(entry[1]))
+
+
+class SnapshotSessionStore(MemorySessionStore):
+    """Memory store whose changes are journaled to an append-only file, so sessions survive a restart.
+
+    Requests only mark keys dirty; a background thread appends the latest state of every dirty key as one
+    length-prefixed pickle frame per interval, and rewrites the file from the live sessions once the log has
+    grown to several times their number. The file is read on first use in the serving process rather than at
+    import, which under gunicorn --preload is the master, long before a respawned worker starts. One process
+    per file: with several workers use sqlite or redis.
+    """
+
+    def __init__(self, path, max_sessions=10000, ttl=3600, interval=1.0, compact_factor=1.5, clock=time.monotonic,
+                 wall_clock=time.time):
+        super().__init__(max_sessions=max_sessions, ttl=ttl, clock=clock)
+        self.path = path
+        self.interval = interval
+        self.compact_factor = compact_factor
+        self._wall_clock = wall_clock
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._log_entries = 0
+        self._file = None
+        self._ensure_started = PerProcess(self._start)
+        self.restored = 0
+
+    def _restore(self):
+        try:
+            with open(self.path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            return 0
+        sessions = self._sessions
+        now = self._clock()
+        offset = now - self._wall_clock()
+        position = 0
+        # Unpickling 100k small dicts is mostly allocation; collections in the middle of it only add time
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            while position + FRAME_HEADER.size <= len(data):
+                (length,) = FRAME_HEADER.unpack_from(data, position)
+                end = position + FRAME_HEADER.size + length
+                if end > len(data):
+                    # A torn final frame from a crash mid-append
+                    break
+                try:
+                    entries = pickle.loads(data[position + FRAME_HEADER.size:end])
+                except Exception as e:
+                    logger.error("Corrupt session snapshot frame at byte %d of %s: %s", position, self.path, e)
+                    break
+                position = end
+                self._log_entries += len(entries)
+                for key, expires_at, session in entries:
+                    sessions.pop(key, None)
+                    if expires_at is not None and expires_at + offset > now:
+                        sessions[key] = (expires_at + offset, session)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        while len(sessions) > self.max_sessions:
+            sessions.popitem(last=False)
+        logger.info("Restored %d sessions from %s", len(sessions), self.path)
+        return len(sessions)
+
+    def _start(self):
+        # Whatever a parent process held may be stale by now, so each process serving sessions reads
+        # the file afresh before starting its own snapshot thread
+        with self._lock:
+            self._sessions.clear()
+        self._log_entries = 0
+        # A parent's handle shares its file offset; this process appends through its own
+        self._file = None
+        self.restored = self._restore()
+        threading.Thread(target=self._run, name="session-snapshot", daemon=True).start()
+
+    def start(self):
+        """Restores the snapshot and starts the snapshot thread now rather than on the first request."""
+        self._ensure_started()
+
+    def get(self, key):
+        self._ensure_started()
+        return super().get(key)
+
+    def _mark(self, key):
+        with self._dirty_lock:
+            self._dirty.add(key)
+
+    def put(self, key, session):
+        self._ensure_started()
+        super().put(key, session)
+        self._mark(key)
+
+    def delete(self, key):
+        self._ensure_started()
+        super().delete(key)
+        self._mark(key)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Session snapshot failed: %s", e)
+
+    def _frame(self, entries):
+        # Expiry is stored as wall-clock time, since the monotonic clock restarts with the process
+        offset = self._clock() - self._wall_clock()
+        payload = pickle.dumps([(key, None, None) if entry is None else (key, entry[0] - offset, entry[1])
+                                for key, entry in entries], protocol=pickle.HIGHEST_PROTOCOL)
+        return FRAME_HEADER.pack(len(payload)) + payload
+
+    def flush(self, sync=False):
+        """Appends every session changed since the last flush; compacts the file once it has grown enough."""
+        if not self._ensure_started.started:
+            # Nothing was read or changed in this process, and compacting its empty store would wipe the file
+            return
+        with self._flush_lock:
+            with self._dirty_lock:
+                dirty, self._dirty = self._dirty, set()
+            if self._log_entries > self.compact_factor * len(self._sessions) + 1000:
+                self._compact()
+                return
+            if not dirty:
+                return
+            with self._lock:
+                entries = [(key, _copied(self._sessions.get(key))) for key in dirty]
+            # Serialized outside the store lock so requests never wait on it; the copies are this thread's alone
+            frame = self._frame(entries)
+            if self._file is None:
+                self._file = open(self.path, 'ab')
+            self._file.write(frame)
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+            self._log_entries += len(entries)
+
+    def _compact(self):
+        with self._lock:
+            entries = [(key, _copied(entry)) for key, entry in self._sessions.items()]
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(self._frame(entries))
+            file.flush()
+            os.fsync(file.fileno())
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.replace(tmp_path, self.path)
+        self._log_entries = len(entries)
+        logger.info("Compacted session snapshot to %d sessions", len(entries))
+
+
+class SQLiteSessionStore(SessionStore):
+    """Shared store for several workers on one host, using a WAL-mode SQLite file.
+
+    Each process deletes the expired rows every purge_every puts it makes, so abandoned quizzes do not
+    accumulate in the file. The purge scans the table; an index on expiry would cost more on every put.
+    """
+
+    def __init__(self, path, ttl=3600, clock=time.time, purge_every=1000):
+        self.path = path
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._clock = clock
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._puts = itertools.count(1)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def _connection(self):
+        if self._pid != os.getpid():
+            # Connections opened before a fork must not be reused by the child
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE key = ? AND expires_at > ?", (key, self._clock())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, session):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sessions (key, data, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(session, separators=(',', ':')), self._clock() + self.ttl))
+        if next(self._puts) % self.purge_every == 0:
+            self.purge_expired()
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+    def purge_expired(self):
+        self._connection().execute("DELETE FROM sessions WHERE expires_at <= ?", (self._clock(),))
+
+    def __len__(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (self._clock(),)).fetchone()[0]
+
+
+class RedisSessionStore(SessionStore):
+    """Store for several hosts. Works with any redis-py compatible client, including fakeredis."""
+
+    def __init__(self, client, ttl=3600, prefix='quiz:session:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return json.loads(data) if data is not None else None
+
+    def put(self, key, session):
+        self.client.set(self.prefix + key, json.dumps(session, separators=(',', ':')), ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + '*'))
+
+
+def create_session_store(backend, ttl=3600, max_sessions=10000, db_path='sessions.db', redis_url='redis://localhost:6379/0',
+                         snapshot_path=None, snapshot_interval=1.0):
+    if backend == 'memory' and snapshot_path:
+        return SnapshotSessionStore(snapshot_path, max_sessions=max_sessions, ttl=ttl, interval=snapshot_interval)
+    if backend == 'memory':
+        return MemorySessionStore(max_sessions=max_sessions, ttl=ttl)
+    if backend == 'sqlite':
+        return SQLiteSessionStore(db_path, ttl=ttl)
+    if backend == 'redis':
+        return RedisSessionStore.from_url(redis_url, ttl=ttl)
+    raise ValueError(f"Unknown session backend: {backend}")
+
+
+class AsyncSessionStore:
+    """Event-loop facade over a blocking store; calls run on the default executor unless they never block."""
+
+    def __init__(self, store, blocking=True):
+        self.store = store
+        self.blocking = blocking
+
+    async def _call(self, func, *args):
+        if not self.blocking:
+            return func(*args)
+        # Imported here so the sync servers and the Lambda handler never load asyncio
+        import asyncio
+        return await asyncio.to_thread(func, *args)
+
+    async def get(self, key):
+        return await self._call(self.store.get, key)
+
+    async def put(self, key, session):
+        await self._call(self.store.put, key, session)
+
+    async def delete(self, key):
+        await self._call(self.store.delete, key)
+
+
+class AsyncRedisSessionStore:
+    """Non-blocking Redis store (redis.asyncio or a compatible fake), sharing the sync store's key format."""
+
+    def __init__(self, client, ttl=3600, prefix='quiz:session:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis.asyncio
+        return cls(redis.asyncio.Redis.from_url(url), **kwargs)
+
+    async def get(self, key):
+        data = await self.client.get(self.prefix + key)
+        return json.loads(data) if data is not None else None
+
+    async def put(self, key, session):
+        await self.client.set(self.prefix + key, json.dumps(session, separators=(',', ':')), ex=self.ttl)
+
+    async def delete(self, key):
+        await self.client.delete(self.prefix + key)
+
+
+def create_async_session_store(backend, ttl=3600, max_sessions=10000, db_path='sessions.db', redis_url='redis://localhost:6379/0',
+                               snapshot_path=None, snapshot_interval=1.0):
+    if backend == 'redis':
+        return AsyncRedisSessionStore.from_url(redis_url, ttl=ttl)
+    store = create_session_store(backend, ttl=ttl, max_sessions=max_sessions, db_path=db_path,
+                                 snapshot_path=snapshot_path, snapshot_interval=snapshot_interval)
+    return AsyncSessionStore(store, blocking=not isinstance(store, MemorySessionStore))
@@ -0,0 +1,320 @@
+"""The Slack endpoints' logic, shared by the Flask routes, the ASGI app and the Lambda handler.
+
+Each server verifies the request and decodes its form or interaction payload, then hands it here. A
+handler returns a Reply: the body and status to ack with, the Web API and response_url posts to make once
+the ack is on its way, and the change to the user's stored session. What is left to each server is how
+it stores sessions (blocking or awaited), serializes a user's clicks (thread locks, asyncio locks, or one
+invocation at a time) and sends the posts (delivery queue, background task, or before returning).
+"""
+import json
+import logging
+
+from bank_loader import UnknownBankVersion
+from live_quiz import CLOSED, LiveQuizNotPosted
+from quiz import (session_key, split_modes, no_match_text, draw_questions, new_session, get_current_question,
+                  grade_answer, batch_metadata, batch_session, grade_batch)
+from render import (BATCH_CALLBACK_ID, MAX_BATCH_QUESTIONS, LIVE_BLOCK_ID, LIVE_SUBMIT_ACTION, LIVE_SELECT_ACTION,
+                    read_batch_answers)
+from topic_index import TopicIndexNotReady
+from utils import DUPLICATE_REQUEST, interaction_key, state_selection
+
+KNOWN_ACTIONS = ("select_answer", "submit_answer", BATCH_CALLBACK_ID, LIVE_SUBMIT_ACTION, LIVE_SELECT_ACTION)
+OK = b'{"status":"ok"}'
+NO_LIVE_TEXT = "Live quizzes are not available on this deployment."
+USAGE_TEXT = ("Usage: {command} [bank] [number of questions] [batch | live] [topic words], "
+              "e.g. {command} 10 lambda s3")
+BANK_CHANGED_TEXT = ("The question bank was updated after this quiz started, so it cannot be graded. "
+                     "Start a new quiz with /start_quiz.")
+TOPICS_NOT_READY_TEXT = "Topic search for this bank is still being prepared; try again in a few seconds."
+
+
+class Reply:
+    """What a handler decided.
+
+    posts are (url, body, headers) to send after the ack; headers None means a plain JSON post.
+    save is None, or (session_id, session) to store, where a session of None deletes it.
+    """
+
+    __slots__ = ('body', 'status', 'posts', 'save')
+
+    def __init__(self, body=b'', status=200, posts=(), save=None):
+        self.body = body
+        self.status = status
+        self.posts = posts
+        self.save = save
+
+
+def ok(**kwargs):
+    return Reply(OK, **kwargs)
+
+
+def json_reply(value, status):
+    return Reply(json.dumps(value).encode(), status)
+
+
+class Interaction:
+    __slots__ = ('payload', 'session_id', 'action_id', 'key')
+
+    def __init__(self, payload, session_id, action_id, key):
+        self.payload = payload
+        self.session_id = session_id
+        self.action_id = action_id
+        self.key = key
+
+
+class SlackHandlers:
+    """Start, answer and leaderboard handling for one server; live is None where live quizzes cannot run."""
+
+    def __init__(self, renderer, registry, sampler, events, metrics, interactions, call_api,
+                 answer_source='state', results=None, live=None, live_question_seconds=30, server_workers=1):
+        self.renderer = renderer
+        self.registry = registry
+        self.sampler = sampler
+        self.events = events
+        self.interactions = interactions
+        # call_api(method, body) makes a Web API call with the bot token and returns its JSON reply, or None
+        self.call_api = call_api
+        self.answer_source = answer_source
+        self.results = results
+        self.live = live
+        self.live_question_seconds = live_question_seconds
+        self.server_workers = server_workers
+        self.stage_seconds = metrics.histogram('stage_seconds', "Time spent per handler stage", ('stage',))
+        self.action_seconds = metrics.histogram('action_seconds', "Block action handling time", ('action_id',))
+        self.duplicates = metrics.counter('duplicates_total', "Slack retries and repeated interactions dropped",
+                                          ('kind',))
+
+    def sampler_for(self, bank_name):
+        # Answer statistics are tracked for the default bank only
+        return self.sampler if bank_name in (None, self.registry.default_name) else None
+
+    def rejected(self, error, retry_num=None):
+        """The reply to a request that failed verification; Slack's retries of an acked request get a 200."""
+        if error == DUPLICATE_REQUEST:
+            self.duplicates.inc('request')
+            self.events.event("duplicate_request", retry_num=retry_num)
+            return Reply()
+        self.events.event("rejected", level=logging.WARNING, reason=error)
+        return json_reply({"error": "Unauthorized"}, 403)
+
+    def failed(self, endpoint, error):
+        # Called from the server's except block, so the traceback is logged too
+        self.events.logger.exception("Error processing %s: %s", endpoint, error)
+        return json_reply({"error": str(error)}, 500)
+
+    def _message(self, text):
+        return Reply(self.renderer.ephemeral_message(text))
+
+    def _no_matches(self, topics):
+        return self._message(no_match_text(topics))
+
+    def start_quiz(self, form):
+        """Batch and live quizzes wait on a Web API call, so async servers call this off the event loop."""
+        try:
+            return self._start_quiz(form)
+        except TopicIndexNotReady:
+            # Asking started the index build; plain quizzes work meanwhile
+            return self._message(TOPICS_NOT_READY_TEXT)
+
+    def _start_quiz(self, form):
+        self.events.payload("form", form)
+        user_id = form.get('user_id')
+        team_id = form.get('team_id')
+        bank_name, num_questions, rest = self.registry.parse_command(form.get('text'), team_id)
+        if num_questions < 1:
+            return self._message(USAGE_TEXT.format(command=form.get('command') or '/start_quiz'))
+        bank = self.registry.get(bank_name)
+        # Every mode draws from this bank, so asking for more questions than it holds gets all of them
+        num_questions = min(num_questions, len(bank))
+        modes, topics = split_modes(rest)
+        if 'batch' in modes:
+            return self._start_batch_quiz(form, session_key(team_id, user_id), bank_name, bank, num_questions, topics)
+        if 'live' in modes:
+            return self._start_live_quiz(form, bank_name, bank, num_questions, topics)
+        session_id = session_key(team_id, user_id)
+        session = new_session(num_questions, bank, self.sampler_for(bank_name), session_id, bank_name, topics)
+        # A topic with no matching questions leaves nothing to resume
+        if not session["questions"]:
+            return self._no_matches(topics)
+        with self.stage_seconds.time('render'):
+            body = self.renderer.question_message(get_current_question(session, bank), 1)
+        self.events.event("quiz_started", user_id=user_id, team_id=team_id, bank=bank_name,
+                          num_questions=session["num_questions"], topics=' '.join(topics) or None)
+        return Reply(body, save=(session_id, session))
+
+    def _start_batch_quiz(self, form, session_id, bank_name, bank, num_questions, topics):
+        # The whole quiz goes into one modal, so the session lives in the view instead of the store
+        session = new_session(min(num_questions, MAX_BATCH_QUESTIONS), bank, self.sampler_for(bank_name), session_id,
+                              bank_name, topics)
+        if not session["questions"]:
+            return self._no_matches(topics)
+        with self.stage_seconds.time('render'):
+            body = self.renderer.open_batch_quiz(form.get('trigger_id'), [bank[qid] for qid in session["questions"]],
+                                                 batch_metadata(session))
+        # Called before the ack rather than posted after it: the trigger_id expires three seconds after the
+        # command, and a refusal (expired_trigger_id) must reach the user instead of a queue's log
+        reply = self.call_api('views.open', body) or {}
+        if not reply.get("ok"):
+            error = reply.get("error") or "no_reply"
+            self.events.event("batch_quiz_not_opened", level=logging.WARNING, user_id=form.get('user_id'), error=error)
+            return self._message(f"The quiz could not be opened ({error}). Please run the command again.")
+        self.events.event("batch_quiz_started", user_id=form.get('user_id'), bank=bank_name,
+                          num_questions=session["num_questions"])
+        return Reply()
+
+    def _start_live_quiz(self, form, bank_name, bank, num_questions, topics):
+        if self.live is None:
+            return self._message(NO_LIVE_TEXT)
+        if self.server_workers > 1:
+            # Lock-ins reaching any other worker would find no quiz there
+            return self._message("Live quizzes need a single server process, and this server runs several workers.")
+        question_ids = draw_questions(bank, num_questions, topics=topics)
+        if not question_ids:
+            return self._no_matches(topics)
+        try:
+            with self.stage_seconds.time('session'):
+                quiz = self.live.start(form.get('channel_id'), form.get('team_id'), bank_name, bank, question_ids)
+        except LiveQuizNotPosted as e:
+            self.events.event("live_quiz_not_posted", level=logging.WARNING, channel_id=form.get('channel_id'),
+                              error=e.args[0])
+            return self._message(f"The live quiz could not be posted here ({e.args[0]}). "
+                                 "If the app is not in this channel, invite it and try again.")
+        if quiz is None:
+            return self._message("A live quiz is already running in this channel.")
+        self.events.event("live_quiz_started", user_id=form.get('user_id'), channel_id=form.get('channel_id'),
+                          bank=bank_name, num_questions=quiz.total)
+        text = (f"<@{form.get('user_id')}> started a live quiz: {quiz.total} questions, "
+                f"{self.live_question_seconds} seconds each.")
+        return Reply(self.renderer.text_message(text, replace_original=False))
+
+    def leaderboard(self, form):
+        """Reads the results database, so async servers call it off the event loop."""
+        if self.results is None:
+            return Reply(self.renderer.text_message("Results are not being recorded.", replace_original=False))
+        return Reply(self.renderer.leaderboard_message(self.results.leaderboard(form.get('team_id'))))
+
+    def interaction(self, payload):
+        """The Interaction in a decoded payload, or None when Slack is redelivering one already handled."""
+        if payload is None:
+            raise ValueError("Interaction payload is missing or not JSON")
+        self.events.payload("payload", payload)
+        user_id = payload["user"]["id"]
+        team_id = (payload.get("team") or {}).get("id") or payload["user"].get("team_id")
+        if payload.get("type") == "view_submission":
+            action_id = payload["view"].get("callback_id")
+        else:
+            action_id = payload["actions"][0]["action_id"]
+        self.events.event("block_action", user_id=user_id, action_id=action_id)
+
+        # Slack redelivers slow interactions; a repeat must not score or advance the quiz twice
+        key = interaction_key(payload)
+        if not self.interactions.add(key):
+            self.duplicates.inc('interaction')
+            self.events.event("duplicate_interaction", user_id=user_id, action_id=action_id)
+            return None
+        return Interaction(payload, session_key(team_id, user_id), action_id, key)
+
+    def forget(self, interaction):
+        # Handling failed, so Slack's retry must be handled rather than dropped as a repeat
+        self.interactions.discard(interaction.key)
+
+    def action_timer(self, action_id):
+        # Arbitrary action_ids must not create unbounded label sets
+        return self.action_seconds.time(action_id if action_id in KNOWN_ACTIONS else 'other')
+
+    def needs_session(self, action_id):
+        if action_id in (BATCH_CALLBACK_ID, LIVE_SUBMIT_ACTION, LIVE_SELECT_ACTION):
+            return False
+        return action_id != "select_answer" or self.answer_source != 'state'
+
+    def grades(self, action_id):
+        """Whether the action grades answers, which can open a named bank; async servers run it off the loop."""
+        return action_id in (BATCH_CALLBACK_ID, "submit_answer")
+
+    def block_action(self, interaction, session=None):
+        """Handles an interaction; session is the user's stored one, loaded by the server if needs_session."""
+        payload, session_id, action_id = interaction.payload, interaction.session_id, interaction.action_id
+        if action_id == BATCH_CALLBACK_ID:
+            return self._batch_submission(payload, session_id)
+        if action_id == LIVE_SUBMIT_ACTION:
+            return self._live_answer(payload)
+        if not self.needs_session(action_id):
+            # Checkbox clicks whose selections are read from the state snapshot on submit or lock-in
+            return ok()
+
+        if session is None:
+            self.events.event("invalid_session", level=logging.WARNING, session_id=session_id)
+            return json_reply({"error": "Invalid session"}, 400)
+        if action_id == "select_answer":
+            session["selected_answers"] = [option["value"]
+                                           for option in payload["actions"][0].get("selected_options", [])]
+            return ok(save=(session_id, session))
+        if action_id == "submit_answer":
+            return self._submit_answer(payload, session_id, session)
+        self.events.event("unknown_action", level=logging.WARNING, action_id=action_id)
+        return ok()
+
+    def _submit_answer(self, payload, session_id, session):
+        selected_answers = state_selection(payload) if self.answer_source == 'state' else None
+        if selected_answers is not None:
+            session["selected_answers"] = selected_answers
+        if not session["selected_answers"]:
+            self.events.event("no_answers_selected", level=logging.WARNING, session_id=session_id)
+            return json_reply({"error": "No answers selected"}, 400)
+
+        try:
+            bank = self.registry.for_session(session)
+        except UnknownBankVersion:
+            self._bank_changed(session_id, session)
+            return ok(posts=[(payload["response_url"], self.renderer.text_message(BANK_CHANGED_TEXT), None)],
+                      save=(session_id, None))
+        with self.stage_seconds.time('grade'):
+            response_text, next_question, question_number = grade_answer(
+                session, bank, self.sampler_for(session.get("bank")), session_id, self.results)
+        if next_question:
+            with self.stage_seconds.time('render'):
+                message = self.renderer.question_message(next_question, question_number, feedback=response_text,
+                                                         replace_original=True)
+            self.events.payload("next_question", message)
+            return ok(posts=[(payload["response_url"], message, None)], save=(session_id, session))
+        self.events.event("quiz_completed", session_id=session_id)
+        with self.stage_seconds.time('render'):
+            message = self.renderer.text_message(response_text)
+        return ok(posts=[(payload["response_url"], message, None)], save=(session_id, None))
+
+    def _bank_changed(self, session_id, session):
+        self.events.event("bank_version_unavailable", level=logging.WARNING, session_id=session_id,
+                          bank=session.get("bank"), version=session.get("bank_version"))
+
+    def _live_answer(self, payload):
+        # Everyone in the channel answers the same message, so there is no per-user session to load
+        if self.live is None:
+            text = NO_LIVE_TEXT
+        else:
+            selected_answers = state_selection(payload, LIVE_BLOCK_ID, LIVE_SELECT_ACTION)
+            if not selected_answers:
+                text = "Select an answer before locking in."
+            else:
+                with self.stage_seconds.time('grade'):
+                    status = self.live.answer(payload["actions"][0]["value"], payload["user"]["id"],
+                                              selected_answers)
+                if status != CLOSED:
+                    return ok()
+                text = "This question has closed."
+        return ok(posts=[(payload["response_url"], self.renderer.ephemeral_message(text), None)])
+
+    def _batch_submission(self, payload, session_id):
+        session = batch_session(payload["view"]["private_metadata"])
+        try:
+            bank = self.registry.for_session(session)
+        except UnknownBankVersion:
+            self._bank_changed(session_id, session)
+            return Reply(self.renderer.batch_results(BANK_CHANGED_TEXT, []))
+        with self.stage_seconds.time('grade'):
+            summary, feedback = grade_batch(session, bank,
+                                            read_batch_answers(payload["view"], session["num_questions"]),
+                                            self.sampler_for(session.get("bank")), session_id, self.results)
+        with self.stage_seconds.time('render'):
+            body = self.renderer.batch_results(summary, feedback)
+        self.events.event("quiz_completed", session_id=session_id, mode="batch")
+        return Reply(body)
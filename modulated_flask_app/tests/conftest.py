@@ -0,0 +1,47 @@
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from urllib.parse import urlencode
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, APP_DIR)
+
+SIGNING_SECRET = 'test-signing-secret'
+# Read by config at import, so set before any app module is imported; nothing touches disk or the network
+os.environ.update(SLACK_SIGNING_SECRET=SIGNING_SECRET, SLACK_BOT_TOKEN='xoxb-test', SLACK_API_URL='http://slack.invalid/api',
+                  LOOKUP_TABLE_PATH=os.path.join(APP_DIR, '..', 'flask_app', 'lookup_table.json'),
+                  SESSION_BACKEND='memory', SESSION_SNAPSHOT_PATH='', RESULTS_DB_PATH='', SAMPLER='uniform',
+                  ANSWER_SOURCE='state', LOG_LEVEL='WARNING')
+
+
+def signed(body, secret=SIGNING_SECRET):
+    timestamp = str(int(time.time()))
+    digest = hmac.new(secret.encode(), b'v0:' + timestamp.encode() + b':' + body, hashlib.sha256).hexdigest()
+    return {'X-Slack-Request-Timestamp': timestamp, 'X-Slack-Signature': 'v0=' + digest,
+            'Content-Type': 'application/x-www-form-urlencoded'}
+
+
+def interaction_body(payload):
+    # Slack posts compact JSON in a single urlencoded field
+    return urlencode({'payload': json.dumps(payload, separators=(',', ':'))}).encode()
+
+
+@pytest.fixture
+def flask_app(monkeypatch):
+    import app as app_module
+    import routes
+
+    posted = []
+    monkeypatch.setattr(routes.delivery, 'submit', lambda url, body, headers=None: posted.append((url, body)))
+    client = app_module.app.test_client()
+
+    def post(path, body):
+        return client.post(path, data=body, headers=signed(body))
+
+    post.posted = posted
+    return post
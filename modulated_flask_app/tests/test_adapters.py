@@ -0,0 +1,98 @@
+"""The Lambda and ASGI adapters run the same handlers as the Flask routes."""
+import json
+from urllib.parse import urlencode
+
+from conftest import interaction_body, signed
+from test_slack_flow import SELECT, SUBMIT, block_actions
+
+
+def lambda_event(path, body):
+    return {"rawPath": path, "headers": {name.lower(): value for name, value in signed(body).items()},
+            "body": body.decode(), "isBase64Encoded": False, "requestContext": {"http": {"method": "POST"}}}
+
+
+def test_lambda_tells_live_lock_ins_it_cannot_count_them(monkeypatch):
+    import lambda_app
+
+    posted = []
+    monkeypatch.setattr(lambda_app, 'post_now', lambda url, body, headers=None: posted.append((url, body)))
+    payload = block_actions('U0LAMBDA', {"blocks": []}, {"action_id": "live_submit", "block_id": "live_answer_block",
+                                                         "type": "button", "value": "abcd:1"})
+    result = lambda_app.handler(lambda_event('/slack/events', interaction_body(payload)))
+
+    assert result["statusCode"] == 200
+    assert posted and b"not available" in posted[0][1]
+
+
+def test_asgi_grades_a_submit(monkeypatch):
+    from starlette.testclient import TestClient
+    import asgi_app
+
+    posted = []
+
+    async def post_response(url, body, headers=None):
+        posted.append((url, body))
+
+    monkeypatch.setattr(asgi_app, 'post_response', post_response)
+    with TestClient(asgi_app.app) as client:
+        start = urlencode({'text': '2', 'user_id': 'U0ASGI', 'team_id': 'T0001'}).encode()
+        message = client.post('/start_quiz', content=start, headers=signed(start)).json()
+        submit = interaction_body(block_actions('U0ASGI', message, SUBMIT))
+        response = client.post('/slack/events', content=submit, headers=signed(submit))
+
+    assert response.status_code == 200 and response.json() == {"status": "ok"}
+    assert posted and b'Question 2' in posted[0][1]
+    assert json.loads(posted[0][1])["replace_original"] is True
+
+
+def test_lambda_package_is_not_built_for_per_instance_sessions(tmp_path, capsys):
+    import build_lambda
+
+    output = tmp_path / 'lambda.zip'
+    assert build_lambda.main(['lookup_table.json', '-o', str(output), '--session-backend', 'memory']) == 2
+    assert not output.exists() and "SESSION_BACKEND=redis" in capsys.readouterr().err
+
+
+def test_asgi_counts_refused_posts_as_failures(monkeypatch):
+    import asyncio
+
+    import httpx
+
+    import asgi_app
+
+    replies = [httpx.Response(404, text='expired_url'), httpx.Response(200, json={"ok": False, "error": "not_in_channel"}),
+               httpx.Response(200, text='ok')]
+    sent = []
+
+    class Client:
+        async def post(self, url, **kwargs):
+            sent.append(url)
+            return replies.pop(0)
+
+    monkeypatch.setattr(asgi_app, 'http_client', Client())
+    before = asgi_app.delivery_failures._values.get((), 0)
+    for url in ('https://hooks.slack.com/actions/T0001/1/abc', 'http://slack.invalid/api/chat.update',
+                'https://hooks.slack.com/actions/T0001/2/def'):
+        asyncio.run(asgi_app.post_response(url, b'{}'))
+
+    # Refusals are counted once and not retried, as ResponseDelivery does
+    assert len(sent) == 3 and asgi_app.delivery_failures._values.get((), 0) == before + 2
+
+
+def test_forged_checkbox_clicks_are_rejected_everywhere(flask_app):
+    from starlette.testclient import TestClient
+
+    import app as app_module
+    import asgi_app
+    import lambda_app
+
+    body = interaction_body(block_actions('U0FORGED', {"blocks": []}, SELECT))
+    forged = signed(body, 'wrong-secret')
+    event = lambda_event('/slack/events', body)
+    event["headers"] = {name.lower(): value for name, value in forged.items()}
+
+    # Checked before the fast path, so a forgery gets no success response from any server
+    assert app_module.app.test_client().post('/slack/events', data=body, headers=forged).status_code == 403
+    with TestClient(asgi_app.app) as client:
+        assert client.post('/slack/events', content=body, headers=forged).status_code == 403
+    assert lambda_app.handler(event)["statusCode"] == 403
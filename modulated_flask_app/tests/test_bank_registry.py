@@ -0,0 +1,55 @@
+import json
+
+import bank_registry
+from bank_registry import BankRegistry
+
+
+def registry(tmp_path, clock=lambda: 0.0):
+    for filename in ('saa.json', 'lambda.json', 'sysops.sqlite', 'notes.txt'):
+        (tmp_path / filename).write_text('{}')
+    return BankRegistry(None, bank_dir=str(tmp_path), clock=clock)
+
+
+def test_only_the_first_word_names_a_bank(tmp_path):
+    banks = registry(tmp_path)
+
+    assert banks.parse_command("saa 10 lambda s3", 'T1') == ('saa', 10, ['lambda', 's3'])
+    # A topic sharing a bank's name is still a topic
+    assert banks.parse_command("10 lambda", 'T1') == ('default', 10, ['lambda'])
+    assert banks.parse_command("Lambda batch", 'T1') == ('lambda', 5, ['batch'])
+    assert banks.parse_command("notes", 'T1') == ('default', 5, ['notes'])
+    assert banks.parse_command(None, 'T1') == ('default', 5, [])
+
+
+def test_directory_is_listed_once_per_rescan_interval(tmp_path, monkeypatch):
+    now = [0.0]
+    banks = registry(tmp_path, clock=lambda: now[0])
+    listings = []
+    listdir = bank_registry.os.listdir
+    monkeypatch.setattr(bank_registry.os, 'listdir', lambda path: listings.append(path) or listdir(path))
+
+    for _ in range(100):
+        banks.parse_command("saa security groups iam", 'T1')
+    assert len(listings) == 1 and 'sysops' in banks and 'networking' not in banks
+
+    (tmp_path / 'networking.json').write_text('{}')
+    now[0] += banks.rescan_interval
+    assert 'networking' in banks and len(listings) == 2
+
+
+def test_evicted_bank_stays_readable(tmp_path):
+    from compile_bank import main as compile_main
+
+    source = tmp_path / 'table.json'
+    source.write_text(json.dumps({"1. Which are colours?\n   1. red\n   2. seven\n   3. blue": "1, 3. Seven is a number."}))
+    for name in ('saa', 'sysops'):
+        assert compile_main([str(source), '-o', str(tmp_path / f'{name}.sqlite')]) == 0
+    banks = BankRegistry(None, bank_dir=str(tmp_path), max_resident=1)
+
+    # A request part-way through a query on the first bank when the second one evicts it
+    held = banks.get('saa')
+    connection = held._connection()
+    banks.get('sysops')
+    assert 'saa' not in banks._resident
+    assert connection.execute("SELECT prompt FROM questions WHERE id = 0").fetchone() == ("Which are colours?",)
+    assert held[0].prompt == "Which are colours?"
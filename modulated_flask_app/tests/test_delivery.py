@@ -0,0 +1,65 @@
+import json
+
+from delivery import ResponseDelivery
+
+
+class FakeResponse:
+    def __init__(self, status_code, body, content_type='application/json; charset=utf-8'):
+        self.status_code = status_code
+        self.content = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.headers = {'Content-Type': content_type}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeHttp:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def post(self, url, **kwargs):
+        return self.responses.pop(0)
+
+
+def delivery(*responses):
+    sender = ResponseDelivery(workers=1)
+    sender._ensure_started()
+    sender.http = FakeHttp(*responses)
+    return sender
+
+
+def test_web_api_errors_in_a_200_count_as_failures():
+    sender = delivery(FakeResponse(200, {"ok": False, "error": "not_in_channel"}),
+                      FakeResponse(200, b'ok', content_type='text/html'))
+    sender.submit('http://slack.invalid/api/chat.update', b'{}')
+    sender.submit('https://hooks.slack.com/actions/T0001/1/abc', b'{}')
+    assert sender.drain(timeout=5)
+
+    stats = sender.stats()
+    # Not retried: the same call would be refused again
+    assert stats["failed"] == 1 and stats["delivered"] == 1 and stats["retried"] == 0
+
+
+def test_call_returns_the_reply():
+    sender = delivery(FakeResponse(200, {"ok": True, "channel": "C0001", "ts": "1700000000.000200"}),
+                      FakeResponse(200, {"ok": False, "error": "not_in_channel"}))
+
+    assert sender.call('http://slack.invalid/api/chat.postMessage', b'{}')["ts"] == "1700000000.000200"
+    assert sender.call('http://slack.invalid/api/chat.postMessage', b'{}')["error"] == "not_in_channel"
+    assert sender.stats()["delivered"] == 1 and sender.stats()["failed"] == 1
+
+
+def test_delivered_posts_are_timed_on_the_metrics_histogram():
+    from metrics import Metrics
+
+    metrics = Metrics()
+    sender = ResponseDelivery(workers=1, latency=metrics.histogram('delivery_seconds', "Delivery latency"))
+    sender._ensure_started()
+    sender.http = FakeHttp(FakeResponse(200, b'ok', content_type='text/html'),
+                           FakeResponse(404, b'expired_url', content_type='text/html'))
+    sender.submit('https://hooks.slack.com/actions/T0001/1/abc', b'{}')
+    sender.submit('https://hooks.slack.com/actions/T0001/2/def', b'{}')
+    assert sender.drain(timeout=5)
+
+    # Only the accepted post is timed; the refused one is a failure
+    assert 'quizbot_delivery_seconds_count 1' in metrics.render()
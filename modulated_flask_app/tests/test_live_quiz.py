@@ -0,0 +1,107 @@
+import json
+import threading
+
+import pytest
+
+from live_quiz import LiveQuizzes, LiveQuizNotPosted, ACCEPTED, CLOSED
+from question_bank import QuestionBank
+from render import QuestionRenderer
+
+BANK = QuestionBank.from_dict({"1. Which are colours?\n   1. red\n   2. seven\n   3. blue": "1, 3. Seven is a number."})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def posted(method, body):
+    return {"ok": True, "channel": "C0001", "ts": "1700000000.000200"}
+
+
+def start(publish, clock, call=posted, question_ids=(0,)):
+    # The ticker sleeps for an hour, so only the test's own tick() calls close questions
+    live = LiveQuizzes(QuestionRenderer(), publish, call, question_seconds=30, update_interval=3600, clock=clock)
+    return live, live.start('C0001', 'T0001', 'default', BANK, list(question_ids))
+
+
+def test_votes_racing_the_close_are_scored_once():
+    clock = FakeClock()
+    live, quiz = start(lambda method, body: None, clock)
+    statuses = {}
+
+    def voter(first):
+        for i in range(first, first + 500):
+            statuses[f"U{i}"] = live.answer(quiz.button_value(1), f"U{i}", ['1', '3'] if i % 2 else ['2'])
+
+    threads = [threading.Thread(target=voter, args=(n * 500,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    clock.now = 31
+    live.tick()
+    for thread in threads:
+        thread.join()
+
+    accepted = {user_id for user_id, status in statuses.items() if status == ACCEPTED}
+    assert set(quiz.scores) == accepted
+    assert all(status in (ACCEPTED, CLOSED) for status in statuses.values())
+    assert sum(quiz.scores.values()) == sum(int(user_id[1:]) % 2 for user_id in accepted)
+
+
+def test_close_retried_after_a_failure_does_not_score_again():
+    clock = FakeClock()
+    failures = [RuntimeError("publish failed")]
+
+    def publish(method, body):
+        if b'closed' in body and failures:
+            raise failures.pop()
+
+    live, quiz = start(publish, clock)
+    assert live.answer(quiz.button_value(1), 'U1', ['1', '3']) == ACCEPTED
+    clock.now = 31
+    try:
+        live.tick()
+    except RuntimeError:
+        pass
+    live.tick()
+
+    assert quiz.scores == {'U1': 1}
+    assert len(live) == 0
+
+
+def test_question_updates_use_the_ts_from_the_post_reply():
+    clock = FakeClock()
+    published = []
+    live, quiz = start(lambda method, body: published.append((method, json.loads(body))), clock)
+    live.answer(quiz.button_value(1), 'U1', ['1'])
+    live.tick()
+    clock.now = 31
+    live.tick()
+
+    assert [method for method, _ in published] == ['chat.update', 'chat.update', 'chat.postMessage']
+    assert all(body["ts"] == "1700000000.000200" for _, body in published[:2])
+
+
+def test_a_refused_first_question_starts_no_quiz():
+    live = LiveQuizzes(QuestionRenderer(), lambda method, body: None,
+                       lambda method, body: {"ok": False, "error": "not_in_channel"}, update_interval=3600)
+
+    with pytest.raises(LiveQuizNotPosted, match='not_in_channel'):
+        live.start('C0001', 'T0001', 'default', BANK, [0])
+    assert len(live) == 0
+
+
+def test_a_refused_later_question_ends_the_quiz():
+    clock = FakeClock()
+    replies = [posted(None, None), {"ok": False, "error": "channel_not_found"}]
+    published = []
+    live, quiz = start(lambda method, body: published.append(method), clock,
+                       call=lambda method, body: replies.pop(0), question_ids=(0, 0))
+    clock.now = 31
+    live.tick()
+
+    # The first question's results and the standings go out, and the channel is free again
+    assert published == ['chat.update', 'chat.postMessage'] and len(live) == 0
@@ -0,0 +1,16 @@
+import random
+
+from sampler import AdaptiveSampler
+
+
+def test_rebind_to_a_smaller_bank_keeps_working():
+    sampler = AdaptiveSampler(100, rng=random.Random(7))
+    for qid in range(90, 100):
+        sampler.record('T1:U1', qid, False)
+
+    sampler.rebind(range(20))
+    # Answers to questions drawn from the old bank can still arrive after the swap
+    sampler.record('T1:U1', 95, True)
+    chosen = sampler.draw('T1:U1', 10)
+
+    assert len(set(chosen)) == 10 and all(0 <= qid < 20 for qid in chosen)
@@ -0,0 +1,63 @@
+import session_store
+from session_store import SnapshotSessionStore
+
+
+def session(n):
+    return {"questions": [n, n + 1], "current_question": 0, "score": n}
+
+
+def test_restore_happens_in_the_serving_process(tmp_path, monkeypatch):
+    path = str(tmp_path / 'sessions.snapshot')
+    # Built at import, as in a gunicorn --preload master, before the previous worker's sessions were saved
+    loaded_early = SnapshotSessionStore(path, interval=3600)
+    writer = SnapshotSessionStore(path, interval=3600)
+    writer.put('T1:U1', session(1))
+    writer.flush(True)
+
+    assert loaded_early.get('T1:U1') == session(1)
+
+    writer.put('T1:U2', session(2))
+    writer.flush(True)
+    # A respawned worker inherits what its parent held, and must read the file again
+    monkeypatch.setattr(session_store.os, 'getpid', lambda: -1)
+    assert loaded_early.get('T1:U2') == session(2)
+
+
+def test_untouched_store_never_writes(tmp_path):
+    path = tmp_path / 'sessions.snapshot'
+    writer = SnapshotSessionStore(str(path), interval=3600)
+    for i in range(2000):
+        writer.put(f'T1:U{i}', session(i))
+    writer.flush(True)
+    size = path.stat().st_size
+
+    # Its empty in-memory store would otherwise be compacted over the file, e.g. at shutdown
+    SnapshotSessionStore(str(path), interval=3600, compact_factor=0).flush(True)
+
+    assert path.stat().st_size == size
+    assert len(SnapshotSessionStore(str(path), interval=3600).get('T1:U1999') or {}) == 3
+
+
+def test_restore_keeps_unexpired_sessions_and_skips_a_torn_frame(tmp_path):
+    path = tmp_path / 'sessions.snapshot'
+    now = [1000.0]
+    writer = SnapshotSessionStore(str(path), ttl=60, interval=3600, clock=lambda: now[0],
+                                  wall_clock=lambda: now[0] + 1e9)
+    writer.put('T1:U1', session(1))
+    writer.put('T1:U2', session(2))
+    writer.flush(True)
+    now[0] += 45
+    writer.put('T1:U3', session(3))
+    writer.delete('T1:U2')
+    writer.flush(True)
+    # A crash part-way through appending the next frame
+    with open(path, 'ab') as file:
+        file.write(b'\xff\x00\x00\x00partial')
+
+    # Expiry is kept in wall-clock time, so a restarted process with a new monotonic clock still honours it
+    restored = SnapshotSessionStore(str(path), ttl=60, interval=3600, clock=lambda: 5.0,
+                                    wall_clock=lambda: 1070 + 1e9)
+    assert restored.get('T1:U1') is None
+    assert restored.get('T1:U2') is None
+    assert restored.get('T1:U3') == session(3)
+    assert restored.restored == 1
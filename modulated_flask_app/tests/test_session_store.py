@@ -0,0 +1,32 @@
+import sqlite3
+
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+
+def test_sqlite_store_purges_expired_rows(tmp_path):
+    path = str(tmp_path / 'sessions.db')
+    now = [1000.0]
+    store = SQLiteSessionStore(path, ttl=60, clock=lambda: now[0], purge_every=10)
+    for i in range(5):
+        store.put(f'T1:U{i}', {"score": i})
+    now[0] += 61
+    for i in range(5, 10):
+        store.put(f'T1:U{i}', {"score": i})
+
+    # The tenth put purged the five abandoned sessions from the file, not just from reads
+    rows = sqlite3.connect(path).execute("SELECT key FROM sessions ORDER BY key").fetchall()
+    assert [key for (key,) in rows] == [f'T1:U{i}' for i in range(5, 10)]
+    assert store.get('T1:U9') == {"score": 9}
+
+
+def test_memory_store_purges_expired_sessions():
+    now = [0.0]
+    store = MemorySessionStore(ttl=60, clock=lambda: now[0], purge_every=4)
+    store.put('T1:U1', {})
+    store.put('T1:U2', {})
+    now[0] = 61
+    store.put('T1:U3', {})
+    assert len(store) == 3
+    store.put('T1:U4', {})
+
+    assert len(store) == 2 and store.evictions == 2
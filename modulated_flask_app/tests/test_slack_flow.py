@@ -0,0 +1,184 @@
+import json
+import time
+from urllib.parse import urlencode
+
+from conftest import interaction_body, signed
+
+
+def block_actions(user_id, message, action, selected=('1',)):
+    # Shaped like a real block_actions delivery: the clicked message is echoed back whole, blocks included
+    ts = f"{time.time():.6f}"
+    return {
+        "type": "block_actions",
+        "user": {"id": user_id, "username": "quizzer", "name": "quizzer", "team_id": "T0001"},
+        "api_app_id": "A0001",
+        "token": "verification-token",
+        "container": {"type": "message", "message_ts": "1700000000.000100", "channel_id": "C0001", "is_ephemeral": False},
+        "trigger_id": f"{user_id}.{ts}",
+        "team": {"id": "T0001", "domain": "example"},
+        "enterprise": None,
+        "is_enterprise_install": False,
+        "channel": {"id": "C0001", "name": "quiz"},
+        "message": {"bot_id": "B0001", "type": "message", "text": "This content can't be displayed.",
+                    "user": "U0BOT", "ts": "1700000000.000100", "app_id": "A0001", "team": "T0001",
+                    "blocks": message["blocks"]},
+        "state": {"values": {"answer_block": {"select_answer": {
+            "type": "checkboxes", "selected_options": [{"value": value} for value in selected]}}}},
+        "response_url": "https://hooks.slack.com/actions/T0001/1/abc",
+        "actions": [dict(action, action_ts=ts)],
+    }
+
+
+SUBMIT = {"action_id": "submit_answer", "block_id": "answer_block", "type": "button", "value": "submit",
+          "text": {"type": "plain_text", "text": "Submit", "emoji": True}}
+SELECT = {"action_id": "select_answer", "block_id": "answer_block", "type": "checkboxes",
+          "selected_options": [{"value": "1"}]}
+
+
+def start(post, user_id, count=3):
+    response = post('/start_quiz', urlencode({'text': str(count), 'user_id': user_id, 'team_id': 'T0001',
+                                              'channel_id': 'C0001'}).encode())
+    assert response.status_code == 200
+    return json.loads(response.get_data())
+
+
+def test_submit_with_echoed_message_is_graded(flask_app):
+    from quiz import session_store
+
+    message = start(flask_app, 'U0SUBMIT')
+    response = flask_app('/slack/events', interaction_body(block_actions('U0SUBMIT', message, SUBMIT)))
+
+    assert response.status_code == 200 and json.loads(response.get_data()) == {"status": "ok"}
+    assert session_store.get('T0001:U0SUBMIT')["current_question"] == 1
+    url, body = flask_app.posted[-1]
+    assert url.startswith('https://hooks.slack.com/') and b'Question 2' in body
+
+
+def test_checkbox_click_is_acked_without_work(flask_app):
+    from quiz import session_store
+
+    message = start(flask_app, 'U0SELECT')
+    response = flask_app('/slack/events', interaction_body(block_actions('U0SELECT', message, SELECT)))
+
+    assert response.status_code == 200 and response.get_data() == b''
+    assert session_store.get('T0001:U0SELECT')["current_question"] == 0
+    assert not flask_app.posted
+
+
+def test_live_quiz_refused_with_several_workers(flask_app, monkeypatch):
+    import app as app_module
+
+    monkeypatch.setattr(app_module.app.extensions['slack_handlers'], 'server_workers', 3)
+    message = start(flask_app, 'U0LIVE', count='live 2')
+
+    assert message["response_type"] == "ephemeral" and "single server process" in message["text"]
+    assert not flask_app.posted
+
+
+def test_signed_quiz_runs_to_completion(flask_app):
+    from quiz import session_store
+
+    message = start(flask_app, 'U0FLOW', count=2)
+    assert b'Question 1' in json.dumps(message).encode()
+    for number in (2, None):
+        flask_app('/slack/events', interaction_body(block_actions('U0FLOW', message, SELECT)))
+        response = flask_app('/slack/events', interaction_body(block_actions('U0FLOW', message, SUBMIT)))
+        assert response.status_code == 200
+        url, body = flask_app.posted[-1]
+        message = json.loads(body)
+        if number:
+            assert f"Question {number}" in body.decode()
+
+    assert "score" in message["text"].lower()
+    assert session_store.get('T0001:U0FLOW') is None
+
+
+def test_unsigned_and_replayed_requests(flask_app):
+    import app as app_module
+
+    client = app_module.app.test_client()
+    body = urlencode({'text': '2', 'user_id': 'U0REPLAY', 'team_id': 'T0001'}).encode()
+    assert client.post('/start_quiz', data=body, headers=signed(body, 'wrong-secret')).status_code == 403
+
+    headers = signed(body)
+    first = client.post('/start_quiz', data=body, headers=headers)
+    replay = client.post('/start_quiz', data=body, headers=dict(headers, **{'X-Slack-Retry-Num': '1'}))
+    assert first.status_code == 200 and b'Question 1' in first.get_data()
+    # Slack's retry of a delivery already acked gets an empty 200 rather than a second quiz
+    assert replay.status_code == 200 and replay.get_data() == b''
+
+
+def test_topic_quiz_while_the_index_builds(flask_app, monkeypatch):
+    import app as app_module
+    from question_bank import QuestionBank
+
+    registry = app_module.app.extensions['slack_handlers'].registry
+    fresh = QuestionBank(list(registry.get(None)))
+    # Held back, so the build cannot finish before the first topic quiz asks
+    monkeypatch.setattr(fresh._topics, 'start', lambda: None)
+    monkeypatch.setattr(registry, 'get', lambda name: fresh)
+
+    message = start(flask_app, 'U0TOPIC', count='3 lambda')
+    assert message["response_type"] == "ephemeral" and "still being prepared" in message["text"]
+    # Plain quizzes are served meanwhile
+    assert "Question 1" in json.dumps(start(flask_app, 'U0PLAIN', count=3))
+    fresh.index_topics()
+    assert "Question 1" in json.dumps(start(flask_app, 'U0TOPIC2', count='3 lambda'))
+
+
+def test_question_count_is_clamped_to_the_bank(flask_app):
+    import app as app_module
+    from quiz import session_store
+
+    size = len(app_module.app.extensions['slack_handlers'].registry.get(None))
+    assert "Question 1" in json.dumps(start(flask_app, 'U0MANY', count=size + 1000))
+    assert session_store.get('T0001:U0MANY')["num_questions"] == size
+
+
+def test_non_positive_counts_get_usage(flask_app):
+    for n, text in enumerate(('0', 'batch 0', 'live 0', '-3 lambda')):
+        message = start(flask_app, f'U0ZERO{n}', count=text)
+        assert message["response_type"] == "ephemeral" and message["text"].startswith("Usage: /start_quiz"), text
+    assert not flask_app.posted
+
+
+def test_answer_from_an_unknown_bank_version_asks_for_a_new_quiz(flask_app):
+    from quiz import session_store
+
+    message = start(flask_app, 'U0STALE')
+    # As if the quiz started on a worker that has since fetched a bank this one has not
+    session = session_store.get('T0001:U0STALE')
+    session_store.put('T0001:U0STALE', dict(session, bank_version='not-fetched-here'))
+    response = flask_app('/slack/events', interaction_body(block_actions('U0STALE', message, SUBMIT)))
+
+    assert response.status_code == 200
+    assert session_store.get('T0001:U0STALE') is None
+    url, body = flask_app.posted[-1]
+    assert b'Start a new quiz' in body and b'Question 2' not in body
+
+
+def test_live_quiz_the_app_cannot_post_is_not_started(flask_app, monkeypatch):
+    import routes
+
+    monkeypatch.setattr(routes.delivery, 'call',
+                        lambda url, body, headers=None: {"ok": False, "error": "not_in_channel"})
+    message = start(flask_app, 'U0NOTIN', count='live 2')
+
+    assert message["response_type"] == "ephemeral" and "not_in_channel" in message["text"]
+    assert "started a live quiz" not in message["text"]
+
+
+def test_batch_quiz_opens_its_modal_before_the_ack(flask_app, monkeypatch):
+    import routes
+
+    calls = []
+    replies = [{"ok": True}, {"ok": False, "error": "expired_trigger_id"}]
+    monkeypatch.setattr(routes.delivery, 'call',
+                        lambda url, body, headers=None: calls.append(url) or replies.pop(0))
+    opened = flask_app('/start_quiz', urlencode({'text': 'batch 3', 'user_id': 'U0BATCH1', 'team_id': 'T0001',
+                                                 'trigger_id': '1.2.abc'}).encode())
+    expired = start(flask_app, 'U0BATCH2', count='batch 3')
+
+    assert opened.status_code == 200 and opened.get_data() == b''
+    assert calls == ['http://slack.invalid/api/views.open'] * 2 and not flask_app.posted
+    assert expired["response_type"] == "ephemeral" and "expired_trigger_id" in expired["text"]
@@ -0,0 +1,63 @@
+import time
+from array import array
+
+import pytest
+
+from question_bank import Question, QuestionBank
+from topic_index import DENSE_FRACTION, Bitmap, TopicIndex, TopicIndexNotReady
+
+
+def question(qid, prompt, options=('Yes', 'No'), explanation='Because.'):
+    return Question(qid, prompt, options, frozenset('1'), explanation)
+
+
+def bank():
+    questions = [question(0, "Which service stores objects?", ("S3", "EBS"), "S3 stores objects in buckets."),
+                 question(1, "Which service runs instances?", ("EC2", "S3"), "EC2 runs virtual machines."),
+                 question(2, "How are IAM policies attached?", ("To users", "To buckets"), "Policies attach to users.")]
+    # Padding so that only "filler" is common enough to be stored as a bitmap
+    questions += [question(qid, f"Filler question {qid}") for qid in range(3, 3 + 2 * DENSE_FRACTION)]
+    return questions
+
+
+def test_match_intersects_terms():
+    index = TopicIndex.build(bank())
+
+    assert list(index.match(['s3'])) == [0, 1]
+    assert list(index.match(['S3', 'buckets'])) == [0]
+    # Plurals find singulars, and stop words are ignored
+    assert list(index.match(['the', 'instance'])) == [1]
+    assert list(index.match(['s3', 'iam'])) == []
+    assert list(index.match(['nothing'])) == []
+
+
+def test_match_without_terms_matches_everything():
+    assert TopicIndex.build(bank()).match(['the', 'of']) is None
+
+
+def test_match_dense_terms():
+    index = TopicIndex.build(bank())
+    filler = index.match(['filler'])
+
+    assert isinstance(filler, Bitmap) and list(filler) == list(range(3, 3 + 2 * DENSE_FRACTION))
+    assert 5 in filler and 0 not in filler
+    # A rare term is filtered through the dense one's bitmap
+    mixed = index.match(['filler', '7'])
+    assert isinstance(mixed, array) and list(mixed) == [7]
+
+
+def test_bank_builds_its_index_off_the_calling_thread():
+    questions = QuestionBank(bank())
+
+    with pytest.raises(TopicIndexNotReady):
+        questions.match(['s3'])
+    # The first ask started the build in the background; later asks get answers once it is done
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            matches = questions.match(['s3'])
+            break
+        except TopicIndexNotReady:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    assert list(matches) == [0, 1]
@@ -0,0 +1,76 @@
+import json
+from urllib.parse import parse_qsl, urlencode
+
+from conftest import SIGNING_SECRET, interaction_body, signed
+from utils import DUPLICATE_REQUEST, SlackVerifier, TTLCache, decode_interaction, parse_form
+
+
+class Clock:
+    def __init__(self, now=1700000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_form_matches_urllib():
+    body = urlencode({'text': 'aws 5 s3 & iam=100%', 'user_id': 'U1', 'emoji': 'café ✓',
+                      'payload': json.dumps({"a": "b+c", "d": [1, 2]})}).encode()
+
+    assert parse_form(body) == dict(parse_qsl(body.decode(), keep_blank_values=True))
+
+
+def test_parse_form_edge_cases():
+    assert parse_form(b'') == {}
+    assert parse_form(b'a=1&&b=&c') == {'a': '1', 'b': '', 'c': ''}
+    # The last value wins for repeated keys, and '+' is a space
+    assert parse_form(b'a=1&a=two+words') == {'a': 'two words'}
+
+
+def test_decode_interaction():
+    payload = {"type": "block_actions", "actions": [{"action_id": "submit_answer"}]}
+
+    assert decode_interaction(parse_form(interaction_body(payload))) == payload
+    assert decode_interaction(parse_form(b'payload=%7Bnot+json')) is None
+    assert decode_interaction({}) is None
+
+
+def test_verifier_accepts_a_signed_request_once():
+    verifier = SlackVerifier(SIGNING_SECRET)
+    body = b'text=5&user_id=U1'
+    headers = signed(body)
+
+    assert verifier.verify(headers, body) is None
+    # Slack's retry of a delivery carries the same signature
+    assert verifier.verify(headers, body) == DUPLICATE_REQUEST
+
+
+def test_verifier_rejections():
+    clock = Clock()
+    verifier = SlackVerifier(SIGNING_SECRET, max_body=64, clock=clock)
+    body = b'text=5&user_id=U1'
+    headers = signed(body)
+    clock.now = int(headers['X-Slack-Request-Timestamp'])
+
+    assert verifier.verify({}, body) == "Missing headers"
+    assert verifier.verify(signed(body, 'wrong-secret'), body) == "Slack request verification failed"
+    assert verifier.verify(headers, body + b'&x=1') == "Slack request verification failed"
+    assert verifier.check_headers(headers, 65) == "Request body too large"
+    assert verifier.verify(dict(headers, **{'X-Slack-Request-Timestamp': 'soon'}), body) == "Invalid timestamp"
+    clock.now += 301
+    assert verifier.verify(headers, body) == "Request timestamp too old"
+
+
+def test_ttl_cache_expires_and_evicts():
+    clock = Clock(0.0)
+    cache = TTLCache(max_size=2, ttl=10, clock=clock)
+
+    assert cache.add('a') and not cache.add('a')
+    clock.now = 5
+    assert cache.add('b') and cache.add('c')
+    # Over max_size, the oldest key goes first
+    assert 'a' not in cache and 'b' in cache and len(cache) == 2
+    clock.now = 15
+    assert 'b' not in cache and cache.add('b')
+    cache.discard('c')
+    assert cache.add('c')
@@ -0,0 +1,283 @@
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import deque
+from itertools import repeat
+
+from utils import PerProcess
+
+logger = logging.getLogger(__name__)
+
+WORD = re.compile(r'[a-z0-9]+')
+# What WORD finds, for building: every byte but a-z and 0-9 becomes a space, so bytes.split() tokenizes
+# in C (non-ASCII characters, which WORD never matches, are encoded as '?')
+WORD_BYTES = bytes(byte if 0x61 <= byte <= 0x7a or 0x30 <= byte <= 0x39 else 0x20 for byte in range(256))
+# One flag byte per question to one binary digit
+BINARY_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+# Words too common to narrow a quiz down; they are dropped from both the index and queries
+STOP_WORDS = frozenset(
+    "a an and are as at be by can do does for from has have how if in is it its not of on or that the this to "
+    "was what when which will with you your".split())
+# Below this size ratio it is cheaper to intersect sets in C than to binary-search each id
+GALLOP_RATIO = 16
+# A term in at least 1/32 of the questions is stored as a bitmap (one bit per question), which is then
+# no bigger than its id list; intersecting two bitmaps is a single big-int AND
+DENSE_FRACTION = 32
+# Bitmap.sample counts bits 1024 at a time to find the chunks holding the ids it picked
+CHUNK_WORDS = 16
+
+
+def normalize(word):
+    # "instances" finds "instance"; short words and "-ss" endings ("aws", "access") are left alone
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def terms(text):
+    """Distinct index terms of a piece of text, in order of first appearance."""
+    return list(dict.fromkeys(normalize(word) for word in WORD.findall(text.lower()) if word not in STOP_WORDS))
+
+
+def question_text(question):
+    return ' '.join((question.prompt,) + tuple(question.options) + (question.explanation,))
+
+
+def to_bytes(ids):
+    # Posting lists are stored little-endian, whatever machine compiled the bank
+    if sys.byteorder == 'big':
+        ids = array('I', ids)
+        ids.byteswap()
+    return ids.tobytes()
+
+
+def from_bytes(data):
+    ids = array('I')
+    ids.frombytes(data)
+    if sys.byteorder == 'big':
+        ids.byteswap()
+    return ids
+
+
+def to_bitmap(ids, size):
+    # Flags are set and packed into bits in C: int() parses the reversed digits as little-endian bits
+    flags = bytearray(size)
+    deque(map(flags.__setitem__, ids, repeat(1)), maxlen=0)
+    return int(flags.translate(BINARY_DIGITS)[::-1] or b'0', 2).to_bytes((size + 7) // 8, 'little')
+
+
+def intersect(postings):
+    """Ids present in every one of the sorted posting lists, in ascending order."""
+    if not postings:
+        return array('I')
+    postings = sorted(postings, key=len)
+    result = postings[0]
+    for other in postings[1:]:
+        if not result:
+            break
+        if len(result) * GALLOP_RATIO < len(other):
+            # Much shorter: binary-search each id, each search starting where the previous one stopped
+            found, lo, hi = array('I'), 0, len(other)
+            for qid in result:
+                lo = bisect_left(other, qid, lo, hi)
+                if lo == hi:
+                    break
+                if other[lo] == qid:
+                    found.append(qid)
+            result = found
+        else:
+            result = array('I', sorted(set(result).intersection(other)))
+    return result
+
+
+def popcount(bits):
+    # int.bit_count is Python 3.10+, and far faster than counting the digits of bin()
+    return bits.bit_count() if hasattr(bits, 'bit_count') else bin(bits).count('1')
+
+
+class Bitmap:
+    """Ids matching a query of dense terms only, kept as a bitmap since there may be tens of thousands."""
+
+    def __init__(self, bits, size):
+        self.size = size
+        self._bytes = bits.to_bytes((size + 7) // 8, 'little')
+        self._count = popcount(bits)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, qid):
+        return 0 <= qid < self.size and self._bytes[qid >> 3] >> (qid & 7) & 1 == 1
+
+    def _words(self):
+        words = array('Q')
+        words.frombytes(self._bytes + bytes(-len(self._bytes) % 8))
+        if sys.byteorder == 'big':
+            words.byteswap()
+        return words
+
+    def __iter__(self):
+        for index, word in enumerate(self._words()):
+            while word:
+                low = word & -word
+                yield index * 64 + low.bit_length() - 1
+                word ^= low
+
+    def sample(self, k):
+        k = min(k, self._count)
+        if self._count * DENSE_FRACTION >= self.size and k * 2 <= self._count:
+            # Dense enough that a random id is a match at least one time in DENSE_FRACTION
+            chosen = {}
+            while len(chosen) < k:
+                qid = random.randrange(self.size)
+                if qid in self:
+                    chosen[qid] = None
+            return list(chosen)
+        # Otherwise pick k ranks and find them by counting bits, a chunk of words at a time and then
+        # word by word inside the chunks that hold one
+        ranks = sorted(random.sample(range(self._count), k))
+        words = self._words()
+        chosen, seen = [], 0
+        for start in range(0, len(words), CHUNK_WORDS):
+            if len(chosen) == k:
+                break
+            count = popcount(int.from_bytes(self._bytes[start * 8:(start + CHUNK_WORDS) * 8], 'little'))
+            if ranks[len(chosen)] >= seen + count:
+                seen += count
+                continue
+            for index in range(start, min(start + CHUNK_WORDS, len(words))):
+                word = words[index]
+                count = popcount(word)
+                while len(chosen) < k and ranks[len(chosen)] < seen + count:
+                    bit = word
+                    for _ in range(ranks[len(chosen)] - seen):
+                        bit &= bit - 1
+                    chosen.append(index * 64 + (bit & -bit).bit_length() - 1)
+                seen += count
+        random.shuffle(chosen)
+        return chosen
+
+
+def sample(matches, k):
+    """Up to k distinct random ids from a match result."""
+    if isinstance(matches, Bitmap):
+        return matches.sample(k)
+    return random.sample(matches, min(k, len(matches)))
+
+
+class TopicIndex:
+    """Maps each term to the questions whose prompt, options or explanation use it.
+
+    Rare terms keep a sorted array('I') of ids, four bytes per entry; dense ones a bitmap of the whole
+    bank (bytes). A query intersects its id lists shortest first, then filters them through the bitmaps;
+    a query made only of dense terms ANDs the bitmaps and returns a Bitmap.
+    """
+
+    def __init__(self, postings, size):
+        self._postings = postings
+        self.size = size
+
+    @classmethod
+    def build(cls, questions):
+        postings = {}
+        # What terms() does, with each distinct word resolved once for the whole bank rather than per use:
+        # to the append method of its term's id list, or None for a stop word. Words sharing a term
+        # ("instance", "instances") share the method, so a set of them appends each id once.
+        appends = {}
+        size = 0
+        for question in questions:
+            words = set(question_text(question).lower().encode('ascii', 'replace').translate(WORD_BYTES).split())
+            for word in words.difference(appends):
+                term = word.decode()
+                if term in STOP_WORDS:
+                    appends[word] = None
+                else:
+                    ids = postings.setdefault(normalize(term), [])
+                    appends[word] = ids.append
+            question_appends = set(map(appends.__getitem__, words))
+            question_appends.discard(None)
+            qid = question.id
+            for append in question_appends:
+                append(qid)
+            size = max(size, qid + 1)
+        # Questions are visited in id order, so every list is already sorted
+        return cls({term: to_bitmap(ids, size) if len(ids) * DENSE_FRACTION >= size else array('I', ids)
+                    for term, ids in postings.items()}, size)
+
+    def __len__(self):
+        return len(self._postings)
+
+    def items(self):
+        return self._postings.items()
+
+    def postings(self, term):
+        return self._postings.get(term) or array('I')
+
+    def match(self, words):
+        """Ids of the questions mentioning every word; words with no index terms match everything (None).
+
+        The result is a sorted array('I') or, for dense terms only, a Bitmap; pass it to sample().
+        """
+        query = terms(' '.join(words))
+        if not query:
+            return None
+        postings = [self.postings(term) for term in query]
+        lists = [ids for ids in postings if isinstance(ids, array)]
+        bitmaps = [bitmap for bitmap in postings if not isinstance(bitmap, array)]
+        if not lists:
+            bits = int.from_bytes(bitmaps[0], 'little')
+            for bitmap in bitmaps[1:]:
+                bits &= int.from_bytes(bitmap, 'little')
+            return Bitmap(bits, self.size)
+        ids = intersect(lists)
+        for bitmap in bitmaps:
+            # The id lists are all short (under 1/DENSE_FRACTION of the bank), so this loop is too
+            ids = array('I', [qid for qid in ids if bitmap[qid >> 3] >> (qid & 7) & 1])
+        return ids
+
+
+class TopicIndexNotReady(Exception):
+    """The bank's topic index is still being built; asking started the build if nothing had."""
+
+
+class LazyTopicIndex:
+    """A bank's TopicIndex, built on a background thread of the process that first asks for it.
+
+    Tokenizing a large bank takes seconds: at load it would hold up startup, and on the request path
+    it would outlast Slack's three seconds to ack and stall an event loop. get() raises
+    TopicIndexNotReady until the build is done rather than wait for it.
+    """
+
+    def __init__(self, questions, index=None):
+        # questions() returns the bank's questions in id order
+        self._questions = questions
+        self.index = index
+        self._lock = threading.Lock()
+        self._start = PerProcess(self._spawn)
+
+    def build(self):
+        """Builds the index in the calling thread, for callers already off the request path."""
+        with self._lock:
+            if self.index is None:
+                start = time.perf_counter()
+                self.index = TopicIndex.build(self._questions())
+                logger.info("Indexed %d topic terms in %.2f s", len(self.index), time.perf_counter() - start)
+        return self.index
+
+    def start(self):
+        if self.index is None:
+            self._start()
+
+    def _spawn(self):
+        threading.Thread(target=self.build, name="topic-index", daemon=True).start()
+
+    def get(self):
+        if self.index is None:
+            self.start()
+            raise TopicIndexNotReady()
+        return self.index
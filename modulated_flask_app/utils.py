@@ -1,6 +1,11 @@
+import binascii
 import hmac
 import hashlib
 import json
+import os
+import threading
+import time
+from collections import OrderedDict
 
 def verify_slack_request(data, timestamp, signature, signing_secret):
     req = str.encode('v0:' + str(timestamp) + ':') + data
@@ -10,6 +15,197 @@ def verify_slack_request(data, timestamp, signature, signing_secret):
     ).hexdigest()
     return hmac.compare_digest(request_hash, signature)
 
+class TTLCache:
+    """Bounded set of recently seen keys, each forgotten ttl seconds after it was added."""
+
+    def __init__(self, max_size=100000, ttl=300, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key):
+        """Records key; returns False if it was already present and unexpired."""
+        now = self._clock()
+        with self._lock:
+            # Insertion order is expiry order, so expired keys are always at the front
+            while self._entries:
+                oldest_key, expires_at = next(iter(self._entries.items()))
+                if expires_at > now:
+                    break
+                del self._entries[oldest_key]
+            if key in self._entries:
+                return False
+            self._entries[key] = now + self.ttl
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return True
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __contains__(self, key):
+        expires_at = self._entries.get(key)
+        return expires_at is not None and expires_at > self._clock()
+
+    def __len__(self):
+        return len(self._entries)
+
+def interaction_key(payload):
+    """Identifies one user interaction, so a redelivered block_actions payload maps to the same key."""
+    if payload.get("type") == "view_submission":
+        # One modal can only be submitted once
+        return f"{payload['user']['id']}:{payload['view']['id']}:view_submission"
+    action = payload["actions"][0]
+    return f"{payload['user']['id']}:{payload.get('trigger_id') or action.get('action_ts')}:{action['action_id']}"
+
+def state_selection(payload, block_id="answer_block", action_id="select_answer"):
+    """Selected option values from the state snapshot Slack sends with every block action, or None if absent."""
+    try:
+        selected = payload["state"]["values"][block_id][action_id].get("selected_options")
+    except (KeyError, TypeError):
+        return None
+    return [option["value"] for option in selected or []]
+
+def parse_form(data):
+    """Decodes an application/x-www-form-urlencoded body into a dict (the last value wins for repeated keys).
+
+    Interaction payloads are JSON, so nearly every character is percent-escaped and urllib's per-escape
+    loop dominates the request. With '%' swapped for '=' the escapes are quoted-printable ones, which
+    binascii decodes in C; '=' itself is always escaped inside keys and values, so nothing else changes.
+    """
+    form = {}
+    for pair in data.split(b'&'):
+        if not pair:
+            continue
+        key, _, value = pair.partition(b'=')
+        form[_unquote_plus(key)] = _unquote_plus(value)
+    return form
+
+def _unquote_plus(value):
+    return binascii.a2b_qp(value.replace(b'+', b' ').replace(b'%', b'=')).decode('utf-8', 'replace')
+
+def decode_interaction(form):
+    """The JSON payload of a parsed interaction form, or None when it is missing or not JSON."""
+    try:
+        return json.loads(form.get('payload', ''))
+    except ValueError:
+        return None
+
+def api_error(content_type, body):
+    """The error of a Web API reply that failed with a 200 ({"ok": false, "error": ...}), or None.
+
+    response_url replies are plain text, so only JSON bodies are read.
+    """
+    if not (content_type or '').startswith('application/json'):
+        return None
+    try:
+        reply = json.loads(body)
+    except ValueError:
+        return None
+    if isinstance(reply, dict) and reply.get('ok') is False:
+        return reply.get('error') or 'unknown_error'
+    return None
+
+
+def is_select_click(payload):
+    """Whether a decoded interaction is a click on a quiz question's checkboxes.
+
+    Decided from actions[0] alone: Slack echoes the whole message back in the payload, and with it the
+    checkboxes' action_id, so the string occurs in every click on that message, submits included.
+    """
+    if not payload or payload.get("type") != "block_actions":
+        return False
+    actions = payload.get("actions") or [{}]
+    return actions[0].get("action_id") == "select_answer"
+
+class StripedLocks:
+    """A fixed pool of locks; keys hash onto a stripe so memory stays bounded however many users there are."""
+
+    def __init__(self, stripes=256, factory=threading.Lock):
+        self._locks = [factory() for _ in range(stripes)]
+
+    def lock_for(self, key):
+        return self._locks[hash(key) % len(self._locks)]
+
+class PerProcess:
+    """Calls start once in each process that calls it.
+
+    Threads do not survive a fork, so background threads are started lazily, from the first call in
+    whichever process does the work, rather than at import in a server's master.
+    """
+
+    def __init__(self, start):
+        self._start = start
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def started(self):
+        return self._pid == os.getpid()
+
+    def __call__(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._start()
+            self._pid = os.getpid()
+
+DUPLICATE_REQUEST = "Duplicate request"
+
+class SlackVerifier:
+    """Verifies Slack request signatures, rejecting on the cheap checks before the body is read.
+
+    The HMAC is keyed once and copied per request, and signatures already accepted are remembered
+    so replays and retries of the same delivery are dropped without hashing.
+    """
+
+    def __init__(self, signing_secret, max_age=60 * 5, max_body=64 * 1024, replay_ttl=60 * 5,
+                 replay_size=100000, clock=time.time):
+        self.max_age = max_age
+        self.max_body = max_body
+        self._clock = clock
+        self._mac = hmac.new(signing_secret.encode(), digestmod=hashlib.sha256)
+        self._seen = TTLCache(max_size=replay_size, ttl=replay_ttl)
+
+    def check_headers(self, headers, content_length):
+        timestamp = headers.get('X-Slack-Request-Timestamp')
+        signature = headers.get('X-Slack-Signature')
+        if timestamp is None or signature is None:
+            return "Missing headers"
+        if content_length is not None and content_length > self.max_body:
+            return "Request body too large"
+        try:
+            if abs(self._clock() - int(timestamp)) > self.max_age:
+                return "Request timestamp too old"
+        except ValueError:
+            return "Invalid timestamp"
+        if signature in self._seen:
+            return DUPLICATE_REQUEST
+        return None
+
+    def check_body(self, headers, data):
+        if len(data) > self.max_body:
+            return "Request body too large"
+        signature = headers.get('X-Slack-Signature')
+        mac = self._mac.copy()
+        mac.update(b'v0:')
+        mac.update(headers.get('X-Slack-Request-Timestamp').encode())
+        mac.update(b':')
+        mac.update(data)
+        if not hmac.compare_digest('v0=' + mac.hexdigest(), signature):
+            return "Slack request verification failed"
+        if not self._seen.add(signature):
+            return DUPLICATE_REQUEST
+        return None
+
+    def verify(self, headers, data):
+        return self.check_headers(headers, len(data)) or self.check_body(headers, data)
+
 def load_lookup_table(file_path):
     with open(file_path, 'r') as file:
-        return json.load(file)
\ No newline at end of file
+        return json.load(file)